@@ -0,0 +1,156 @@
+"""Non-blocking structured log of hand analyses
+
+log() only samples the record and puts it on a bounded queue; it never
+touches stdout or disk and drops the record (counting it) if the queue is
+full. A background thread drains the queue in batches and appends compact
+JSON lines to analysis.jsonl in POKER_LOG_DIR. When that file reaches
+max_file_bytes it is gzipped to analysis-<time>.jsonl.gz, and the oldest
+compressed files are deleted once all logs together exceed max_total_bytes.
+
+BackgroundWriter is the queue and writer-thread part, also used by
+analysis_store.py. The thread starts on the first record in each process,
+so every gunicorn worker gets its own after the fork. Give each worker its
+own POKER_LOG_DIR if several write at once.
+"""
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+LOG_DIR = os.environ.get('POKER_LOG_DIR', os.path.join(tempfile.gettempdir(), 'poker_buddy', 'logs'))
+CURRENT_FILE = 'analysis.jsonl'
+
+
+class BackgroundWriter:
+    """Bounded queue drained in batches by one writer thread per process
+
+    Subclasses implement _write(batch). submit() never blocks: a record that
+    does not fit in the queue is dropped and counted.
+    """
+
+    def __init__(self, queue_size=10000, batch_size=500, flush_interval=1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._owner = None
+        self.written = 0
+        self.dropped = 0
+
+    def submit(self, record):
+        """Queue a record for the writer thread"""
+        self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=5):
+        """Wait until every queued record has been written (for tests and shutdown)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _start(self):
+        if self._owner == os.getpid():
+            return
+        with self._lock:
+            if self._owner != os.getpid():
+                self._owner = os.getpid()
+                threading.Thread(target=self._run, name=type(self).__name__, daemon=True).start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Collect whatever else arrives shortly after, up to one batch
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+                self.written += len(batch)
+            except Exception:
+                self.dropped += len(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        raise NotImplementedError
+
+
+class AnalysisLog(BackgroundWriter):
+    """Queue-fed background JSONL writer with sampling, rotation and a size cap"""
+
+    def __init__(self, directory=LOG_DIR, sample_rate=1.0, max_file_bytes=10 * 1024 * 1024,
+                 max_total_bytes=200 * 1024 * 1024, queue_size=10000, batch_size=500, flush_interval=1.0):
+        super().__init__(queue_size, batch_size, flush_interval)
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.sampled_out = 0
+        self.rotations = 0
+
+    def log(self, record):
+        """Queue a JSON-serialisable record for writing; never blocks"""
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return
+        self.submit(record)
+
+    def _write(self, batch):
+        os.makedirs(self.directory, exist_ok=True)
+        lines = ''.join(
+            json.dumps(record, separators=(',', ':'), ensure_ascii=False, default=str) + '\n' for record in batch
+        )
+        path = os.path.join(self.directory, CURRENT_FILE)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            size = f.tell()
+        if size >= self.max_file_bytes:
+            self._rotate(path)
+
+    def _rotate(self, path):
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        rotated = os.path.join(self.directory, f'analysis-{stamp}-{self.rotations}.jsonl.gz')
+        with open(path, 'rb') as src, gzip.open(rotated, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(path)
+        self.rotations += 1
+
+        # Enforce the size cap by deleting the oldest compressed files
+        archives = sorted(glob.glob(os.path.join(self.directory, 'analysis-*.jsonl.gz')), key=os.path.getmtime)
+        total = sum(os.path.getsize(archive) for archive in archives)
+        while archives and total > self.max_total_bytes:
+            oldest = archives.pop(0)
+            total -= os.path.getsize(oldest)
+            os.remove(oldest)
+
+    def stats(self):
+        return {
+            'written': self.written,
+            'dropped': self.dropped,
+            'sampledOut': self.sampled_out,
+            'queued': self._queue.qsize(),
+            'rotations': self.rotations,
+            'sampleRate': self.sample_rate,
+        }
+
+
+analysis_log = AnalysisLog(
+    sample_rate=float(os.environ.get('POKER_LOG_SAMPLE_RATE', 1.0)),
+    max_file_bytes=int(float(os.environ.get('POKER_LOG_MAX_FILE_MB', 10)) * 1024 * 1024),
+    max_total_bytes=int(float(os.environ.get('POKER_LOG_MAX_TOTAL_MB', 200)) * 1024 * 1024),
+)
+atexit.register(analysis_log.flush)
@@ -0,0 +1,176 @@
+"""Embedded SQLite store of every hand analysis
+
+record() queues an /api/analyze input and output; a background writer (see
+analysis_log.BackgroundWriter) flattens them into rows and inserts them in
+batched transactions, so a request only pays for the queue put. The
+database runs in WAL mode, so the query endpoints read while the writer
+appends. Rows are indexed by hand notation, position, street and timestamp.
+"""
+import atexit
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+
+from analysis_log import BackgroundWriter
+from poker_engine import hand_to_notation, parse_cards
+
+STORE_PATH = os.environ.get(
+    'POKER_STORE_PATH', os.path.join(tempfile.gettempdir(), 'poker_buddy', 'analyses.db')
+)
+
+STREETS = {0: 'preflop', 3: 'flop', 4: 'turn', 5: 'river'}
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS analyses (
+        id INTEGER PRIMARY KEY,
+        timestamp TEXT NOT NULL,
+        hand TEXT,
+        position TEXT,
+        street TEXT,
+        num_players INTEGER,
+        action TEXT,
+        confidence INTEGER,
+        equity REAL,
+        hand_data TEXT,
+        recommendation TEXT
+    )''',
+    'CREATE INDEX IF NOT EXISTS analyses_hand ON analyses (hand, position)',
+    'CREATE INDEX IF NOT EXISTS analyses_position ON analyses (position)',
+    'CREATE INDEX IF NOT EXISTS analyses_street ON analyses (street)',
+    'CREATE INDEX IF NOT EXISTS analyses_timestamp ON analyses (timestamp)',
+]
+
+COLUMNS = (
+    'timestamp', 'hand', 'position', 'street', 'num_players', 'action', 'confidence', 'equity',
+    'hand_data', 'recommendation'
+)
+
+# Query-string filters accepted by the query methods and the column each applies to
+FILTERS = {
+    'hand': 'hand = ?',
+    'position': 'position = ?',
+    'street': 'street = ?',
+    'since': 'timestamp >= ?',
+    'until': 'timestamp < ?',
+}
+
+
+def hand_row(hand_data, recommendation):
+    """Column values for one analysis"""
+    try:
+        notation = hand_to_notation(parse_cards(hand_data.get('holeCards', [])))
+    except ValueError:
+        notation = None
+    board = list(hand_data.get('flop') or [])
+    board += [card for card in (hand_data.get('turn'), hand_data.get('river')) if card]
+    return (
+        recommendation.get('timestamp') or datetime.now().isoformat(),
+        notation,
+        hand_data.get('position', 'middle'),
+        STREETS.get(len(board)),
+        hand_data.get('numPlayers', 6),
+        recommendation.get('action'),
+        recommendation.get('confidence'),
+        recommendation.get('equity'),
+        json.dumps(hand_data, separators=(',', ':'), ensure_ascii=False),
+        json.dumps(recommendation, separators=(',', ':'), ensure_ascii=False),
+    )
+
+
+def where_clause(filters):
+    """SQL WHERE clause and parameters for the given filter values"""
+    conditions = [FILTERS[name] for name, value in filters.items() if value is not None]
+    params = [value for value in filters.values() if value is not None]
+    return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+
+class AnalysisStore(BackgroundWriter):
+    """SQLite WAL store fed by a batching background writer"""
+
+    def __init__(self, path=STORE_PATH, queue_size=10000, batch_size=500, flush_interval=0.2):
+        super().__init__(queue_size, batch_size, flush_interval)
+        self.path = path
+        self._writer = None
+        self._readers = threading.local()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    def record(self, hand_data, recommendation):
+        """Queue one analysis input and output for storage; rows are built by the writer"""
+        self.submit((hand_data, recommendation))
+
+    def _write(self, batch):
+        if self._writer is None:
+            self._writer = self._connect()
+        rows = [hand_row(hand_data, recommendation) for hand_data, recommendation in batch]
+        with self._writer:
+            self._writer.executemany(
+                f"INSERT INTO analyses ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows
+            )
+
+    def _reader(self):
+        """This thread's read connection, opened (and the schema checked) once per thread and process"""
+        readers = self._readers
+        if getattr(readers, 'pid', None) != os.getpid():
+            readers.connection = self._connect()
+            readers.connection.row_factory = sqlite3.Row
+            readers.pid = os.getpid()
+        return readers.connection
+
+    def _query(self, sql, params=()):
+        return [dict(row) for row in self._reader().execute(sql, params)]
+
+    def action_frequencies(self, **filters):
+        """Action counts and frequencies per hand class and position"""
+        where, params = where_clause(filters)
+        rows = self._query(
+            f'''SELECT hand, position, action, COUNT(*) AS count, AVG(equity) AS avgEquity
+                FROM analyses{where} GROUP BY hand, position, action ORDER BY hand, position, count DESC''',
+            params
+        )
+        totals = {}
+        for row in rows:
+            totals[row['hand'], row['position']] = totals.get((row['hand'], row['position']), 0) + row['count']
+        for row in rows:
+            row['frequency'] = round(row['count'] / totals[row['hand'], row['position']], 4)
+        return rows
+
+    def street_summary(self, **filters):
+        """Number of analyses and mean equity and confidence per street and action"""
+        where, params = where_clause(filters)
+        return self._query(
+            f'''SELECT street, action, COUNT(*) AS count, AVG(equity) AS avgEquity,
+                       AVG(confidence) AS avgConfidence
+                FROM analyses{where} GROUP BY street, action ORDER BY street, count DESC''',
+            params
+        )
+
+    def recent(self, limit=50, **filters):
+        """Most recent stored analyses, newest first"""
+        where, params = where_clause(filters)
+        rows = self._query(
+            f'''SELECT id, timestamp, hand, position, street, num_players AS numPlayers, action, confidence,
+                       equity, hand_data AS handData, recommendation
+                FROM analyses{where} ORDER BY timestamp DESC, id DESC LIMIT ?''', params + [limit]
+        )
+        for row in rows:
+            row['handData'] = json.loads(row['handData'])
+            row['recommendation'] = json.loads(row['recommendation'])
+        return rows
+
+    def stats(self):
+        return {'written': self.written, 'dropped': self.dropped, 'queued': self._queue.qsize()}
+
+
+analysis_store = AnalysisStore()
+atexit.register(analysis_store.flush)
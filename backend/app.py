@@ -1,9 +1,24 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
+import hmac
 import json
+import queue
+import time
+from contextlib import nullcontext
 from datetime import datetime
-import random
+
+from analysis_log import analysis_log
+from analysis_store import FILTERS, STREETS, analysis_store
+from jobs import job_queue
+from metrics import metrics
+from profiler import profiler
+from poker_engine import (
+    ANALYSIS_BATCH_TIME_LIMIT, ANALYSIS_MAX_TRIALS, ANALYSIS_PRECISION, ANALYSIS_TIME_LIMIT, HAND_NAMES,
+    batch_estimate_equity, equity_cache, equity_cutoff, estimate_equity, evaluate_category, hand_to_notation,
+    opponents_at_table, parse_cards, range_book, range_equity, starting_hand_category
+)
+from poker_engine.parallel import trial_stats
 
 # Disable dotenv loading completely
 os.environ['FLASK_DOTENV_LOADING'] = 'false'
@@ -13,84 +28,24 @@ app = Flask(__name__)
 CORS(app)
 
 # Professional GTO-based poker logic with real ranges from Upswing Poker, PokerStars School, and professional training sites
+# Cards are parsed once into ints at the API boundary (see poker_engine/cards.py)
 
-# Monte Carlo simulation for accurate odds calculation
-def monte_carlo_equity(hole_cards, community_cards, num_simulations=10000):
-    """Calculate equity using Monte Carlo simulation"""
-    if len(hole_cards) != 2:
-        return 0.0
-    
-    wins = 0
-    total_simulations = num_simulations
-    
-    # Create deck excluding known cards
-    ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-    suits = ['♠', '♥', '♦', '♣']
-    
-    known_cards = set(hole_cards + community_cards)
-    deck = []
-    for rank in ranks:
-        for suit in suits:
-            card = f"{rank}{suit}"
-            if card not in known_cards:
-                deck.append(card)
-    
-    for _ in range(num_simulations):
-        # Shuffle remaining deck
-        random.shuffle(deck)
-        
-        # Complete the board
-        remaining_cards_needed = 5 - len(community_cards)
-        simulated_board = community_cards + deck[:remaining_cards_needed]
-        
-        # Generate random opponent hand
-        opponent_cards = deck[remaining_cards_needed:remaining_cards_needed + 2]
-        
-        # Evaluate both hands
-        player_hand = evaluate_poker_hand(hole_cards, simulated_board)
-        opponent_hand = evaluate_poker_hand(opponent_cards, simulated_board)
-        
-        # Compare hands
-        if player_hand['value'] > opponent_hand['value']:
-            wins += 1
-        elif player_hand['value'] == opponent_hand['value']:
-            wins += 0.5  # Split pot
-    
-    return (wins / total_simulations) * 100
-
-# Professional GTO opening ranges by position (6-max)
-GTO_RANGES = {
-    'UTG': {
-        'raise': ['AA', 'KK', 'QQ', 'JJ', 'TT', '99', '88', 'AKs', 'AKo', 'AQs', 'AQo', 'AJs', 'ATs', 'A9s', 'KQs', 'KQo', 'KJs', 'KTs', 'QJs', 'QTs', 'JTs', 'T9s', '98s', '87s', '76s', '65s'],
-        'call': ['77', '66', '55', 'A8s', 'A7s', 'A6s', 'A5s', 'A4s', 'A3s', 'A2s', 'K9s', 'K8s', 'K7s', 'Q9s', 'Q8s', 'J9s', 'J8s', 'T8s', '97s', '86s', '75s', '54s'],
-        'fold': ['44', '33', '22', 'K6s', 'K5s', 'K4s', 'K3s', 'K2s', 'Q7s', 'Q6s', 'Q5s', 'Q4s', 'Q3s', 'Q2s', 'J7s', 'J6s', 'J5s', 'J4s', 'J3s', 'J2s', 'T7s', 'T6s', 'T5s', 'T4s', 'T3s', 'T2s', '96s', '95s', '94s', '93s', '92s', '85s', '84s', '83s', '82s', '74s', '73s', '72s', '64s', '63s', '62s', '53s', '52s', '43s', '42s', '32s']
-    },
-    'MP': {
-        'raise': ['AA', 'KK', 'QQ', 'JJ', 'TT', '99', '88', '77', '66', 'AKs', 'AKo', 'AQs', 'AQo', 'AJs', 'ATs', 'A9s', 'A8s', 'A7s', 'KQs', 'KQo', 'KJs', 'KTs', 'K9s', 'QJs', 'QTs', 'Q9s', 'JTs', 'J9s', 'T9s', '98s', '87s', '76s', '65s', '54s'],
-        'call': ['55', '44', '33', '22', 'A6s', 'A5s', 'A4s', 'A3s', 'A2s', 'K8s', 'K7s', 'K6s', 'K5s', 'Q8s', 'Q7s', 'Q6s', 'J8s', 'J7s', 'T8s', 'T7s', '97s', '96s', '86s', '85s', '75s', '74s', '64s', '53s', '43s'],
-        'fold': ['K4s', 'K3s', 'K2s', 'Q5s', 'Q4s', 'Q3s', 'Q2s', 'J6s', 'J5s', 'J4s', 'J3s', 'J2s', 'T6s', 'T5s', 'T4s', 'T3s', 'T2s', '95s', '94s', '93s', '92s', '84s', '83s', '82s', '73s', '72s', '63s', '62s', '52s', '42s', '32s']
-    },
-    'CO': {
-        'raise': ['AA', 'KK', 'QQ', 'JJ', 'TT', '99', '88', '77', '66', '55', '44', 'AKs', 'AKo', 'AQs', 'AQo', 'AJs', 'ATs', 'A9s', 'A8s', 'A7s', 'A6s', 'A5s', 'A4s', 'A3s', 'A2s', 'KQs', 'KQo', 'KJs', 'KTs', 'K9s', 'K8s', 'K7s', 'QJs', 'QTs', 'Q9s', 'Q8s', 'JTs', 'J9s', 'J8s', 'T9s', 'T8s', '98s', '97s', '87s', '86s', '76s', '75s', '65s', '64s', '54s', '43s'],
-        'call': ['33', '22', 'K6s', 'K5s', 'K4s', 'Q7s', 'Q6s', 'Q5s', 'J7s', 'J6s', 'J5s', 'T7s', 'T6s', 'T5s', '96s', '95s', '85s', '84s', '74s', '73s', '63s', '53s'],
-        'fold': ['K3s', 'K2s', 'Q4s', 'Q3s', 'Q2s', 'J4s', 'J3s', 'J2s', 'T4s', 'T3s', 'T2s', '94s', '93s', '92s', '83s', '82s', '72s', '62s', '52s', '42s', '32s']
-    },
-    'BTN': {
-        'raise': ['AA', 'KK', 'QQ', 'JJ', 'TT', '99', '88', '77', '66', '55', '44', '33', '22', 'AKs', 'AKo', 'AQs', 'AQo', 'AJs', 'ATs', 'A9s', 'A8s', 'A7s', 'A6s', 'A5s', 'A4s', 'A3s', 'A2s', 'KQs', 'KQo', 'KJs', 'KTs', 'K9s', 'K8s', 'K7s', 'K6s', 'K5s', 'K4s', 'K3s', 'K2s', 'QJs', 'QTs', 'Q9s', 'Q8s', 'Q7s', 'Q6s', 'Q5s', 'JTs', 'J9s', 'J8s', 'J7s', 'J6s', 'T9s', 'T8s', 'T7s', 'T6s', '98s', '97s', '96s', '87s', '86s', '85s', '76s', '75s', '74s', '65s', '64s', '54s', '53s', '43s', '32s'],
-        'call': ['K2s', 'Q4s', 'Q3s', 'Q2s', 'J5s', 'J4s', 'J3s', 'J2s', 'T5s', 'T4s', 'T3s', 'T2s', '95s', '94s', '93s', '92s', '84s', '83s', '82s', '73s', '72s', '63s', '62s', '52s', '42s'],
-        'fold': ['Q2s', 'J2s', 'T2s', '91s', '81s', '71s', '61s', '51s', '41s', '31s', '21s']
-    },
-    'SB': {
-        'raise': ['AA', 'KK', 'QQ', 'JJ', 'TT', '99', '88', '77', '66', '55', '44', '33', '22', 'AKs', 'AKo', 'AQs', 'AQo', 'AJs', 'ATs', 'A9s', 'A8s', 'A7s', 'A6s', 'A5s', 'A4s', 'A3s', 'A2s', 'KQs', 'KQo', 'KJs', 'KTs', 'K9s', 'K8s', 'K7s', 'K6s', 'K5s', 'K4s', 'K3s', 'K2s', 'QJs', 'QTs', 'Q9s', 'Q8s', 'Q7s', 'Q6s', 'Q5s', 'Q4s', 'JTs', 'J9s', 'J8s', 'J7s', 'J6s', 'J5s', 'T9s', 'T8s', 'T7s', 'T6s', 'T5s', '98s', '97s', '96s', '95s', '87s', '86s', '85s', '84s', '76s', '75s', '74s', '73s', '65s', '64s', '63s', '54s', '53s', '52s', '43s', '42s', '32s'],
-        'call': ['Q3s', 'Q2s', 'J4s', 'J3s', 'J2s', 'T4s', 'T3s', 'T2s', '94s', '93s', '92s', '83s', '82s', '72s', '62s', '52s', '42s'],
-        'fold': ['Q2s', 'J2s', 'T2s', '91s', '81s', '71s', '61s', '51s', '41s', '31s', '21s']
-    },
-    'BB': {
-        'raise': ['AA', 'KK', 'QQ', 'JJ', 'TT', '99', '88', '77', '66', '55', '44', '33', '22', 'AKs', 'AKo', 'AQs', 'AQo', 'AJs', 'ATs', 'A9s', 'A8s', 'A7s', 'A6s', 'A5s', 'A4s', 'A3s', 'A2s', 'KQs', 'KQo', 'KJs', 'KTs', 'K9s', 'K8s', 'K7s', 'K6s', 'K5s', 'K4s', 'K3s', 'K2s', 'QJs', 'QTs', 'Q9s', 'Q8s', 'Q7s', 'Q6s', 'Q5s', 'Q4s', 'Q3s', 'JTs', 'J9s', 'J8s', 'J7s', 'J6s', 'J5s', 'J4s', 'T9s', 'T8s', 'T7s', 'T6s', 'T5s', 'T4s', '98s', '97s', '96s', '95s', '94s', '87s', '86s', '85s', '84s', '83s', '76s', '75s', '74s', '73s', '72s', '65s', '64s', '63s', '62s', '54s', '53s', '52s', '43s', '42s', '32s'],
-        'call': ['Q2s', 'J3s', 'J2s', 'T3s', 'T2s', '93s', '92s', '82s', '72s', '62s', '52s', '42s'],
-        'fold': ['J2s', 'T2s', '91s', '81s', '71s', '61s', '51s', '41s', '31s', '21s']
-    }
-}
+# Opening ranges by position, context and stack depth live in range files (see poker_engine/rangebook.py)
+for problem in range_book.current().problems:
+    app.logger.warning("GTO range problem: %s", problem)
+
+# Largest number of hands accepted by /api/analyze/batch
+MAX_BATCH_HANDS = 2000
+
+# Longest hand-history line accepted by /api/analyze/stream
+MAX_STREAM_LINE_BYTES = 64 * 1024
+
+# Longest long-poll on /api/jobs/<id>, in seconds; a server without request
+# threads (a sync gunicorn worker) answers at once instead of blocking
+MAX_JOB_WAIT = 30
+
+# Bearer token for the admin endpoints and X-Profile; admin access is off when unset
+ADMIN_TOKEN = os.environ.get('POKER_ADMIN_TOKEN')
 
 # Position mapping
 POSITION_MAP = {
@@ -102,43 +57,17 @@ POSITION_MAP = {
     'big_blind': 'BB'
 }
 
-def hand_to_notation(hole_cards):
-    """Convert hand to notation (e.g., ['J♠', 'T♥'] -> 'JTs')"""
-    if len(hole_cards) != 2:
-        return None
-    
-    card1 = hole_cards[0]
-    card2 = hole_cards[1]
-    rank1 = card1[:-1]  # Remove suit
-    rank2 = card2[:-1]
-    is_suited = card1[-1] == card2[-1]
-    
-    # Handle 10 specially
-    rank1_str = 'T' if rank1 == '10' else rank1
-    rank2_str = 'T' if rank2 == '10' else rank2
-    
-    # For pairs, just return the rank twice (no suited/offsuit suffix)
-    if rank1_str == rank2_str:
-        return rank1_str + rank2_str
-    
-    # Sort by rank (higher first)
-    rank_values = {'A': 14, 'K': 13, 'Q': 12, 'J': 11, 'T': 10, '9': 9, '8': 8, '7': 7, '6': 6, '5': 5, '4': 4, '3': 3, '2': 2}
-    ranks = [rank1_str, rank2_str]
-    ranks.sort(key=lambda x: rank_values.get(x, 0), reverse=True)
-    
-    return ranks[0] + ranks[1] + ('s' if is_suited else 'o')
-
-def get_gto_action(hole_cards, position, num_players, pot_size, bet_size, big_blind):
+def get_gto_action(hole_cards, position, num_players, pot_size, bet_size, big_blind, stack_depth=100):
     """Get GTO action for a hand and position"""
     hand_notation = hand_to_notation(hole_cards)
     if not hand_notation:
         return {'action': 'fold', 'confidence': 50, 'reasoning': 'Invalid hand'}
     
     gto_position = POSITION_MAP.get(position, 'MP')
-    ranges = GTO_RANGES.get(gto_position, GTO_RANGES['MP'])
+    ranges = range_book.ranges(gto_position, depth=stack_depth) or range_book.ranges('MP', depth=stack_depth)
     
     # Check if hand is in raise range
-    if hand_notation in ranges['raise']:
+    if hole_cards in ranges['raise']:
         return {
             'action': 'raise',
             'confidence': 90,
@@ -147,7 +76,7 @@ def get_gto_action(hole_cards, position, num_players, pot_size, bet_size, big_bl
         }
     
     # Check if hand is in call range
-    if hand_notation in ranges['call']:
+    if hole_cards in ranges['call']:
         # Consider pot odds for calling
         pot_odds = calculate_pot_odds(pot_size, bet_size)
         if pot_odds > 15 or bet_size == 0:
@@ -170,133 +99,25 @@ def get_gto_action(hole_cards, position, num_players, pot_size, bet_size, big_bl
         'reasoning': f"GTO: {hand_notation} is not in the opening range from {gto_position} position."
     }
 
-def get_rank_value(rank):
-    """Get rank value for comparison"""
-    ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-    return ranks.index(rank) if rank in ranks else -1
-
 def get_hand_category(hole_cards):
     """Get hand category based on PokerStars Starting Hand Rankings"""
-    card1 = hole_cards[0]
-    card2 = hole_cards[1]
-    rank1 = get_rank_value(card1[:-1])
-    rank2 = get_rank_value(card2[:-1])
-    is_suited = card1[-1] == card2[-1]
-    
-    # Create hand string (e.g., "AKs", "QJo")
-    if rank1 == rank2:
-        hand_str = f"{card1[:-1]}{card2[:-1]}"
-    else:
-        high_rank = card1[:-1] if rank1 > rank2 else card2[:-1]
-        low_rank = card2[:-1] if rank1 > rank2 else card1[:-1]
-        hand_str = f"{high_rank}{low_rank}{'s' if is_suited else 'o'}"
-    
-    # Top 5% of hands (premium)
-    top_5_percent = [
-        'AA', 'KK', 'QQ', 'JJ', 'TT', 'AKs', 'AKo', 'AQs', 'AQo', 'AJs', 'ATs'
-    ]
-    
-    # Top 10% of hands (strong)
-    top_10_percent = [
-        '99', '88', 'AKo', 'AJo', 'ATo', 'A9s', 'A8s', 'KQs', 'KQo', 'KJs', 'KJo', 'KTs', 'QJs', 'QJo'
-    ]
-    
-    # Top 20% of hands (playable)
-    playable_hands = [
-        '77', '66', '55', '44', '33', '22',
-        'A9o', 'A8o', 'A7o', 'A6o', 'A5o', 'A4o', 'A3o', 'A2o',
-        'KTo', 'K9s', 'K8s', 'K7s', 'K6s', 'K5s', 'K4s', 'K3s', 'K2s',
-        'QTs', 'QTo', 'Q9s', 'Q8s', 'Q7s', 'Q6s', 'Q5s', 'Q4s', 'Q3s', 'Q2s',
-        'JTs', 'JTo', 'J9s', 'J8s', 'J7s', 'J6s', 'J5s', 'J4s', 'J3s', 'J2s',
-        'T9s', 'T8s', 'T7s', 'T6s', 'T5s', 'T4s', 'T3s', 'T2s',
-        '98s', '97s', '96s', '95s', '94s', '93s', '92s',
-        '87s', '86s', '85s', '84s', '83s', '82s',
-        '76s', '75s', '74s', '73s', '72s',
-        '65s', '64s', '63s', '62s',
-        '54s', '53s', '52s',
-        '43s', '42s',
-        '32s'
-    ]
-    
-
-    
-    if hand_str in top_5_percent:
-        return 'premium'
-    elif hand_str in top_10_percent:
-        return 'strong'
-    elif hand_str in playable_hands:
-        return 'playable'
-    else:
-        return 'weak'
+    return starting_hand_category(hole_cards)
 
 def evaluate_poker_hand(hole_cards, community_cards):
-    """Evaluate poker hand strength (simplified without treys)"""
-    try:
-        if len(hole_cards) != 2:
-            return {"strength": "Invalid Hole Cards", "value": 0}
-        
-        # Pre-flop evaluation
-        if len(community_cards) == 0:
-            return {"strength": "Pre-flop", "value": 0}
-        
-        # Post-flop evaluation (simplified)
-        all_cards = hole_cards + community_cards
-        if len(all_cards) < 5:
-            return {"strength": "Incomplete", "value": 0}
-        
-        # Simple hand strength calculation
-        ranks = [card[:-1] for card in all_cards]
-        suits = [card[-1] for card in all_cards]
-        
-        # Count ranks
-        rank_counts = {}
-        for rank in ranks:
-            rank_counts[rank] = rank_counts.get(rank, 0) + 1
-        
-        # Count suits
-        suit_counts = {}
-        for suit in suits:
-            suit_counts[suit] = suit_counts.get(suit, 0) + 1
-        
-        # Determine hand type
-        max_rank_count = max(rank_counts.values()) if rank_counts else 0
-        max_suit_count = max(suit_counts.values()) if suit_counts else 0
-        
-        # Check for flush
-        is_flush = max_suit_count >= 5
-        
-        # Check for straight (simplified)
-        rank_values = [get_rank_value(rank) for rank in ranks]
-        rank_values.sort()
-        is_straight = False
-        for i in range(len(rank_values) - 4):
-            if rank_values[i+4] - rank_values[i] == 4:
-                is_straight = True
-                break
-        
-        # Determine hand strength
-        if is_flush and is_straight:
-            return {"strength": "Straight Flush", "value": 8}
-        elif max_rank_count >= 4:
-            return {"strength": "Four of a Kind", "value": 7}
-        elif max_rank_count >= 3 and len([v for v in rank_counts.values() if v >= 2]) >= 2:
-            return {"strength": "Full House", "value": 6}
-        elif is_flush:
-            return {"strength": "Flush", "value": 5}
-        elif is_straight:
-            return {"strength": "Straight", "value": 4}
-        elif max_rank_count >= 3:
-            return {"strength": "Three of a Kind", "value": 3}
-        elif len([v for v in rank_counts.values() if v >= 2]) >= 2:
-            return {"strength": "Two Pair", "value": 2}
-        elif max_rank_count >= 2:
-            return {"strength": "Pair", "value": 1}
-        else:
-            return {"strength": "High Card", "value": 0}
-            
-    except Exception as e:
-        print(f"Error evaluating hand: {e}")
-        return {"strength": "Evaluation Error", "value": 0}
+    """Evaluate poker hand strength from integer cards"""
+    if len(hole_cards) != 2:
+        return {"strength": "Invalid Hole Cards", "value": 0}
+    
+    # Pre-flop evaluation
+    if len(community_cards) == 0:
+        return {"strength": "Pre-flop", "value": 0}
+    
+    all_cards = hole_cards + community_cards
+    if len(all_cards) < 5:
+        return {"strength": "Incomplete", "value": 0}
+    
+    category = evaluate_category(all_cards)
+    return {"strength": HAND_NAMES[category], "value": category}
 
 def calculate_pot_odds(pot_size, bet_size):
     """Calculate pot odds percentage"""
@@ -336,13 +157,39 @@ def get_player_count_adjustment(num_players):
     """Adjust hand strength based on number of players"""
     return max(0.5, 1 - (num_players - 2) * 0.1)
 
-def generate_ai_recommendation(data):
-    """Generate AI recommendation based on professional GTO logic"""
+def validate_hand_data(data):
+    """Error message for an unusable analysis payload, or None"""
+    if not data or 'holeCards' not in data:
+        return 'Missing hole cards'
+    if not isinstance(data['holeCards'], list):
+        return 'holeCards must be a list of cards'
+    if len(data['holeCards']) != 2:
+        return 'Must provide exactly 2 hole cards'
+    if not isinstance(data.get('flop') or [], list):
+        return 'flop must be a list of cards'
+    num_players = data.get('numPlayers', 6)
+    if isinstance(num_players, bool) or not isinstance(num_players, int):
+        return 'numPlayers must be an integer'
+    return None
+
+def parse_hand_cards(data):
+    """Hole cards and community cards (flop, turn, river) of a payload as card ints"""
+    community_cards = list(data.get('flop') or [])
+    if data.get('turn'):
+        community_cards.append(data['turn'])
+    if data.get('river'):
+        community_cards.append(data['river'])
+    
+    # Parse the string cards into ints once; everything below works on ints
+    cards = parse_cards(data.get('holeCards', []) + community_cards)
+    return cards[:2], cards[2:]
+
+def generate_ai_recommendation(data, estimate=None):
+    """Generate AI recommendation based on professional GTO logic
+    
+    estimate is a precomputed estimate_equity() result, as the batch endpoint passes.
+    """
     
-    hole_cards = data.get('holeCards', [])
-    flop = data.get('flop', [])
-    turn = data.get('turn')
-    river = data.get('river')
     num_players = data.get('numPlayers', 6)
     position = data.get('position', 'middle')
     pot_size = data.get('potSize', 100)
@@ -351,19 +198,29 @@ def generate_ai_recommendation(data):
     big_blind = data.get('bigBlind', 2)
     stack_size = data.get('stackSize', 1000)
     
-    # Combine community cards
-    community_cards = flop.copy()
-    if turn:
-        community_cards.append(turn)
-    if river:
-        community_cards.append(river)
-    
-    # Calculate equity using Monte Carlo simulation
-    equity = monte_carlo_equity(hole_cards, community_cards, num_simulations=5000)
+    started = time.perf_counter()
+    hole_cards, community_cards = parse_hand_cards(data)
+    
+    # Calculate equity against every other player at the table, sampling
+    # only until it is accurate to ANALYSIS_PRECISION points
+    num_opponents = opponents_at_table(num_players)
+    if estimate is None:
+        with metrics.span('equity'):
+            estimate = estimate_equity(
+                hole_cards, community_cards, num_simulations=ANALYSIS_MAX_TRIALS,
+                num_opponents=num_opponents, precision=ANALYSIS_PRECISION,
+                time_limit=ANALYSIS_TIME_LIMIT
+            )
+    metrics.inc('poker_equity_estimates_total', method=estimate['method'])
+    equity = estimate['equity']
     
     # Pre-flop logic using GTO ranges
     if len(community_cards) == 0:
-        gto_result = get_gto_action(hole_cards, position, num_players, pot_size, bet_size, big_blind)
+        with metrics.span('gto'):
+            gto_result = get_gto_action(
+                hole_cards, position, num_players, pot_size, bet_size, big_blind,
+                stack_size / big_blind if big_blind else 100
+            )
         
         # Adjust for number of players
         if num_players > 6:
@@ -386,13 +243,15 @@ def generate_ai_recommendation(data):
         elif gto_result['action'] == 'raise':
             ev = round((pot_size + gto_result['raise_amount']) * 0.7 - gto_result['raise_amount'])  # Assume 70% equity for raising hands
         
-        return {
+        recommendation = {
             'action': gto_result['action'],
             'confidence': round(gto_result['confidence']),
             'raiseAmount': gto_result.get('raise_amount'),
             'bigBlind': big_blind,
             'handStrength': 'Pre-flop',
             'equity': round(equity, 1),
+            'equityTrials': estimate['trials'],
+            'equityError': estimate['error'],
             'potOdds': round(calculate_pot_odds(pot_size, bet_size)),
             'impliedOdds': round(calculate_implied_odds(pot_size, bet_size, stack_size, equity), 1),
             'ev': ev,
@@ -406,38 +265,44 @@ def generate_ai_recommendation(data):
         pot_odds = calculate_pot_odds(pot_size, bet_size)
         implied_odds = calculate_implied_odds(pot_size, bet_size, stack_size, equity)
         
-        # Enhanced post-flop logic using equity
-        if equity > 80:
+        # Enhanced post-flop logic using equity, with the heads-up cutoffs
+        # scaled to the number of opponents
+        if equity > equity_cutoff(80, num_opponents):
             action = 'raise'
             confidence = 90
             raise_amount = round(big_blind * 3.5)
             reasoning = f"Very strong hand with {equity:.1f}% equity. Value betting aggressively."
-        elif equity > 65:
+        elif equity > equity_cutoff(65, num_opponents):
             action = 'raise'
             confidence = 80
             raise_amount = round(big_blind * 3.0)
             reasoning = f"Strong hand with {equity:.1f}% equity. Value betting."
-        elif equity > 50:
+        elif equity > equity_cutoff(50, num_opponents):
             if pot_odds > 15:
                 action = 'call'
                 confidence = 70
+                raise_amount = None
                 reasoning = f"Decent hand with {equity:.1f}% equity and good pot odds ({pot_odds:.1f}%). Calling for value."
             else:
                 action = 'fold'
                 confidence = 65
+                raise_amount = None
                 reasoning = f"Decent hand with {equity:.1f}% equity but poor pot odds. Folding."
-        elif equity > 35:
+        elif equity > equity_cutoff(35, num_opponents):
             if implied_odds > pot_odds * 1.5:
                 action = 'call'
                 confidence = 60
+                raise_amount = None
                 reasoning = f"Weak hand with {equity:.1f}% equity but excellent implied odds ({implied_odds:.1f}%). Calling for implied odds."
             else:
                 action = 'fold'
                 confidence = 70
+                raise_amount = None
                 reasoning = f"Weak hand with {equity:.1f}% equity and poor implied odds. Folding."
         else:
             action = 'fold'
             confidence = 80
+            raise_amount = None
             reasoning = f"Very weak hand with {equity:.1f}% equity. Folding."
         
         # Calculate expected value
@@ -449,177 +314,381 @@ def generate_ai_recommendation(data):
             raise_amt = raise_amount if raise_amount else big_blind * 2.5
             ev = round((pot_size + raise_amt) * (equity / 100) - raise_amt)
         
-        return {
+        recommendation = {
             'action': action,
             'confidence': round(confidence),
             'raiseAmount': raise_amount,
             'bigBlind': big_blind,
             'handStrength': hand_evaluation['strength'],
             'equity': round(equity, 1),
+            'equityTrials': estimate['trials'],
+            'equityError': estimate['error'],
             'potOdds': round(calculate_pot_odds(pot_size, bet_size)),
             'impliedOdds': round(implied_odds, 1),
             'ev': ev,
             'reasoning': reasoning,
             'timestamp': datetime.now().isoformat()
         }
+    
+    metrics.observe('poker_analysis_seconds', time.perf_counter() - started, street=STREETS.get(len(community_cards), 'other'))
+    return recommendation
+
+def analysis_result(data):
+    """Recommendation for an /api/analyze payload; invalid payloads raise ValueError"""
+    # Validate required fields
+    error = validate_hand_data(data)
+    if error:
+        raise ValueError(error)
+    
+    recommendation = generate_ai_recommendation(data)
+    
+    # Log the analysis (in production, save to database)
+    with metrics.span('log'):
+        log_analysis(data, recommendation)
+    return recommendation
+
+def admin_authorized():
+    """True if the request carries the admin bearer token"""
+    expected = f'Bearer {ADMIN_TOKEN}'
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(request.headers.get('Authorization', ''), expected)
+
+def profile_requested():
+    """True if an admin sent X-Profile: 1 or this request falls in the profiling sample"""
+    return (request.headers.get('X-Profile') == '1' and admin_authorized()) or profiler.sampled()
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze_hand():
     """Analyze poker hand and provide AI recommendation"""
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        if not data or 'holeCards' not in data:
-            return jsonify({'error': 'Missing hole cards'}), 400
-        
-        if len(data['holeCards']) != 2:
-            return jsonify({'error': 'Must provide exactly 2 hole cards'}), 400
-        
-        # Generate recommendation
-        recommendation = generate_ai_recommendation(data)
-        
-        # Log the analysis (in production, save to database)
-        log_analysis(data, recommendation)
-        
-        return jsonify(recommendation)
+        with metrics.span('json_parse'):
+            data = request.get_json(silent=True)
+        
+        # Validate, generate and log the recommendation; bad input raises ValueError
+        with profiler.profile('/api/analyze') if profile_requested() else nullcontext() as profile:
+            recommendation = analysis_result(data)
+        with metrics.span('serialize'):
+            response = jsonify(recommendation)
+        if profile is not None and profile.saved:
+            response.headers['X-Profile-Id'] = profile.id
+        return response
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Analyze a list of hands in one request; results keep the input order
+    
+    Equity for all hands is computed together, so repeated and suit-isomorphic
+    spots are simulated once. A hand that fails validation gets an error entry
+    in its slot instead of failing the whole batch.
+    """
+    try:
+        data = request.get_json(silent=True)
+        hands = data.get('hands') if isinstance(data, dict) else data
+        
+        if not isinstance(hands, list) or not hands:
+            return jsonify({'error': 'Expected a list of hands'}), 400
+        if len(hands) > MAX_BATCH_HANDS:
+            return jsonify({'error': f'At most {MAX_BATCH_HANDS} hands per batch'}), 400
+        
+        # Validate and parse every hand before any simulation runs
+        spots = []
+        errors = {}
+        for i, hand in enumerate(hands):
+            error = validate_hand_data(hand) if isinstance(hand, dict) else 'Hand must be an object'
+            if not error:
+                try:
+                    hole_cards, community_cards = parse_hand_cards(hand)
+                    spots.append((i, hole_cards, community_cards, opponents_at_table(hand.get('numPlayers', 6))))
+                    continue
+                except (TypeError, ValueError) as e:
+                    error = str(e)
+            errors[i] = error
+        
+        estimates = batch_estimate_equity(
+            [spot[1:] for spot in spots], num_simulations=ANALYSIS_MAX_TRIALS, precision=ANALYSIS_PRECISION,
+            time_limit=min(ANALYSIS_TIME_LIMIT * max(len(spots), 1), ANALYSIS_BATCH_TIME_LIMIT)
+        )
+        
+        results = [{'error': errors[i]} if i in errors else None for i in range(len(hands))]
+        for (i, _, _, _), estimate in zip(spots, estimates):
+            try:
+                results[i] = generate_ai_recommendation(hands[i], estimate)
+            except (TypeError, ValueError) as e:
+                results[i] = {'error': str(e)}
+                continue
+            log_analysis(hands[i], results[i])
+        
+        return jsonify({'results': results})
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def read_ndjson_lines(stream, max_bytes=MAX_STREAM_LINE_BYTES):
+    """Yield (line number, raw line) from a byte stream without reading it all
+    
+    Lines longer than max_bytes are skipped to their end and yielded as None.
+    """
+    number = 0
+    while True:
+        line = stream.readline(max_bytes + 1)
+        if not line:
+            return
+        number += 1
+        if len(line) > max_bytes and not line.endswith(b'\n'):
+            # Drain the rest of an oversized line in bounded pieces
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_bytes)
+            yield number, None
+        elif line.strip():
+            yield number, line
+
+def analyze_ndjson_line(number, line):
+    """Recommendation (or error) for one hand-history line, tagged with its line number"""
+    if line is None:
+        return {'line': number, 'error': f'Line longer than {MAX_STREAM_LINE_BYTES} bytes'}
+    try:
+        data = json.loads(line)
+        error = validate_hand_data(data) if isinstance(data, dict) else 'Hand must be an object'
+        if error:
+            return {'line': number, 'error': error}
+        recommendation = generate_ai_recommendation(data)
+        log_analysis(data, recommendation)
+        return {'line': number, **recommendation}
+    except (TypeError, ValueError) as e:
+        # Bad input; json.JSONDecodeError is a ValueError too
+        return {'line': number, 'error': str(e)}
+    except Exception as e:
+        app.logger.exception("Stream line %d failed", number)
+        return {'line': number, 'error': str(e)}
+
+@app.route('/api/analyze/stream', methods=['POST'])
+def analyze_stream():
+    """Analyze a newline-delimited JSON upload, streaming one result line per hand
+    
+    The body is read one line at a time and each result is written as soon as
+    its hand is analyzed, so memory stays flat however large the upload is.
+    """
+    def generate():
+        for number, line in read_ndjson_lines(request.stream):
+            yield json.dumps(analyze_ndjson_line(number, line)) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def range_spec(value):
+    """A range from a JSON payload: a string or list of strings, never card ints"""
+    if isinstance(value, str) or (isinstance(value, list) and all(isinstance(token, str) for token in value)):
+        return value
+    raise ValueError('Ranges must be a string or a list of strings')
+
+def equity_result(data):
+    """Equity of a hand or range vs opponent range for an /api/equity payload"""
+    community_cards = parse_cards(data.get('communityCards', []))
+    opponent_range = range_spec(data.get('opponentRange', []))
+    
+    # Hero is either exact hole cards or a range like 'AKs' / 'TT+, AQs+'
+    if data.get('holeCards'):
+        player = parse_cards(data['holeCards'])
+        if len(player) != 2:
+            raise ValueError('Must provide exactly 2 hole cards')
+    else:
+        player = range_spec(data.get('playerRange') or data.get('playerHand', ''))
+    
+    if not player:
+        raise ValueError('Invalid hand notation')
+    if not opponent_range:
+        raise ValueError('Missing opponent range')
+    
+    equity = range_equity(player, opponent_range, community_cards)
+    
+    return {'equity': round(equity, 2)}
+
+# Work that can be submitted to the background job queue
+JOB_TYPES = {
+    'equity': equity_result,
+    'analyze': analysis_result,
+}
+
 @app.route('/api/equity', methods=['POST'])
 def calculate_equity():
-    """Calculate equity vs opponent range"""
+    """Calculate equity of a hand or range vs opponent range"""
     try:
-        data = request.get_json()
-        player_hand = data.get('playerHand', '')
-        opponent_range = data.get('opponentRange', [])
-        community_cards = data.get('communityCards', [])
-        
-        # Convert hand notation to actual cards for simulation
-        player_cards = convert_hand_notation_to_cards(player_hand)
-        
-        if not player_cards:
-            return jsonify({'error': 'Invalid hand notation'}), 400
-        
-        # Calculate equity using Monte Carlo simulation
-        equity = monte_carlo_equity_vs_range(player_cards, opponent_range, community_cards)
-        
-        return jsonify({'equity': equity})
+        data = request.get_json(silent=True) or {}
+        return jsonify(equity_result(data))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue an equity or analysis payload and return its job id right away"""
+    data = request.get_json(silent=True) or {}
+    kind = data.get('type')
+    payload = data.get('payload')
+    
+    if kind not in JOB_TYPES:
+        return jsonify({'error': f"Job type must be one of: {', '.join(JOB_TYPES)}"}), 400
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Missing job payload'}), 400
+    
+    try:
+        job = job_queue.submit(kind, JOB_TYPES[kind], payload)
+    except queue.Full:
+        # Backpressure: tell the client to retry instead of queueing without bound
+        response = jsonify({'error': 'Job queue is full, retry later'})
+        response.headers['Retry-After'] = '1'
+        return response, 429
+    
+    response = jsonify(job.to_dict())
+    response.headers['Location'] = f'/api/jobs/{job.id}'
+    return response, 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status and result; ?wait=N long-polls up to N seconds for completion"""
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), MAX_JOB_WAIT)
+    except ValueError:
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+    if not request.environ.get('wsgi.multithread'):
+        # Long-polling would hold the only request thread of this process
+        wait = 0
+    
+    job = job_queue.get(job_id, wait)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/stats', methods=['GET'])
+def job_stats():
+    """Job queue depth and worker counters for this process"""
+    return jsonify(job_queue.stats())
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
 
-def convert_hand_notation_to_cards(hand_notation):
-    """Convert poker hand notation to actual cards"""
-    if not hand_notation:
-        return []
-    
-    # Handle pairs
-    if len(hand_notation) == 2 and hand_notation[0] == hand_notation[1]:
-        rank = hand_notation[0]
-        return [f"{rank}♠", f"{rank}♥"]
-    
-    # Handle suited hands
-    if len(hand_notation) == 3 and hand_notation[2] == 's':
-        rank1, rank2 = hand_notation[0], hand_notation[1]
-        return [f"{rank1}♠", f"{rank2}♠"]
-    
-    # Handle offsuit hands
-    if len(hand_notation) == 3 and hand_notation[2] == 'o':
-        rank1, rank2 = hand_notation[0], hand_notation[1]
-        return [f"{rank1}♠", f"{rank2}♥"]
-    
-    # Handle high-low notation (e.g., AKs, QJo)
-    if len(hand_notation) >= 2:
-        rank1, rank2 = hand_notation[0], hand_notation[1]
-        if len(hand_notation) == 3 and hand_notation[2] == 's':
-            return [f"{rank1}♠", f"{rank2}♠"]
-        else:
-            return [f"{rank1}♠", f"{rank2}♥"]
-    
-    return []
+def store_filters():
+    """Analysis store filters (hand, position, street, since, until) from the query string"""
+    return {name: request.args.get(name) for name in FILTERS}
 
-def monte_carlo_equity_vs_range(player_cards, opponent_range, community_cards, num_simulations=5000):
-    """Calculate equity vs opponent range using Monte Carlo simulation"""
-    if len(player_cards) != 2:
-        return 0.0
-    
-    wins = 0
-    total_simulations = num_simulations
-    
-    # Create deck excluding known cards
-    ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-    suits = ['♠', '♥', '♦', '♣']
-    
-    known_cards = set(player_cards + community_cards)
-    deck = []
-    for rank in ranks:
-        for suit in suits:
-            card = f"{rank}{suit}"
-            if card not in known_cards:
-                deck.append(card)
-    
-    for _ in range(num_simulations):
-        # Shuffle remaining deck
-        random.shuffle(deck)
-        
-        # Complete the board
-        remaining_cards_needed = 5 - len(community_cards)
-        simulated_board = community_cards + deck[:remaining_cards_needed]
-        
-        # Generate random opponent hand from range
-        opponent_cards = generate_random_hand_from_range(opponent_range, deck[remaining_cards_needed:])
-        
-        if not opponent_cards:
-            continue
-        
-        # Evaluate both hands
-        player_hand = evaluate_poker_hand(player_cards, simulated_board)
-        opponent_hand = evaluate_poker_hand(opponent_cards, simulated_board)
-        
-        # Compare hands
-        if player_hand['value'] > opponent_hand['value']:
-            wins += 1
-        elif player_hand['value'] == opponent_hand['value']:
-            wins += 0.5  # Split pot
-    
-    return (wins / total_simulations) * 100
+@app.route('/api/analyses', methods=['GET'])
+def recent_analyses():
+    """Most recent stored analyses, optionally filtered"""
+    try:
+        try:
+            limit = max(1, min(int(request.args.get('limit', 50)), 1000))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        return jsonify({'analyses': analysis_store.recent(limit, **store_filters())})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-def generate_random_hand_from_range(range_hands, available_cards):
-    """Generate a random hand from the given range"""
-    if not range_hands or not available_cards:
-        return []
-    
-    # Select random hand from range
-    selected_hand = random.choice(range_hands)
-    
-    # Convert hand notation to cards
-    opponent_cards = convert_hand_notation_to_cards(selected_hand)
-    
-    # Ensure cards are available in deck
-    if len(opponent_cards) == 2:
-        card1, card2 = opponent_cards[0], opponent_cards[1]
-        if card1 in available_cards and card2 in available_cards:
-            return [card1, card2]
-    
-    return []
+@app.route('/api/analyses/actions', methods=['GET'])
+def action_frequencies():
+    """Recommended action frequencies per hand class and position"""
+    try:
+        return jsonify({'actions': analysis_store.action_frequencies(**store_filters())})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/analyses/streets', methods=['GET'])
+def street_summary():
+    """Analysis counts, mean equity and confidence per street and action"""
+    try:
+        return jsonify({'streets': analysis_store.street_summary(**store_filters())})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/log/stats', methods=['GET'])
+def log_stats():
+    """Analysis log writer counters for this worker process"""
+    return jsonify(analysis_log.stats())
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Equity cache hit/miss counters for this worker process"""
+    return jsonify(equity_cache.stats())
+
+def engine_metrics():
+    """Equity cache and simulation totals of this worker process for /api/metrics"""
+    cache, trials = equity_cache.stats(), trial_stats.stats()
+    return {
+        'poker_equity_cache_hits_total': cache['hits'],
+        'poker_equity_cache_misses_total': cache['misses'],
+        'poker_equity_cache_entries': cache['size'],
+        'poker_simulation_rounds_total': trials['runs'],
+        'poker_simulated_trials_total': trials['trials'],
+        'poker_simulation_seconds_total': trials['seconds'],
+        'poker_simulated_trials_per_second': trials['trialsPerSec'],
+    }
+
+metrics.add_collector(engine_metrics)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    """Observe the request latency under its route pattern, so ids in paths do not add series"""
+    if 'request_started' in g:
+        metrics.observe(
+            'poker_request_seconds', time.perf_counter() - g.request_started,
+            endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+            method=request.method, status=str(response.status_code)
+        )
+    return response
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Request, stage and engine metrics of this worker process in Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    """Summaries of the stored request profiles, newest first"""
+    if not admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify({'profiles': profiler.store.list()})
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """One profile as a collapsed-stack file for flamegraph.pl or speedscope"""
+    if not admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 403
+    collapsed = profiler.store.collapsed(profile_id)
+    if collapsed is None:
+        return jsonify({'error': 'Unknown profile'}), 404
+    return Response(collapsed, mimetype='text/plain', headers={
+        'Content-Disposition': f'attachment; filename={profile_id}.collapsed'
+    })
+
+@app.route('/api/ranges/stats', methods=['GET'])
+def ranges_stats():
+    """Loaded range files, reload counters and range problems for this worker process"""
+    return jsonify(range_book.stats())
 
 def log_analysis(hand_data, recommendation):
-    """Log hand analysis for future improvements"""
-    log_entry = {
+    """Log hand analysis for future improvements
+    
+    Records go on queues drained by background threads, one appending to the
+    JSONL log (analysis_log.py) and one inserting into the SQLite store
+    (analysis_store.py), so the request never waits on stdout or disk.
+    """
+    analysis_log.log({
         'timestamp': datetime.now().isoformat(),
         'hand_data': hand_data,
         'recommendation': recommendation
-    }
-    
-    # In production, save to database
-    # For now, just print to console
-    print(f"Analysis logged: {json.dumps(log_entry, indent=2)}")
+    })
+    analysis_store.record(hand_data, recommendation)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,262 @@
+"""Microbenchmarks for the poker engine hot paths
+
+Run from backend/:
+
+    python benchmark.py [--quick] [--only NAME ...] [--save results.json]
+    python benchmark.py --compare baseline.json [--threshold 0.1] [--save results.json]
+
+Each benchmark is warmed up, then timed call by call for at least
+--min-time seconds. Its p50/p99 latency, throughput (evaluations, trials
+or requests per second) and the peak and retained memory that tracemalloc
+sees over a few more calls are printed and saved as JSON. Baselines are
+machine specific, so save one on the machine you compare on. --compare
+runs the suite again, flags every benchmark whose throughput or median
+latency got worse than the baseline by more than --threshold (or whose
+peak memory grew by more), and exits with status 1 if any did.
+
+Spots come from a seeded RNG and equity calls bypass the result cache, so
+runs measure the same work every time.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from poker_engine import (
+    card_to_str, evaluate_many, hand_to_notation, monte_carlo_equity, monte_carlo_equity_vs_range
+)
+
+WARMUP_CALLS = 3
+MIN_CALLS = 20
+MAX_CALLS = 100000
+ALLOC_CALLS = 5
+
+# Opponent range for the vs-range benchmark (a typical button open)
+VS_RANGE = '22+, A2s+, K9s+, QTs+, JTs, T9s, 98s, ATo+, KJo+, QJo'
+
+BENCHMARKS = {}
+
+
+def benchmark(name, unit):
+    """Register a setup(rng) returning (fn, items per call) under name"""
+    def register(setup):
+        BENCHMARKS[name] = (setup, unit)
+        return setup
+    return register
+
+
+def random_spots(rng, count, board_size):
+    """count (hole cards, board) pairs of card ints"""
+    deals = [rng.permutation(52)[:2 + board_size].tolist() for _ in range(count)]
+    return [(deal[:2], deal[2:]) for deal in deals]
+
+
+@benchmark('evaluate_poker_hand', 'hands')
+def bench_evaluate_poker_hand(rng):
+    from app import evaluate_poker_hand
+    spots = itertools.cycle(random_spots(rng, 1000, 5))
+    return lambda: evaluate_poker_hand(*next(spots)), 1
+
+
+@benchmark('evaluate_many', 'hands')
+def bench_evaluate_many(rng):
+    hands = np.array([rng.permutation(52)[:7] for _ in range(100000)])
+    return lambda: evaluate_many(hands), len(hands)
+
+
+@benchmark('hand_to_notation', 'hands')
+def bench_hand_to_notation(rng):
+    holes = itertools.cycle(hole for hole, _ in random_spots(rng, 1000, 0))
+    return lambda: hand_to_notation(next(holes)), 1
+
+
+@benchmark('monte_carlo_equity', 'trials')
+def bench_monte_carlo_equity(rng):
+    spots = itertools.cycle(random_spots(rng, 100, 3))
+    return lambda: monte_carlo_equity(*next(spots), 10000, rng=rng, cache=None), 10000
+
+
+@benchmark('monte_carlo_equity_vs_range', 'trials')
+def bench_monte_carlo_equity_vs_range(rng):
+    spots = itertools.cycle(random_spots(rng, 100, 3))
+
+    def run():
+        hole, board = next(spots)
+        monte_carlo_equity_vs_range(hole, VS_RANGE, board, 5000, cache=None, rng=rng)
+    return run, 5000
+
+
+@benchmark('api_analyze', 'requests')
+def bench_api_analyze(rng):
+    import app as app_module
+    from analysis_log import AnalysisLog
+    from analysis_store import AnalysisStore
+    from poker_engine import equity_cache
+
+    # Keep the benchmark's analyses out of the real log and store. Both read
+    # their paths at import, which an earlier benchmark may already have done,
+    # so swap in scratch instances rather than setting POKER_LOG_DIR here.
+    scratch = tempfile.mkdtemp(prefix='poker_bench_')
+    app_module.analysis_log = AnalysisLog(directory=os.path.join(scratch, 'logs'))
+    app_module.analysis_store = AnalysisStore(path=os.path.join(scratch, 'analyses.db'))
+    app = app_module.app
+
+    client = app.test_client()
+    bodies = []
+    for index, (hole, board) in enumerate(random_spots(rng, 200, 5)):
+        street = [0, 3, 4, 5][index % 4]
+        board = [card_to_str(card) for card in board]
+        bodies.append(json.dumps({
+            'holeCards': [card_to_str(card) for card in hole],
+            'flop': board[:3] if street >= 3 else [],
+            'turn': board[3] if street >= 4 else None,
+            'river': board[4] if street == 5 else None,
+            'numPlayers': 6, 'position': 'button', 'potSize': 100, 'betSize': 20,
+        }))
+    bodies = itertools.cycle(bodies)
+
+    def run():
+        equity_cache.clear()
+        response = client.post('/api/analyze', data=next(bodies), content_type='application/json')
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/analyze returned {response.status_code}")
+    return run, 1
+
+
+def measure(fn, items_per_call, min_time):
+    """Latency percentiles, throughput and tracemalloc memory of repeated fn() calls"""
+    for _ in range(WARMUP_CALLS):
+        fn()
+    times = []
+    started = time.perf_counter()
+    while len(times) < MAX_CALLS and (len(times) < MIN_CALLS or time.perf_counter() - started < min_time):
+        call_started = time.perf_counter_ns()
+        fn()
+        times.append(time.perf_counter_ns() - call_started)
+    times = np.array(times) / 1000
+
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for _ in range(ALLOC_CALLS):
+            fn()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'calls': len(times),
+        'p50Us': round(float(np.percentile(times, 50)), 3),
+        'p99Us': round(float(np.percentile(times, 99)), 3),
+        'meanUs': round(float(times.mean()), 3),
+        'perSec': round(items_per_call * 1e6 / float(times.mean()), 1),
+        'allocPeakBytes': int(peak - baseline),
+        'allocRetainedBytes': int(max(retained - baseline, 0) // ALLOC_CALLS),
+    }
+
+
+def run_benchmarks(names=None, min_time=1.0, seed=2024):
+    """Results document for the named benchmarks (all by default)"""
+    results = {}
+    for name in names or BENCHMARKS:
+        setup, unit = BENCHMARKS[name]
+        fn, items_per_call = setup(np.random.default_rng(seed))
+        results[name] = dict(measure(fn, items_per_call, min_time), unit=unit)
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'minTime': min_time,
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.1):
+    """(rows, regressions) comparing two results documents benchmark by benchmark"""
+    rows, regressions = [], []
+    for name, new in current['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        speed = new['perSec'] / old['perSec'] - 1
+        latency = new['p50Us'] / old['p50Us'] - 1
+        # Ignore sub-kilobyte jitter in tiny allocations
+        memory_grew = new['allocPeakBytes'] > old['allocPeakBytes'] * (1 + threshold) + 1024
+        regressed = speed < -threshold or latency > threshold or memory_grew
+        row = {
+            'name': name, 'speedChange': round(speed, 4), 'p50Change': round(latency, 4),
+            'p99Change': round(new['p99Us'] / old['p99Us'] - 1, 4),
+            'allocPeakBytes': [old['allocPeakBytes'], new['allocPeakBytes']], 'regressed': regressed,
+        }
+        rows.append(row)
+        if regressed:
+            regressions.append(name)
+    return rows, regressions
+
+
+def print_results(document):
+    print(f"{'benchmark':30} {'p50 us':>12} {'p99 us':>12} {'peak KiB':>10}   throughput")
+    for name, result in document['results'].items():
+        print(
+            f"{name:30} {result['p50Us']:12.1f} {result['p99Us']:12.1f} {result['allocPeakBytes'] / 1024:10.1f}"
+            f"   {result['perSec']:,.0f} {result['unit']}/s"
+        )
+
+
+def print_comparison(rows, threshold):
+    print(f"\n{'benchmark':30} {'speed':>9} {'p50':>9} {'p99':>9} {'peak KiB':>20}")
+    for row in rows:
+        old_peak, new_peak = (size / 1024 for size in row['allocPeakBytes'])
+        print(
+            f"{row['name']:30} {row['speedChange']:+9.1%} {row['p50Change']:+9.1%} {row['p99Change']:+9.1%} "
+            f"{old_peak:9.1f} -> {new_peak:7.1f}{'  REGRESSION' if row['regressed'] else ''}"
+        )
+    print(f"(threshold {threshold:.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='benchmarks to run')
+    parser.add_argument('--min-time', type=float, default=1.0, help='seconds to time each benchmark for')
+    parser.add_argument('--quick', action='store_true', help='shorthand for --min-time 0.2')
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--save', help='write results as JSON to this path')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change counted as a regression')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    document = run_benchmarks(args.only, 0.2 if args.quick else args.min_time, args.seed)
+    print_results(document)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2)
+        print(f"Saved {args.save}")
+
+    if baseline is not None:
+        rows, regressions = compare(baseline, document, args.threshold)
+        print_comparison(rows, args.threshold)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,86 +3,32 @@ from flask_cors import CORS
 import os
 import json
 from datetime import datetime
-import random
+
+from poker_engine import (
+    ANALYSIS_MAX_TRIALS, ANALYSIS_PRECISION, ANALYSIS_TIME_LIMIT, HAND_NAMES, equity_cutoff, estimate_equity,
+    evaluate_category, hand_to_notation, opponents_at_table, parse_cards, starting_hand_category
+)
 
 # Create Flask app without any dotenv loading
 app = Flask(__name__)
 CORS(app)
 
 # Copy the core functions from app.py
-def get_rank_value(rank):
-    """Get rank value for comparison"""
-    ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-    return ranks.index(rank) if rank in ranks else -1
-
 def evaluate_poker_hand(hole_cards, community_cards):
-    """Evaluate poker hand strength (simplified without treys)"""
-    try:
-        if len(hole_cards) != 2:
-            return {"strength": "Invalid Hole Cards", "value": 0}
-        
-        # Pre-flop evaluation
-        if len(community_cards) == 0:
-            return {"strength": "Pre-flop", "value": 0}
-        
-        # Post-flop evaluation (simplified)
-        all_cards = hole_cards + community_cards
-        if len(all_cards) < 5:
-            return {"strength": "Incomplete", "value": 0}
-        
-        # Simple hand strength calculation
-        ranks = [card[:-1] for card in all_cards]
-        suits = [card[-1] for card in all_cards]
-        
-        # Count ranks
-        rank_counts = {}
-        for rank in ranks:
-            rank_counts[rank] = rank_counts.get(rank, 0) + 1
-        
-        # Count suits
-        suit_counts = {}
-        for suit in suits:
-            suit_counts[suit] = suit_counts.get(suit, 0) + 1
-        
-        # Determine hand type
-        max_rank_count = max(rank_counts.values()) if rank_counts else 0
-        max_suit_count = max(suit_counts.values()) if suit_counts else 0
-        
-        # Check for flush
-        is_flush = max_suit_count >= 5
-        
-        # Check for straight (simplified)
-        rank_values = [get_rank_value(rank) for rank in ranks]
-        rank_values.sort()
-        is_straight = False
-        for i in range(len(rank_values) - 4):
-            if rank_values[i+4] - rank_values[i] == 4:
-                is_straight = True
-                break
-        
-        # Determine hand strength
-        if is_flush and is_straight:
-            return {"strength": "Straight Flush", "value": 8}
-        elif max_rank_count >= 4:
-            return {"strength": "Four of a Kind", "value": 7}
-        elif max_rank_count >= 3 and len([v for v in rank_counts.values() if v >= 2]) >= 2:
-            return {"strength": "Full House", "value": 6}
-        elif is_flush:
-            return {"strength": "Flush", "value": 5}
-        elif is_straight:
-            return {"strength": "Straight", "value": 4}
-        elif max_rank_count >= 3:
-            return {"strength": "Three of a Kind", "value": 3}
-        elif len([v for v in rank_counts.values() if v >= 2]) >= 2:
-            return {"strength": "Two Pair", "value": 2}
-        elif max_rank_count >= 2:
-            return {"strength": "Pair", "value": 1}
-        else:
-            return {"strength": "High Card", "value": 0}
-            
-    except Exception as e:
-        print(f"Error evaluating hand: {e}")
-        return {"strength": "Evaluation Error", "value": 0}
+    """Evaluate poker hand strength from integer cards"""
+    if len(hole_cards) != 2:
+        return {"strength": "Invalid Hole Cards", "value": 0}
+    
+    # Pre-flop evaluation
+    if len(community_cards) == 0:
+        return {"strength": "Pre-flop", "value": 0}
+    
+    all_cards = hole_cards + community_cards
+    if len(all_cards) < 5:
+        return {"strength": "Incomplete", "value": 0}
+    
+    category = evaluate_category(all_cards)
+    return {"strength": HAND_NAMES[category], "value": category}
 
 def calculate_pot_odds(pot_size, bet_size):
     """Calculate pot odds percentage"""
@@ -90,100 +36,9 @@ def calculate_pot_odds(pot_size, bet_size):
         return 0
     return (pot_size / bet_size) * 100
 
-def monte_carlo_equity(hole_cards, community_cards, num_simulations=5000):
-    """Calculate equity using Monte Carlo simulation"""
-    if len(hole_cards) != 2:
-        return 0.0
-    
-    wins = 0
-    total_simulations = num_simulations
-    
-    # Create deck excluding known cards
-    ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-    suits = ['♠', '♥', '♦', '♣']
-    
-    known_cards = set(hole_cards + community_cards)
-    deck = []
-    for rank in ranks:
-        for suit in suits:
-            card = f"{rank}{suit}"
-            if card not in known_cards:
-                deck.append(card)
-    
-    for _ in range(num_simulations):
-        # Shuffle remaining deck
-        random.shuffle(deck)
-        
-        # Complete the board
-        remaining_cards_needed = 5 - len(community_cards)
-        simulated_board = community_cards + deck[:remaining_cards_needed]
-        
-        # Generate random opponent hand
-        opponent_cards = deck[remaining_cards_needed:remaining_cards_needed + 2]
-        
-        # Evaluate both hands
-        player_hand = evaluate_poker_hand(hole_cards, simulated_board)
-        opponent_hand = evaluate_poker_hand(opponent_cards, simulated_board)
-        
-        # Compare hands
-        if player_hand['value'] > opponent_hand['value']:
-            wins += 1
-        elif player_hand['value'] == opponent_hand['value']:
-            wins += 0.5  # Split pot
-    
-    return (wins / total_simulations) * 100
-
 def get_hand_category(hole_cards):
     """Get hand category based on PokerStars Starting Hand Rankings"""
-    card1 = hole_cards[0]
-    card2 = hole_cards[1]
-    rank1 = get_rank_value(card1[:-1])
-    rank2 = get_rank_value(card2[:-1])
-    is_suited = card1[-1] == card2[-1]
-    
-    # Create hand string (e.g., "AKs", "QJo")
-    if rank1 == rank2:
-        hand_str = f"{card1[:-1]}{card2[:-1]}"
-    else:
-        high_rank = card1[:-1] if rank1 > rank2 else card2[:-1]
-        low_rank = card2[:-1] if rank1 > rank2 else card1[:-1]
-        hand_str = f"{high_rank}{low_rank}{'s' if is_suited else 'o'}"
-    
-    # Top 5% of hands (premium)
-    top_5_percent = [
-        'AA', 'KK', 'QQ', 'JJ', 'TT', 'AKs', 'AKo', 'AQs', 'AQo', 'AJs', 'ATs'
-    ]
-    
-    # Top 10% of hands (strong)
-    top_10_percent = [
-        '99', '88', 'AKo', 'AJo', 'ATo', 'A9s', 'A8s', 'KQs', 'KQo', 'KJs', 'KJo', 'KTs', 'QJs', 'QJo'
-    ]
-    
-    # Top 20% of hands (playable)
-    playable_hands = [
-        '77', '66', '55', '44', '33', '22',
-        'A9o', 'A8o', 'A7o', 'A6o', 'A5o', 'A4o', 'A3o', 'A2o',
-        'KTo', 'K9s', 'K8s', 'K7s', 'K6s', 'K5s', 'K4s', 'K3s', 'K2s',
-        'QTs', 'QTo', 'Q9s', 'Q8s', 'Q7s', 'Q6s', 'Q5s', 'Q4s', 'Q3s', 'Q2s',
-        'JTs', 'JTo', 'J9s', 'J8s', 'J7s', 'J6s', 'J5s', 'J4s', 'J3s', 'J2s',
-        'T9s', 'T8s', 'T7s', 'T6s', 'T5s', 'T4s', 'T3s', 'T2s',
-        '98s', '97s', '96s', '95s', '94s', '93s', '92s',
-        '87s', '86s', '85s', '84s', '83s', '82s',
-        '76s', '75s', '74s', '73s', '72s',
-        '65s', '64s', '63s', '62s',
-        '54s', '53s', '52s',
-        '43s', '42s',
-        '32s'
-    ]
-    
-    if hand_str in top_5_percent:
-        return 'premium'
-    elif hand_str in top_10_percent:
-        return 'strong'
-    elif hand_str in playable_hands:
-        return 'playable'
-    else:
-        return 'weak'
+    return starting_hand_category(hole_cards)
 
 def generate_ai_recommendation(data):
     """Generate AI recommendation based on trusted poker logic with Monte Carlo simulation"""
@@ -207,8 +62,19 @@ def generate_ai_recommendation(data):
     if river:
         community_cards.append(river)
     
-    # Calculate equity using Monte Carlo simulation
-    equity = monte_carlo_equity(hole_cards, community_cards, num_simulations=5000)
+    # Parse the string cards into ints once; everything below works on ints
+    cards = parse_cards(hole_cards + community_cards)
+    hole_cards, community_cards = cards[:2], cards[2:]
+    hand_name = hand_to_notation(hole_cards)
+    
+    # Calculate equity against every other player at the table, sampling
+    # only until it is accurate to ANALYSIS_PRECISION points
+    num_opponents = opponents_at_table(num_players)
+    estimate = estimate_equity(
+        hole_cards, community_cards, num_simulations=ANALYSIS_MAX_TRIALS,
+        num_opponents=num_opponents, precision=ANALYSIS_PRECISION, time_limit=ANALYSIS_TIME_LIMIT
+    )
+    equity = estimate['equity']
     
     # Pre-flop logic using trusted ranges
     if len(community_cards) == 0:
@@ -220,46 +86,47 @@ def generate_ai_recommendation(data):
             action = 'raise'
             confidence = 85
             raise_amount = round(big_blind * 3.0)
-            reasoning = f"Premium hand {hole_cards[0][:-1]}{hole_cards[1][:-1]} with {equity:.1f}% equity. Always raise from any position."
+            reasoning = f"Premium hand {hand_name} with {equity:.1f}% equity. Always raise from any position."
         elif hand_category == 'strong':
             action = 'raise'
             confidence = 75
             raise_amount = round(big_blind * 2.5)
-            reasoning = f"Strong hand {hole_cards[0][:-1]}{hole_cards[1][:-1]} with {equity:.1f}% equity. Usually raise from {position} position."
+            reasoning = f"Strong hand {hand_name} with {equity:.1f}% equity. Usually raise from {position} position."
         elif hand_category == 'playable':
             if position in ['button', 'late']:
                 action = 'raise'
                 confidence = 60
                 raise_amount = round(big_blind * 2.0)
-                reasoning = f"Playable hand {hole_cards[0][:-1]}{hole_cards[1][:-1]} with {equity:.1f}% equity. Raise from late position."
+                reasoning = f"Playable hand {hand_name} with {equity:.1f}% equity. Raise from late position."
             else:
                 action = 'fold'
                 confidence = 70
                 raise_amount = None
-                reasoning = f"Playable hand {hole_cards[0][:-1]}{hole_cards[1][:-1]} with {equity:.1f}% equity. Fold from early position."
+                reasoning = f"Playable hand {hand_name} with {equity:.1f}% equity. Fold from early position."
         else:
             action = 'fold'
             confidence = 80
             raise_amount = None
-            reasoning = f"Weak hand {hole_cards[0][:-1]}{hole_cards[1][:-1]} with {equity:.1f}% equity. Fold from {position} position."
+            reasoning = f"Weak hand {hand_name} with {equity:.1f}% equity. Fold from {position} position."
     
     else:
         # Post-flop logic with Monte Carlo equity
         hand_evaluation = evaluate_poker_hand(hole_cards, community_cards)
         pot_odds = calculate_pot_odds(pot_size, bet_size)
         
-        # Enhanced post-flop logic using equity
-        if equity > 80:
+        # Enhanced post-flop logic using equity, with the heads-up cutoffs
+        # scaled to the number of opponents
+        if equity > equity_cutoff(80, num_opponents):
             action = 'raise'
             confidence = 90
             raise_amount = round(big_blind * 3.5)
             reasoning = f"Very strong hand with {equity:.1f}% equity. Value betting aggressively."
-        elif equity > 65:
+        elif equity > equity_cutoff(65, num_opponents):
             action = 'raise'
             confidence = 80
             raise_amount = round(big_blind * 3.0)
             reasoning = f"Strong hand with {equity:.1f}% equity. Value betting."
-        elif equity > 50:
+        elif equity > equity_cutoff(50, num_opponents):
             if pot_odds > 15:
                 action = 'call'
                 confidence = 70
@@ -270,7 +137,7 @@ def generate_ai_recommendation(data):
                 confidence = 65
                 raise_amount = None
                 reasoning = f"Decent hand with {equity:.1f}% equity but poor pot odds. Folding."
-        elif equity > 35:
+        elif equity > equity_cutoff(35, num_opponents):
             action = 'fold'
             confidence = 70
             raise_amount = None
@@ -303,6 +170,8 @@ def generate_ai_recommendation(data):
         'bigBlind': big_blind,
         'handStrength': hand_strength,
         'equity': round(equity, 1),
+        'equityTrials': estimate['trials'],
+        'equityError': estimate['error'],
         'potOdds': round(calculate_pot_odds(pot_size, bet_size)),
         'ev': ev,
         'reasoning': reasoning,
@@ -318,7 +187,7 @@ def health_check():
 def analyze_hand():
     """Analyze poker hand and provide AI recommendation"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
         
         # Validate required fields
         if not data or 'holeCards' not in data:
@@ -332,6 +201,8 @@ def analyze_hand():
         
         return jsonify(recommendation)
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
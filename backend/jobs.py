@@ -0,0 +1,121 @@
+"""In-process background job queue for slow equity and analysis requests
+
+Submitting a job returns at once with an id; a small pool of worker threads
+runs the jobs and clients poll (or long-poll) for the result. The queue of
+pending jobs is bounded, so a burst of slow requests is refused with
+queue.Full (HTTP 429 in app.py) instead of piling up. Finished jobs are kept
+for POKER_JOB_TTL seconds.
+
+Jobs live in the memory of the process that accepted them, so the app must
+run as a single process: a poll routed to another gunicorn worker would not
+find the job. The Procfile runs one gthread worker, whose request threads
+keep serving cheap requests while a client long-polls. Workers are started
+lazily on the first submit, so they belong to the serving process after the
+fork.
+"""
+import os
+import queue
+import threading
+import time
+import uuid
+
+
+class Job:
+    """One submitted unit of work and its outcome"""
+
+    def __init__(self, kind, fn, payload):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.fn = fn
+        self.payload = payload
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        job = {'jobId': self.id, 'type': self.kind, 'status': self.status}
+        if self.status == 'done':
+            job['result'] = self.result
+        elif self.status == 'failed':
+            job['error'] = self.error
+        return job
+
+
+class JobQueue:
+    """Bounded job queue served by a pool of worker threads"""
+
+    def __init__(self, workers=2, max_pending=100, ttl=600):
+        self.workers = workers
+        self.ttl = ttl
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._owner = None
+
+    def _start_workers(self):
+        with self._lock:
+            if self._owner == os.getpid():
+                return
+            self._owner = os.getpid()
+            for i in range(self.workers):
+                threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True).start()
+
+    def _work(self):
+        while True:
+            job = self._pending.get()
+            job.status = 'running'
+            try:
+                job.result = job.fn(job.payload)
+                job.status = 'done'
+            except Exception as e:
+                job.error = str(e)
+                job.status = 'failed'
+            job.finished = time.time()
+            job.payload = None
+            job.done.set()
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def submit(self, kind, fn, payload):
+        """Queue fn(payload) and return its Job; raises queue.Full when the queue is at capacity"""
+        self._start_workers()
+        self._prune()
+        job = Job(kind, fn, payload)
+        self._pending.put_nowait(job)
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id, wait=0):
+        """Job by id, waiting up to wait seconds for it to finish; None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None and wait > 0:
+            job.done.wait(wait)
+        return job
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            'workers': self.workers,
+            'pending': self._pending.qsize(),
+            'maxPending': self._pending.maxsize,
+            'running': statuses.count('running'),
+            'retained': len(statuses),
+        }
+
+
+job_queue = JobQueue(
+    workers=int(os.environ.get('POKER_JOB_WORKERS', 2)),
+    max_pending=int(os.environ.get('POKER_JOB_QUEUE_SIZE', 100)),
+    ttl=float(os.environ.get('POKER_JOB_TTL', 600)),
+)
@@ -0,0 +1,127 @@
+"""Per-player statistics kept up to date as results are appended
+
+Leaderboard follows the results index (see results_store.py): every call to
+current() applies only the rows appended since the last one, parsing their
+winners and other_players once, so serving the leaderboard costs
+O(players) however long the league history gets. Rows appended by another
+worker are picked up the same way. The statistics are replayed from the
+start only when the index is rebuilt or drops rows (the CSV was edited).
+
+A player's games are those listing them as a winner or in other_players;
+legacy rows without other_players only count their winners.
+"""
+import threading
+
+
+def player_names(text):
+    """Names in a comma-separated winners or other_players field"""
+    return [name.strip() for name in text.split(',') if name.strip()]
+
+
+class PlayerStats:
+    """Running totals for one player"""
+
+    __slots__ = ('name', 'games', 'wins', 'split_wins', 'pot_share', 'current_streak', 'best_streak', 'last_played')
+
+    def __init__(self, name):
+        self.name = name
+        self.games = 0
+        self.wins = 0
+        self.split_wins = 0
+        self.pot_share = 0.0  # Pots won, counting a split pot as 1 / number of winners
+        self.current_streak = 0  # Wins in a row up to the player's latest game
+        self.best_streak = 0
+        self.last_played = None
+
+    def record(self, day, won, winners, split):
+        self.games += 1
+        self.last_played = day
+        if won:
+            self.wins += 1
+            self.pot_share += 1 / winners if split else 1.0
+            self.split_wins += split
+            self.current_streak += 1
+            self.best_streak = max(self.best_streak, self.current_streak)
+        else:
+            self.current_streak = 0
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'games': self.games,
+            'wins': self.wins,
+            'splitWins': self.split_wins,
+            'potShare': round(self.pot_share, 3),
+            'winRate': round(self.wins / self.games, 3) if self.games else 0.0,
+            'splitShare': round(self.split_wins / self.wins, 3) if self.wins else 0.0,
+            'currentStreak': self.current_streak,
+            'bestStreak': self.best_streak,
+            'lastPlayed': self.last_played,
+        }
+
+
+class Leaderboard:
+    """Player statistics over every result in a ResultsStore"""
+
+    def __init__(self, store):
+        self.store = store
+        self._players = {}  # Case-folded name -> PlayerStats
+        self._games = 0
+        self._source = None  # (index, generation) the totals were built from
+        self._applied = 0  # Index rows applied so far
+        self._ranking = None
+        self._lock = threading.Lock()
+        self.replays = 0
+
+    def current(self):
+        """Bring the totals up to date with the results file"""
+        index = self.store.current()
+        if self._source != (index, index.generation) or self._applied != len(index):
+            with self._lock:
+                if self._source != (index, index.generation):
+                    self._players, self._games, self._applied = {}, 0, 0
+                    self._source = (index, index.generation)
+                    self.replays += 1
+                if self._applied < len(index):
+                    for result in self.store.results_between(index, self._applied, len(index)):
+                        self.add(result)
+                    self._applied = len(index)
+                    self._ranking = None
+        return self
+
+    def add(self, result):
+        """Apply one result dict (see results_store.result_dict)"""
+        winners = player_names(result['winners'])
+        winner_keys = {name.casefold() for name in winners}
+        seen = set()
+        for name in winners + player_names(result['other_players']):
+            key = name.casefold()
+            if key in seen:
+                continue
+            seen.add(key)
+            player = self._players.get(key)
+            if player is None:
+                player = self._players[key] = PlayerStats(name)
+            player.record(result['date'], key in winner_keys, len(winner_keys), result['split'])
+        self._games += 1
+        self._ranking = None
+
+    def ranking(self):
+        """Player dicts ordered by wins, then pot share, then name"""
+        self.current()
+        if self._ranking is None:
+            players = sorted(
+                self._players.values(), key=lambda player: (-player.wins, -player.pot_share, player.name.casefold())
+            )
+            self._ranking = [player.to_dict() for player in players]
+        return self._ranking
+
+    def player(self, name):
+        """Dict of one player's statistics, or None if they never played"""
+        self.current()
+        player = self._players.get(name.strip().casefold())
+        return player.to_dict() if player is not None else None
+
+    def stats(self):
+        self.current()
+        return {'games': self._games, 'players': len(self._players), 'replays': self.replays}
@@ -0,0 +1,158 @@
+"""Lightweight timing spans and counters served in Prometheus text format
+
+metrics.span('equity') times a block into the poker_stage_seconds
+histogram, observe() and inc() record other histograms and counters, and
+render() formats everything, plus the values of registered collectors, for
+/api/metrics. Values are kept per process, so under gunicorn each worker
+reports its own.
+
+Set POKER_METRICS=0 to disable: span() then hands back one shared no-op
+context manager and inc()/observe() return at once, so instrumented code
+costs no more than the method call.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+METRICS_ENABLED = os.environ.get('POKER_METRICS', '1') != '0'
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+METRIC_HELP = {
+    'poker_request_seconds': 'HTTP request latency by endpoint, method and status',
+    'poker_analysis_seconds': 'Time to generate one recommendation by street',
+    'poker_stage_seconds': 'Time spent in each stage of an analysis request',
+    'poker_equity_estimates_total': 'Equity estimates served by method (table, exact, sampled)',
+    'poker_equity_cache_hits_total': 'Equity cache hits',
+    'poker_equity_cache_misses_total': 'Equity cache misses',
+    'poker_equity_cache_entries': 'Entries in the equity cache',
+    'poker_simulation_rounds_total': 'Monte Carlo sampling rounds run',
+    'poker_simulated_trials_total': 'Monte Carlo trials run',
+    'poker_simulation_seconds_total': 'Seconds spent running Monte Carlo trials',
+    'poker_simulated_trials_per_second': 'Mean Monte Carlo trials per second of simulation time',
+}
+
+NULL_SPAN = nullcontext()
+
+
+def label_key(labels):
+    """Sorted tuple of (name, value) label pairs with every value as a string"""
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def sort_key(item):
+    """Sort key for ((name, labels), value) items that never compares mixed types"""
+    (name, labels), _ = item
+    return name, tuple((label, str(value)) for label, value in labels)
+
+
+def format_labels(labels):
+    """Prometheus label set for a sorted tuple of (name, value) pairs"""
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Span:
+    """Context manager observing its duration into poker_stage_seconds"""
+
+    __slots__ = ('metrics', 'key', 'started')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.key = ('poker_stage_seconds', (('stage', stage),))
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics._observe(self.key, time.perf_counter() - self.started)
+
+
+class Metrics:
+    """Process-wide counters and latency histograms"""
+
+    def __init__(self, enabled=METRICS_ENABLED, buckets=LATENCY_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._counters = {}
+        # (name, labels) -> [count per bucket..., count above the last bucket, sum]
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """Add value to a counter"""
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """Record one duration in a histogram"""
+        if self.enabled:
+            self._observe((name, label_key(labels)), seconds)
+
+    def _observe(self, key, seconds):
+        bucket = bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[bucket] += 1
+            histogram[-1] += seconds
+
+    def span(self, stage):
+        """Context manager timing one stage of a request"""
+        return Span(self, stage) if self.enabled else NULL_SPAN
+
+    def add_collector(self, collect):
+        """Call collect() on every render for extra {name: value} samples; *_total names are counters"""
+        self._collectors.append(collect)
+
+    def _header(self, name, kind):
+        return [f"# HELP {name} {METRIC_HELP.get(name, name)}", f"# TYPE {name} {kind}"]
+
+    def render(self):
+        """Every metric in Prometheus text exposition format"""
+        if not self.enabled:
+            return ''
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+        lines = []
+
+        for name in sorted({name for name, _ in histograms}):
+            lines += self._header(name, 'histogram')
+            for (metric, labels), values in sorted(histograms.items(), key=sort_key):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), values):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {values[-1]:.6f}")
+                lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+
+        for name in sorted({name for name, _ in counters}):
+            lines += self._header(name, 'counter')
+            for (metric, labels), value in sorted(counters.items(), key=sort_key):
+                if metric == name:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+
+        for collect in self._collectors:
+            for name, value in collect().items():
+                lines += self._header(name, 'counter' if name.endswith('_total') else 'gauge')
+                lines.append(f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
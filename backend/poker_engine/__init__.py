@@ -0,0 +1,17 @@
+"""Poker engine shared by app.py, clean_app.py and api/index.py"""
+from .cards import (
+    RANKS, SUITS, parse_card, parse_cards, card_to_str, card_rank, card_suit,
+    cards_to_mask, remaining_deck, hand_to_notation, notation_to_cards
+)
+from .evaluator import HAND_NAMES, evaluate, evaluate_category, evaluate_many, hand_category
+from .equity import (
+    ANALYSIS_BATCH_TIME_LIMIT, ANALYSIS_MAX_TRIALS, ANALYSIS_PRECISION, ANALYSIS_TIME_LIMIT, MAX_OPPONENTS,
+    batch_estimate_equity, equity_cutoff, estimate_equity, monte_carlo_equity, monte_carlo_equity_vs_range,
+    multiway_equity, opponents_at_table, range_equity, generate_random_hand_from_range
+)
+from .ranges import parse_range, range_combos
+from .handrange import HandRange, compile_ranges
+from .categories import HAND_CATEGORIES, TOP_20_HAND_CATEGORIES, starting_hand_category
+from .rangebook import RangeBook, range_book
+from .preflop import class_index, class_notation, preflop_equity, preflop_matchup
+from .cache import EquityCache, canonical_key, equity_cache
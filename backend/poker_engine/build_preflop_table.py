@@ -0,0 +1,103 @@
+"""Build the shipped preflop equity table (data/preflop_equity.bin)
+
+Run from backend/:
+
+    python -m poker_engine.build_preflop_table [--trials N] [--random-trials N]
+                                               [--multiway-trials N] [--seed S]
+
+Every class-vs-class matchup is simulated with --trials boards, every class
+against a random hand with --random-trials deals and every class against
+2-9 random hands with --multiway-trials deals. The matrix is
+filled for one side of each matchup and mirrored (equities sum to 100).
+"""
+import argparse
+import time
+
+import numpy as np
+
+from .equity import MAX_OPPONENTS, deal_around, showdown
+from .evaluator import evaluate_many
+from .preflop import NUM_CLASSES, TABLE_PATH, class_combos, write_table
+
+# Rows simulated per NumPy batch; bounds the (rows, 52) key matrix in memory
+BATCH_ROWS = 200000
+
+
+def _scores(hero, villain, boards):
+    """1 / 0.5 / 0 per row for a hero win / tie / loss"""
+    hero_values = evaluate_many(np.concatenate([hero, boards], axis=1))
+    villain_values = evaluate_many(np.concatenate([villain, boards], axis=1))
+    return (hero_values > villain_values) + 0.5 * (hero_values == villain_values)
+
+
+def simulate_matchups(pairs, trials, rng):
+    """Equity of the first class against the second for each (a, b) pair"""
+    hero_rows = []
+    villain_rows = []
+    for a, b in pairs:
+        valid = np.array([
+            (hero, villain) for hero in class_combos(a) for villain in class_combos(b)
+            if not set(hero) & set(villain)
+        ])
+        picked = valid[rng.integers(len(valid), size=trials)]
+        hero_rows.append(picked[:, 0])
+        villain_rows.append(picked[:, 1])
+    hero = np.concatenate(hero_rows)
+    villain = np.concatenate(villain_rows)
+    boards = deal_around(rng, np.concatenate([hero, villain], axis=1), 5)
+    return _scores(hero, villain, boards).reshape(len(pairs), trials).mean(axis=1) * 100
+
+
+def simulate_vs_random(classes, trials, rng, num_opponents=1):
+    """Pot-share equity of each class against num_opponents random hands"""
+    hero = np.concatenate([
+        np.array(class_combos(index))[rng.integers(len(class_combos(index)), size=trials)]
+        for index in classes
+    ])
+    drawn = deal_around(rng, hero, 5 + 2 * num_opponents)
+    holes = np.concatenate([hero[:, None, :], drawn[:, :-5].reshape(len(hero), num_opponents, 2)], axis=1)
+    shares, _, _ = showdown(holes, drawn[:, -5:])
+    return shares.reshape(len(classes), trials).mean(axis=1) * 100
+
+
+def build(trials, random_trials, multiway_trials, rng, log=print):
+    """Compute the (matrix, vs_random rows) equity tables"""
+    matrix = np.full((NUM_CLASSES, NUM_CLASSES), 50.0)
+    pairs = [(a, b) for a in range(NUM_CLASSES) for b in range(a + 1, NUM_CLASSES)]
+    step = max(1, BATCH_ROWS // trials)
+    for start in range(0, len(pairs), step):
+        chunk = pairs[start:start + step]
+        equities = simulate_matchups(chunk, trials, rng)
+        for (a, b), equity in zip(chunk, equities):
+            matrix[a, b] = equity
+            matrix[b, a] = 100 - equity
+        log(f"  matchups {min(start + step, len(pairs))}/{len(pairs)}")
+
+    vs_random = np.zeros((MAX_OPPONENTS, NUM_CLASSES))
+    for num_opponents in range(1, MAX_OPPONENTS + 1):
+        deals = random_trials if num_opponents == 1 else multiway_trials
+        step = max(1, BATCH_ROWS // deals)
+        for start in range(0, NUM_CLASSES, step):
+            classes = list(range(start, min(start + step, NUM_CLASSES)))
+            vs_random[num_opponents - 1, classes] = simulate_vs_random(classes, deals, rng, num_opponents)
+        log(f"  vs {num_opponents} random hands")
+    return matrix, vs_random
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trials', type=int, default=10000, help='boards per class-vs-class matchup')
+    parser.add_argument('--random-trials', type=int, default=200000, help='deals per class vs a random hand')
+    parser.add_argument('--multiway-trials', type=int, default=100000, help='deals per class vs 2-9 random hands')
+    parser.add_argument('--seed', type=int, default=169)
+    parser.add_argument('--output', default=TABLE_PATH)
+    args = parser.parse_args()
+
+    started = time.time()
+    matrix, vs_random = build(args.trials, args.random_trials, args.multiway_trials, np.random.default_rng(args.seed))
+    write_table(args.output, matrix, vs_random)
+    print(f"Wrote {args.output} in {time.time() - started:.0f}s")
+
+
+if __name__ == '__main__':
+    main()
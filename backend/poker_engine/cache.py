@@ -0,0 +1,102 @@
+"""Suit-isomorphic equity result cache
+
+Equity does not change when suits are renamed consistently, so A♠K♠ on
+Q♠J♥2♦ and A♥K♥ on Q♥J♠2♦ are the same spot. canonical_key() maps a spot to
+the smallest of its 24 suit relabelings, and EquityCache stores results under
+that key so repeated or isomorphic spots skip simulation.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import permutations
+
+SUIT_PERMUTATIONS = list(permutations(range(4)))
+
+# For each permutation, the card int each card maps to
+CARD_PERMUTATIONS = [
+    [(card & ~3) | perm[card & 3] for card in range(52)] for perm in SUIT_PERMUTATIONS
+]
+
+
+def canonical_key(hole_cards, community_cards):
+    """Suit-isomorphic key of a (hole cards, board) spot; card order is ignored"""
+    best = None
+    for mapping in CARD_PERMUTATIONS:
+        key = (
+            tuple(sorted(mapping[card] for card in hole_cards)),
+            tuple(sorted(mapping[card] for card in community_cards)),
+        )
+        if best is None or key < best:
+            best = key
+    return best
+
+
+class EquityCache:
+    """Thread-safe LRU cache with a per-entry time to live"""
+
+    def __init__(self, maxsize=10000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Cached value for key, or None on a miss or expired entry"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entry when full"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, computing and storing it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+equity_cache = EquityCache(
+    maxsize=int(os.environ.get('POKER_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('POKER_CACHE_TTL', 3600)),
+)
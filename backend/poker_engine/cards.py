@@ -0,0 +1,104 @@
+"""Integer card encoding shared by all poker backends.
+
+The frontend sends cards as strings such as "10♠" or "A♥". They are parsed
+once at the API boundary into ints in 0..51 where card = rank * 4 + suit
+(rank 0 is a deuce, rank 12 an ace), so simulation and evaluation only ever
+do integer arithmetic and table lookups.
+"""
+
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
+SUITS = ['♠', '♥', '♦', '♣']
+
+# Accept both the frontend's "10" and the usual "T", plus ASCII suit letters
+RANK_INDEX = {rank: i for i, rank in enumerate(RANKS)}
+RANK_INDEX['10'] = RANK_INDEX['T']
+RANK_INDEX.update({rank.lower(): i for rank, i in list(RANK_INDEX.items()) if rank.isalpha()})
+SUIT_INDEX = {suit: i for i, suit in enumerate(SUITS)}
+SUIT_INDEX.update({'s': 0, 'h': 1, 'd': 2, 'c': 3, 'S': 0, 'H': 1, 'D': 2, 'C': 3})
+
+# Display form used by the frontend (ten is "10", not "T")
+DISPLAY_RANKS = RANKS[:8] + ['10'] + RANKS[9:]
+
+FULL_DECK = list(range(52))
+
+
+def make_card(rank, suit):
+    """Build a card int from a rank index (0-12) and suit index (0-3)"""
+    return rank * 4 + suit
+
+
+def card_rank(card):
+    """Rank index of a card (0 = deuce, 12 = ace)"""
+    return card >> 2
+
+
+def card_suit(card):
+    """Suit index of a card"""
+    return card & 3
+
+
+def parse_card(card):
+    """Parse a card string like "10♠" or "Ah" into a card int"""
+    if isinstance(card, int):
+        if 0 <= card < 52:
+            return card
+        raise ValueError(f"Invalid card: {card}")
+    if not isinstance(card, str) or len(card) < 2:
+        raise ValueError(f"Invalid card: {card!r}")
+    rank = RANK_INDEX.get(card[:-1])
+    suit = SUIT_INDEX.get(card[-1])
+    if rank is None or suit is None:
+        raise ValueError(f"Invalid card: {card!r}")
+    return rank * 4 + suit
+
+
+def parse_cards(cards):
+    """Parse a list of card strings, rejecting duplicates"""
+    parsed = [parse_card(card) for card in cards]
+    if len(set(parsed)) != len(parsed):
+        raise ValueError('Duplicate cards')
+    return parsed
+
+
+def card_to_str(card):
+    """Format a card int the way the frontend displays it"""
+    return DISPLAY_RANKS[card >> 2] + SUITS[card & 3]
+
+
+def cards_to_mask(cards):
+    """Bitmask with one bit set per card"""
+    mask = 0
+    for card in cards:
+        mask |= 1 << card
+    return mask
+
+
+def remaining_deck(dead_cards):
+    """All cards not in dead_cards, in deck order"""
+    dead = cards_to_mask(dead_cards)
+    return [card for card in FULL_DECK if not dead >> card & 1]
+
+
+def hand_to_notation(hole_cards):
+    """Convert two card ints to notation (e.g. J♠ T♥ -> 'JTo', pairs -> 'JJ')"""
+    if len(hole_cards) != 2:
+        return None
+    rank1, rank2 = hole_cards[0] >> 2, hole_cards[1] >> 2
+    if rank1 == rank2:
+        return RANKS[rank1] * 2
+    high, low = (rank1, rank2) if rank1 > rank2 else (rank2, rank1)
+    suited = (hole_cards[0] & 3) == (hole_cards[1] & 3)
+    return RANKS[high] + RANKS[low] + ('s' if suited else 'o')
+
+
+def notation_to_cards(hand_notation):
+    """One concrete combo for a notation like 'AKs' or 'QQ' (spades/hearts first)"""
+    if not hand_notation or len(hand_notation) < 2:
+        return []
+    rank1 = RANK_INDEX.get(hand_notation[0])
+    rank2 = RANK_INDEX.get(hand_notation[1])
+    if rank1 is None or rank2 is None:
+        return []
+    if rank1 != rank2 and hand_notation[2:] == 's':
+        return [rank1 * 4, rank2 * 4]
+    return [rank1 * 4, rank2 * 4 + 1]
@@ -0,0 +1,62 @@
+"""PokerStars starting hand categories compiled to HandRange lookups
+
+A categories list holds (category, HandRange) pairs that
+starting_hand_category() checks in order; a hand in none of them is
+'weak'. Every backend shares the premium and strong tiers. HAND_CATEGORIES
+has the broad playable tier app.py and clean_app.py rate hands with;
+TOP_20_HAND_CATEGORIES has the narrower top-20% tier of the Vercel backend
+(api/index.py), which plays fewer offsuit and weak suited hands.
+"""
+from .handrange import HandRange
+
+# Top 5% of hands
+PREMIUM_HANDS = ['AA', 'KK', 'QQ', 'JJ', 'TT', 'AKs', 'AKo', 'AQs', 'AQo', 'AJs', 'ATs']
+
+# Top 10% of hands
+STRONG_HANDS = ['99', '88', 'AKo', 'AJo', 'ATo', 'A9s', 'A8s', 'KQs', 'KQo', 'KJs', 'KJo', 'KTs', 'QJs', 'QJo']
+
+# Playable hands of app.py and clean_app.py
+PLAYABLE_HANDS = [
+    '77', '66', '55', '44', '33', '22',
+    'A9o', 'A8o', 'A7o', 'A6o', 'A5o', 'A4o', 'A3o', 'A2o',
+    'KTo', 'K9s', 'K8s', 'K7s', 'K6s', 'K5s', 'K4s', 'K3s', 'K2s',
+    'QTs', 'QTo', 'Q9s', 'Q8s', 'Q7s', 'Q6s', 'Q5s', 'Q4s', 'Q3s', 'Q2s',
+    'JTs', 'JTo', 'J9s', 'J8s', 'J7s', 'J6s', 'J5s', 'J4s', 'J3s', 'J2s',
+    'T9s', 'T8s', 'T7s', 'T6s', 'T5s', 'T4s', 'T3s', 'T2s',
+    '98s', '97s', '96s', '95s', '94s', '93s', '92s',
+    '87s', '86s', '85s', '84s', '83s', '82s',
+    '76s', '75s', '74s', '73s', '72s',
+    '65s', '64s', '63s', '62s',
+    '54s', '53s', '52s',
+    '43s', '42s',
+    '32s'
+]
+
+# Top 20% of hands, the playable tier of api/index.py
+TOP_20_HANDS = [
+    '77', '66', '55', 'A7s', 'A6s', 'A5s', 'A4s', 'A3s', 'A2s', 'KTo', 'K9s', 'K8s', 'QTo', 'Q9s', 'Q8s', 'JTo',
+    'J9s', 'J8s', 'T9s', 'T8s', '98s', '97s', '87s', '86s', '76s', '65s', '54s'
+]
+
+
+def compile_categories(playable_hands):
+    """Premium, strong and the given playable tier as (category, HandRange) pairs"""
+    return [
+        ('premium', HandRange.parse(PREMIUM_HANDS)),
+        ('strong', HandRange.parse(STRONG_HANDS)),
+        ('playable', HandRange.parse(playable_hands)),
+    ]
+
+
+HAND_CATEGORIES = compile_categories(PLAYABLE_HANDS)
+TOP_20_HAND_CATEGORIES = compile_categories(TOP_20_HANDS)
+
+
+def starting_hand_category(hole_cards, categories=HAND_CATEGORIES):
+    """First category whose range holds two hole card ints, else 'weak'"""
+    if len(hole_cards) != 2:
+        return 'weak'
+    for category, hands in categories:
+        if hole_cards in hands:
+            return category
+    return 'weak'
@@ -0,0 +1,536 @@
+"""Equity simulation on integer cards
+
+monte_carlo_equity() deals every trial at once: each row of a (trials, deck)
+matrix of random keys picks its cards by taking the smallest keys, which is
+sampling without replacement per row, and the runout plus every opponent's
+hand is evaluated for the whole batch in one pass. When the remaining
+heads-up runouts and opponent hands are few enough (turn and river spots)
+it enumerates all of them instead and returns the exact equity. Preflop
+spots are answered from the precomputed table in preflop.py, and other
+results are cached by suit-isomorphic spot (cache.py). range_equity() does
+the same for weighted ranges on both sides (ranges.py), and
+batch_estimate_equity() shares the sampling passes between many spots.
+"""
+import os
+import time
+from functools import lru_cache
+from itertools import combinations
+from math import comb
+
+import numpy as np
+
+from .cache import canonical_key, equity_cache
+from .cards import remaining_deck
+from .evaluator import (
+    NP_CARD_RANK_KEY, NP_CARD_SUIT_KEY, evaluate_many, strengths_from_sums
+)
+from .parallel import run_trials, trial_stats
+from .preflop import preflop_equity
+from .ranges import is_cards, is_explicit, range_combos, range_tokens
+
+
+def deal(rng, deck, num_trials, num_cards):
+    """Deal num_cards distinct cards from deck for each of num_trials rows"""
+    keys = rng.random((num_trials, len(deck)))
+    if num_cards < len(deck):
+        picked = np.argpartition(keys, num_cards, axis=1)[:, :num_cards]
+    else:
+        picked = np.broadcast_to(np.arange(len(deck)), keys.shape)
+    # argpartition leaves the picked cards in no particular order, so order
+    # them by their random keys before assigning board and hole positions
+    order = np.argsort(np.take_along_axis(keys, picked, axis=1), axis=1)
+    return deck[np.take_along_axis(picked, order, axis=1)]
+
+
+# Largest number of (runout, opponent hand) outcomes to enumerate exactly;
+# the default covers every turn spot (46 rivers x 990 hands = 45,540)
+EXACT_ENUMERATION_BUDGET = int(os.environ.get('POKER_EXACT_BUDGET', 50000))
+
+
+def count_outcomes(community_cards):
+    """Number of (runout, opponent hand) outcomes left on a heads-up board"""
+    unknown = 50 - len(community_cards)
+    board_needed = 5 - len(community_cards)
+    return comb(unknown, board_needed) * comb(unknown - board_needed, 2)
+
+
+@lru_cache(maxsize=None)
+def _outcome_indices(deck_size, board_needed):
+    """Deck positions of every (runout, opponent hand) pair that shares no card"""
+    runouts = np.array(list(combinations(range(deck_size), board_needed)), dtype=np.intp)
+    runouts = runouts.reshape(comb(deck_size, board_needed), board_needed)
+    hands = np.array(list(combinations(range(deck_size), 2)), dtype=np.intp)
+
+    deck_bits = np.left_shift(1, np.arange(deck_size, dtype=np.int64))
+    runout_masks = deck_bits[runouts].sum(axis=1)
+    hand_masks = deck_bits[hands].sum(axis=1)
+    runout_index, hand_index = np.nonzero((runout_masks[:, None] & hand_masks[None, :]) == 0)
+    return runouts, hands, runout_index, hand_index
+
+
+def exact_equity(hole_cards, community_cards):
+    """Equity (0-100) of hole_cards against one random hand, by enumeration"""
+    if len(hole_cards) != 2:
+        return 0.0
+
+    deck = np.array(remaining_deck(hole_cards + community_cards))
+    runouts, hands, runout_index, hand_index = _outcome_indices(len(deck), 5 - len(community_cards))
+
+    known_board = np.broadcast_to(np.array(community_cards, dtype=deck.dtype), (len(runouts), len(community_cards)))
+    boards = np.concatenate([known_board, deck[runouts]], axis=1)
+    hole = np.broadcast_to(np.array(hole_cards, dtype=deck.dtype), (len(runouts), 2))
+    hand_cards = deck[hands]
+
+    # The hero's hand only depends on the runout, so score it once per runout
+    player_values = evaluate_many(np.concatenate([hole, boards], axis=1))[runout_index]
+
+    # Opponent sums are board sums plus hand sums; no need to gather 7 cards per outcome
+    rank_keys = NP_CARD_RANK_KEY[boards].sum(axis=1)[runout_index] + NP_CARD_RANK_KEY[hand_cards].sum(axis=1)[hand_index]
+    suit_sums = NP_CARD_SUIT_KEY[boards].sum(axis=1)[runout_index] + NP_CARD_SUIT_KEY[hand_cards].sum(axis=1)[hand_index]
+    opponent_values = strengths_from_sums(
+        rank_keys, suit_sums,
+        lambda rows: np.concatenate([hand_cards[hand_index[rows]], boards[runout_index[rows]]], axis=1)
+    )
+
+    wins = np.count_nonzero(player_values > opponent_values)
+    ties = np.count_nonzero(player_values == opponent_values)
+    return float((wins + 0.5 * ties) / len(runout_index) * 100)
+
+
+def deal_around(rng, dead_cards, num_cards):
+    """Deal num_cards per row from the full deck, skipping each row's dead cards
+
+    dead_cards is an int array with one row of known cards per trial.
+    """
+    keys = rng.random((len(dead_cards), 52))
+    np.put_along_axis(keys, np.asarray(dead_cards), 2.0, axis=1)
+    picked = np.argpartition(keys, num_cards, axis=1)[:, :num_cards]
+    order = np.argsort(np.take_along_axis(keys, picked, axis=1), axis=1)
+    return np.take_along_axis(picked, order, axis=1)
+
+
+# Opponents at a full ten-handed table
+MAX_OPPONENTS = 9
+
+
+def opponents_at_table(num_players):
+    """Opponents facing the hero at a table of num_players, clamped to 1..MAX_OPPONENTS"""
+    return min(max(int(num_players) - 1, 1), MAX_OPPONENTS)
+
+
+def equity_cutoff(heads_up_cutoff, num_opponents):
+    """Equity against num_opponents that is as good as heads_up_cutoff is heads-up
+
+    The fair share 100 / (num_opponents + 1) takes the place of 50, and
+    cutoffs below or above it are scaled linearly into [0, fair share] or
+    [fair share, 100], so heads-up cutoffs carry over to any table size.
+    """
+    fair_share = 100 / (num_opponents + 1)
+    if heads_up_cutoff <= 50:
+        return heads_up_cutoff * fair_share / 50
+    return fair_share + (heads_up_cutoff - 50) * (100 - fair_share) / 50
+
+
+def sampled_counts(hole_cards, community_cards, num_opponents, num_trials, rng):
+    """(pot share, trials, wins, ties, squared shares) of hole_cards against num_opponents random hands
+
+    Every trial deals the runout and all opponent hands at once and scores
+    all players in one vectorised pass. A tie splits the pot between the
+    tied players.
+    """
+    deck = np.array(remaining_deck(hole_cards + community_cards))
+    board_needed = 5 - len(community_cards)
+    drawn = deal(rng, deck, num_trials, board_needed + 2 * num_opponents)
+
+    known_board = np.broadcast_to(np.array(community_cards, dtype=deck.dtype), (num_trials, len(community_cards)))
+    board = np.concatenate([known_board, drawn[:, :board_needed]], axis=1)
+    hero = np.broadcast_to(np.array(hole_cards, dtype=deck.dtype), (num_trials, 1, 2))
+    holes = np.concatenate([hero, drawn[:, board_needed:].reshape(num_trials, num_opponents, 2)], axis=1)
+
+    shares, wins, ties = showdown(holes, board)
+    return float(shares.sum()), num_trials, int(wins.sum()), int(ties.sum()), float((shares ** 2).sum())
+
+
+def showdown(holes, board):
+    """Per-row (pot share, win, tie) of the first player in holes
+
+    holes has shape (trials, players, 2) and board (trials, 5). Each hand's
+    rank-key and suit sums are the board's sums plus its two hole cards', so
+    the board is only gathered once per trial however many players there are.
+    """
+    rank_keys = NP_CARD_RANK_KEY[board].sum(axis=1)[:, None] + NP_CARD_RANK_KEY[holes].sum(axis=2)
+    suit_sums = NP_CARD_SUIT_KEY[board].sum(axis=1)[:, None] + NP_CARD_SUIT_KEY[holes].sum(axis=2)
+    values = strengths_from_sums(
+        rank_keys, suit_sums, lambda rows: np.concatenate([holes[rows], board[rows[0]]], axis=1)
+    )
+
+    best = values.max(axis=1)
+    hero_best = values[:, 0] == best
+    sharing = np.count_nonzero(values == best[:, None], axis=1)
+    return hero_best / sharing, hero_best & (sharing == 1), hero_best & (sharing > 1)
+
+
+# z-score of the two-sided 95% interval reported as the error bound
+CONFIDENCE_Z = 1.96
+
+# First round of an adaptive run, smallest later round, and largest round so
+# a deadline is never overshot by much
+MIN_ADAPTIVE_TRIALS = 2000
+MAX_ADAPTIVE_ROUND = 50000
+
+# Defaults the API backends analyse with: +/- equity points at 95% confidence,
+# seconds per spot, seconds for a whole batch and the trial cap
+ANALYSIS_PRECISION = float(os.environ.get('POKER_EQUITY_PRECISION', 0.5))
+ANALYSIS_TIME_LIMIT = float(os.environ.get('POKER_EQUITY_TIME_LIMIT', 0.5))
+ANALYSIS_BATCH_TIME_LIMIT = float(os.environ.get('POKER_EQUITY_BATCH_TIME_LIMIT', 10.0))
+ANALYSIS_MAX_TRIALS = int(os.environ.get('POKER_EQUITY_MAX_TRIALS', 100000))
+
+
+def finished(estimate, num_simulations, precision):
+    """Whether a sampled estimate ran its trials or met precision, rather than running out of time"""
+    return estimate['trials'] >= num_simulations or (precision is not None and estimate['error'] <= precision)
+
+
+def error_bound(share, share_sq, trials):
+    """95% confidence half-width, in equity points, of a mean pot share (scalars or arrays)"""
+    trials = np.maximum(trials, 1)
+    variance = np.maximum(share_sq / trials - (share / trials) ** 2, 0.0)
+    return np.where(trials > 1, CONFIDENCE_Z * np.sqrt(variance / np.maximum(trials - 1, 1)) * 100, 100.0)
+
+
+def adaptive_trials(counts_fn, args, max_trials, rng=None, workers=None, precision=None, time_limit=None):
+    """Run counts_fn in rounds until the error bound is within precision
+
+    Stops early once error_bound() <= precision, time_limit seconds have
+    passed or max_trials have run. Each round is sized from the current
+    variance to what should reach the target. counts_fn must return
+    (share, trials, ..., share_sq) with the sum of squared shares last.
+    """
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    counts = None
+    round_trials = min(MIN_ADAPTIVE_TRIALS, max_trials)
+    while True:
+        chunk = run_trials(counts_fn, args, round_trials, rng, workers)
+        counts = chunk if counts is None else tuple(a + b for a, b in zip(counts, chunk))
+        share, trials, share_sq = counts[0], counts[1], counts[-1]
+
+        remaining = max_trials - trials
+        if remaining <= 0 or (deadline is not None and time.monotonic() >= deadline):
+            return counts
+        needed = remaining
+        if precision is not None:
+            error = float(error_bound(share, share_sq, trials))
+            if error <= precision:
+                return counts
+            # The error shrinks with the square root of the trials
+            needed = trials * (error / precision) ** 2 - trials
+        round_trials = int(min(remaining, MAX_ADAPTIVE_ROUND, max(needed, MIN_ADAPTIVE_TRIALS)))
+
+
+def multiway_equity(hole_cards, community_cards, num_opponents=1, num_simulations=10000, rng=None,
+                    workers=None, precision=None, time_limit=None):
+    """Win, tie and pot-share equity (0-100) of hole_cards against num_opponents random hands
+
+    Also returns the trials run and the 95% error bound of the equity. With
+    precision (equity points) or time_limit (seconds) set, sampling stops as
+    soon as either is met and num_simulations is only an upper bound.
+    """
+    if not 1 <= num_opponents <= MAX_OPPONENTS:
+        raise ValueError(f"Number of opponents must be between 1 and {MAX_OPPONENTS}")
+    args = (hole_cards, community_cards, num_opponents)
+    if precision is None and time_limit is None:
+        counts = run_trials(sampled_counts, args, num_simulations, rng, workers)
+    else:
+        counts = adaptive_trials(sampled_counts, args, num_simulations, rng, workers, precision, time_limit)
+    share, trials, wins, ties, share_sq = counts
+    return {
+        'equity': share / trials * 100,
+        'win': wins / trials * 100,
+        'tie': ties / trials * 100,
+        'trials': trials,
+        'error': float(error_bound(share, share_sq, trials)),
+    }
+
+
+def sampled_equity(hole_cards, community_cards, num_simulations, rng=None, workers=None, num_opponents=1):
+    """Pot-share equity (0-100) of hole_cards against random hands, by sampling"""
+    return multiway_equity(hole_cards, community_cards, num_opponents, num_simulations, rng, workers)['equity']
+
+
+def estimate_equity(hole_cards, community_cards, num_simulations=10000, rng=None,
+                    exact_budget=EXACT_ENUMERATION_BUDGET, preflop_table=True, cache=equity_cache,
+                    workers=None, num_opponents=1, precision=None, time_limit=None):
+    """Pot-share equity of hole_cards against num_opponents random hands, with its accuracy
+
+    Returns {'equity', 'trials', 'error', 'method'}. Preflop spots are looked
+    up in the precomputed table ('table', trials and error None) unless
+    preflop_table is False. Heads-up spots with at most exact_budget possible
+    outcomes are enumerated ('exact', error 0). Everything else is sampled
+    ('sampled'), adaptively when precision or time_limit is given (see
+    multiway_equity). Results are cached under the spot's suit-isomorphic key
+    unless cache is None or an rng is passed; time_limit is not part of the
+    key, so a sampled estimate is only cached once it is finished(). Large
+    sampled budgets can be spread over a process pool (see parallel.py).
+    """
+    if len(hole_cards) != 2:
+        return {'equity': 0.0, 'trials': 0, 'error': None, 'method': None}
+    if preflop_table and not community_cards:
+        equity = preflop_equity(hole_cards, num_opponents)
+        if equity is not None:
+            return {'equity': equity, 'trials': None, 'error': None, 'method': 'table'}
+
+    exact = num_opponents == 1 and count_outcomes(community_cards) <= exact_budget
+    if exact:
+        compute = lambda: {
+            'equity': exact_equity(hole_cards, community_cards),
+            'trials': count_outcomes(community_cards),
+            'error': 0.0,
+            'method': 'exact',
+        }
+    else:
+        def compute():
+            result = multiway_equity(
+                hole_cards, community_cards, num_opponents, num_simulations, rng, workers, precision, time_limit
+            )
+            return {'equity': result['equity'], 'trials': result['trials'], 'error': result['error'],
+                    'method': 'sampled'}
+    if cache is None or rng is not None:
+        return compute()
+    key = ('equity', canonical_key(hole_cards, community_cards), num_opponents,
+           None if exact else (num_simulations, precision))
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        if exact or finished(result, num_simulations, precision):
+            cache.put(key, result)
+    return dict(result)
+
+
+def monte_carlo_equity(hole_cards, community_cards, num_simulations=10000, rng=None,
+                       exact_budget=EXACT_ENUMERATION_BUDGET, preflop_table=True, cache=equity_cache,
+                       workers=None, num_opponents=1, precision=None, time_limit=None):
+    """Pot-share equity (0-100) of hole_cards against num_opponents random hands (see estimate_equity)"""
+    return estimate_equity(
+        hole_cards, community_cards, num_simulations, rng, exact_budget, preflop_table, cache,
+        workers, num_opponents, precision, time_limit
+    )['equity']
+
+
+# Rows dealt per vectorised pass when sampling many spots together
+BATCH_ROWS = 50000
+
+
+def batch_counts(hole_cards, community_cards, num_opponents, trials, rng):
+    """Per-spot (share, squared share) sums over trials[i] deals of each spot
+
+    hole_cards is (spots, 2) and community_cards (spots, k) for one board
+    size k. All spots are dealt and scored in one vectorised pass.
+    """
+    spot = np.repeat(np.arange(len(hole_cards)), trials)
+    hero, known_board = hole_cards[spot], community_cards[spot]
+    board_needed = 5 - known_board.shape[1]
+    drawn = deal_around(rng, np.concatenate([hero, known_board], axis=1), board_needed + 2 * num_opponents)
+    board = np.concatenate([known_board, drawn[:, :board_needed]], axis=1)
+    holes = np.concatenate([hero[:, None, :], drawn[:, board_needed:].reshape(len(spot), num_opponents, 2)], axis=1)
+    shares, _, _ = showdown(holes, board)
+    size = len(hole_cards)
+    return np.bincount(spot, shares, size), np.bincount(spot, shares ** 2, size)
+
+
+def _sample_spots(spots, num_opponents, max_trials, precision, deadline, rng):
+    """Adaptive sampling of same-sized canonical spots, sharing every pass between them"""
+    started = time.perf_counter()
+    hole_cards = np.array([hole for hole, _ in spots], dtype=np.int64)
+    community_cards = np.array([board for _, board in spots], dtype=np.int64).reshape(len(spots), -1)
+    share, share_sq = np.zeros(len(spots)), np.zeros(len(spots))
+    trials = np.zeros(len(spots), dtype=np.int64)
+    adaptive = precision is not None or deadline is not None
+    round_trials = np.full(len(spots), min(MIN_ADAPTIVE_TRIALS, max_trials) if adaptive else max_trials)
+
+    active = np.arange(len(spots))
+    while active.size:
+        # Split the active spots into passes of about BATCH_ROWS dealt rows
+        ends = np.cumsum(round_trials[active])
+        passes = np.searchsorted(ends, np.arange(BATCH_ROWS, ends[-1], BATCH_ROWS), side='right')
+        for idx in np.split(active, np.unique(passes)):
+            if idx.size:
+                shares, squares = batch_counts(
+                    hole_cards[idx], community_cards[idx], num_opponents, round_trials[idx], rng
+                )
+                share[idx] += shares
+                share_sq[idx] += squares
+        trials[active] += round_trials[active]
+
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        errors = error_bound(share[active], share_sq[active], trials[active])
+        done = trials[active] >= max_trials
+        if precision is not None:
+            done |= errors <= precision
+        active = active[~done]
+        if active.size:
+            remaining = max_trials - trials[active]
+            needed = remaining
+            if precision is not None:
+                needed = trials[active] * (errors[~done] / precision) ** 2 - trials[active]
+            round_trials[active] = np.minimum(
+                remaining, np.minimum(MAX_ADAPTIVE_ROUND, np.maximum(needed, MIN_ADAPTIVE_TRIALS))
+            ).astype(np.int64)
+
+    trial_stats.add(int(trials.sum()), time.perf_counter() - started)
+    errors = error_bound(share, share_sq, trials)
+    return [
+        {'equity': float(share[i] / trials[i] * 100), 'trials': int(trials[i]), 'error': float(errors[i]),
+         'method': 'sampled'}
+        for i in range(len(spots))
+    ]
+
+
+def batch_estimate_equity(spots, num_simulations=10000, rng=None, exact_budget=EXACT_ENUMERATION_BUDGET,
+                          cache=equity_cache, precision=None, time_limit=None):
+    """estimate_equity() for a list of (hole_cards, community_cards, num_opponents) spots
+
+    Identical and suit-isomorphic spots are computed once. Preflop and exact
+    spots are answered as in estimate_equity(); the others are sampled
+    together, all spots with the same board size and opponent count sharing
+    vectorised passes, and each drops out once its error bound is within
+    precision. time_limit applies to the whole batch. Results are cached as
+    in estimate_equity(), so batches and single spots share entries. Results
+    come back in input order.
+    """
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    use_cache = cache is not None and rng is None
+    rng = np.random.default_rng() if rng is None else rng
+    settings = (num_simulations, precision)
+
+    keys = [(canonical_key(hole, board), num_opponents) for hole, board, num_opponents in spots]
+    results = {}
+    groups = {}
+    for spot in keys:
+        canonical, num_opponents = spot
+        community_cards = canonical[1]
+        if spot in results:
+            continue
+        if not community_cards or (num_opponents == 1 and count_outcomes(community_cards) <= exact_budget):
+            results[spot] = estimate_equity(
+                list(canonical[0]), list(canonical[1]), num_simulations, None if use_cache else rng, exact_budget,
+                cache=cache, num_opponents=num_opponents, precision=precision,
+                time_limit=None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            )
+            continue
+        cached = cache.get(('equity', canonical, num_opponents, settings)) if use_cache else None
+        if cached is not None:
+            results[spot] = cached
+            continue
+        results[spot] = None
+        groups.setdefault((len(community_cards), num_opponents), []).append(canonical)
+
+    for (_, num_opponents), canonical_spots in groups.items():
+        estimates = _sample_spots(canonical_spots, num_opponents, num_simulations, precision, deadline, rng)
+        for canonical, estimate in zip(canonical_spots, estimates):
+            results[(canonical, num_opponents)] = estimate
+            if use_cache and finished(estimate, num_simulations, precision):
+                cache.put(('equity', canonical, num_opponents, settings), estimate)
+
+    return [dict(results[spot]) for spot in keys]
+
+
+# Redraw rounds for hero/villain combos that share a card before giving up on those rows
+MAX_REDRAWS = 20
+
+
+def range_counts(hero_combos, hero_weights, villain_combos, villain_weights, community_cards, num_trials, rng):
+    """(score, trials) of a weighted hero range against a weighted villain range
+
+    Combos are drawn in proportion to their weights and redrawn jointly while
+    they collide, so each trial is a fair draw from the compatible pairs.
+    Rows still colliding after MAX_REDRAWS rounds are not counted.
+    """
+    hero_p = hero_weights / hero_weights.sum()
+    villain_p = villain_weights / villain_weights.sum()
+    hero_idx = rng.choice(len(hero_combos), size=num_trials, p=hero_p)
+    villain_idx = rng.choice(len(villain_combos), size=num_trials, p=villain_p)
+    for _ in range(MAX_REDRAWS):
+        hero, villain = hero_combos[hero_idx], villain_combos[villain_idx]
+        clash = (hero[:, :, None] == villain[:, None, :]).any(axis=(1, 2))
+        redraw = np.count_nonzero(clash)
+        if not redraw:
+            break
+        hero_idx[clash] = rng.choice(len(hero_combos), size=redraw, p=hero_p)
+        villain_idx[clash] = rng.choice(len(villain_combos), size=redraw, p=villain_p)
+    else:
+        hero, villain = hero[~clash], villain[~clash]
+
+    known_board = np.broadcast_to(np.array(community_cards, dtype=hero.dtype), (len(hero), len(community_cards)))
+    drawn = deal_around(rng, np.concatenate([hero, villain, known_board], axis=1), 5 - len(community_cards))
+    board = np.concatenate([known_board, drawn], axis=1)
+
+    hero_values = evaluate_many(np.concatenate([hero, board], axis=1))
+    villain_values = evaluate_many(np.concatenate([villain, board], axis=1))
+    wins = np.count_nonzero(hero_values > villain_values)
+    ties = np.count_nonzero(hero_values == villain_values)
+    return wins + 0.5 * ties, len(hero)
+
+
+def _range_key(spec):
+    """Hashable form of a range spec for cache keys"""
+    if isinstance(spec, str):
+        return spec
+    return tuple(sorted(int(card) for card in spec)) if is_cards(spec) else tuple(sorted(spec))
+
+
+def range_equity(hero_range, villain_range, community_cards=(), num_simulations=10000, rng=None,
+                 workers=None, cache=equity_cache):
+    """Equity (0-100) of a hero range against a villain range
+
+    Either side is a range spec (see ranges.py) or two card ints. Combos
+    blocked by the board are removed before sampling. Raises ValueError if a
+    side has no live combos or the two ranges can never be dealt together.
+    """
+    community_cards = list(community_cards)
+    hero_combos, hero_weights = range_combos(hero_range, community_cards)
+    villain_combos, villain_weights = range_combos(villain_range, community_cards)
+    if not len(hero_combos) or not len(villain_combos):
+        raise ValueError('Range has no combos left after removing blocked cards')
+
+    if cache is not None and rng is None:
+        # Class-only ranges are suit-symmetric, so a single hero combo plus the
+        # board can be canonicalised; explicit combos pin the suits down
+        hero_cards = [int(card) for card in hero_range] if is_cards(hero_range) else []
+        specs = [villain_range] if hero_cards else [hero_range, villain_range]
+        symmetric = not any(is_explicit(token) for spec in specs for token in range_tokens(spec))
+        if symmetric:
+            spot = canonical_key(hero_cards, community_cards)
+        else:
+            spot = (tuple(sorted(hero_cards)), tuple(sorted(community_cards)))
+        # A hero combo is already part of spot, in its canonical suits
+        hero_key = None if hero_cards else _range_key(hero_range)
+        key = ('range', spot, hero_key, _range_key(villain_range), num_simulations)
+        return cache.get_or_compute(key, lambda: range_equity(
+            hero_range, villain_range, community_cards, num_simulations, workers=workers, cache=None
+        ))
+
+    score, trials = run_trials(
+        range_counts, (hero_combos, hero_weights, villain_combos, villain_weights, community_cards),
+        num_simulations, rng, workers
+    )
+    if not trials:
+        raise ValueError('Ranges have no compatible combos')
+    return float(score / trials * 100)
+
+
+def monte_carlo_equity_vs_range(player_cards, opponent_range, community_cards, num_simulations=5000,
+                                cache=equity_cache, rng=None, workers=None):
+    """Equity (0-100) of player_cards against a range of hand notations"""
+    if len(player_cards) != 2:
+        return 0.0
+    return range_equity(player_cards, opponent_range, community_cards, num_simulations, rng, workers, cache)
+
+
+def generate_random_hand_from_range(range_hands, dead_cards, rng=None):
+    """Random weighted combo from range_hands not blocked by dead_cards, or []"""
+    combos, weights = range_combos(range_hands, dead_cards)
+    if not len(combos):
+        return []
+    rng = np.random.default_rng() if rng is None else rng
+    return [int(card) for card in combos[rng.choice(len(combos), p=weights / weights.sum())]]
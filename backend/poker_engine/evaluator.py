@@ -0,0 +1,231 @@
+"""Lookup-table hand evaluation on integer cards (see cards.py for the encoding)
+
+evaluate() returns a strength where a higher number is a better hand, so any
+two 5-7 card hands compare with plain integer comparison, kickers included.
+The strength packs the category into bits 20+ and up to five deciding ranks
+into the 4-bit fields below it.
+
+Non-flush hands only depend on how many cards of each rank they hold, so
+each card adds 5 ** rank to a key that is unique per rank multiset and the
+strength is a single dict lookup. Flushes are looked up by the 13-bit rank
+mask of the flush suit. Both tables are built once and cached on disk.
+evaluate_many() does the same lookups for a whole NumPy array of hands.
+"""
+import os
+import tempfile
+from array import array
+
+import numpy as np
+
+HAND_NAMES = [
+    'High Card', 'Pair', 'Two Pair', 'Three of a Kind', 'Straight',
+    'Flush', 'Full House', 'Four of a Kind', 'Straight Flush'
+]
+
+CATEGORY_SHIFT = 20
+
+# Rank bitmasks of every straight with its high card, best first (wheel last)
+STRAIGHTS = [(0b11111 << low, low + 4) for low in range(8, -1, -1)] + [(0b1000000001111, 3)]
+
+CACHE_DIR = os.environ.get('POKER_ENGINE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'poker_engine'))
+CACHE_FILE = 'hand_ranks_v1.bin'
+
+# Per-card contributions to the rank key, the suit counters and the rank bit
+CARD_RANK_KEY = [5 ** (card >> 2) for card in range(52)]
+CARD_SUIT_KEY = [1 << (4 * (card & 3)) for card in range(52)]
+CARD_RANK_BIT = [1 << (card >> 2) for card in range(52)]
+
+# Adding 3 to every 4-bit suit counter sets its top bit once it reaches 5
+FLUSH_CHECK_ADD = 0x3333
+FLUSH_CHECK_MASK = 0x8888
+
+
+def _pack(category, ranks):
+    strength = category
+    for i in range(5):
+        strength = (strength << 4) | (ranks[i] if i < len(ranks) else 0)
+    return strength
+
+
+def _straight_high(rank_mask):
+    for straight, high in STRAIGHTS:
+        if rank_mask & straight == straight:
+            return high
+    return -1
+
+
+def _flush_strength(rank_mask):
+    high = _straight_high(rank_mask)
+    if high >= 0:
+        return _pack(8, [high])
+    ranks = [r for r in range(12, -1, -1) if rank_mask >> r & 1]
+    return _pack(5, ranks[:5])
+
+
+def _rank_strength(counts):
+    """Best non-flush strength for a rank multiset given as 13 counts"""
+    by_rank = [r for r in range(12, -1, -1) if counts[r]]
+    quads = [r for r in by_rank if counts[r] >= 4]
+    trips = [r for r in by_rank if counts[r] == 3]
+    pairs = [r for r in by_rank if counts[r] == 2]
+
+    if quads:
+        return _pack(7, [quads[0]] + [r for r in by_rank if r != quads[0]][:1])
+    if trips and (len(trips) > 1 or pairs):
+        pair = max(trips[1:] + pairs)
+        return _pack(6, [trips[0], pair])
+
+    rank_mask = 0
+    for r in by_rank:
+        rank_mask |= 1 << r
+    high = _straight_high(rank_mask)
+    if high >= 0:
+        return _pack(4, [high])
+
+    if trips:
+        return _pack(3, [trips[0]] + [r for r in by_rank if r != trips[0]][:2])
+    if len(pairs) >= 2:
+        kicker = [r for r in by_rank if r not in pairs[:2]][:1]
+        return _pack(2, pairs[:2] + kicker)
+    if pairs:
+        return _pack(1, [pairs[0]] + [r for r in by_rank if r != pairs[0]][:3])
+    return _pack(0, by_rank[:5])
+
+
+def _rank_multisets(counts, rank, remaining):
+    """Yield every 13-count rank multiset with the given number of cards left"""
+    if rank == 13:
+        if remaining == 0:
+            yield counts
+        return
+    for count in range(min(4, remaining) + 1):
+        counts[rank] = count
+        yield from _rank_multisets(counts, rank + 1, remaining - count)
+    counts[rank] = 0
+
+
+def build_tables():
+    """Compute the (rank keys, rank strengths, flush strengths) tables"""
+    entries = []
+    for num_cards in (5, 6, 7):
+        for counts in _rank_multisets([0] * 13, 0, num_cards):
+            key = sum(count * 5 ** rank for rank, count in enumerate(counts))
+            entries.append((key, _rank_strength(counts)))
+    entries.sort()
+    keys = array('Q', [key for key, _ in entries])
+    values = array('I', [value for _, value in entries])
+    flush = array('I', [
+        _flush_strength(mask) if bin(mask).count('1') >= 5 else 0 for mask in range(1 << 13)
+    ])
+    return keys, values, flush
+
+
+def _read_cache(path):
+    with open(path, 'rb') as f:
+        sizes = array('I')
+        sizes.fromfile(f, 2)
+        keys, values, flush = array('Q'), array('I'), array('I')
+        keys.fromfile(f, sizes[0])
+        values.fromfile(f, sizes[0])
+        flush.fromfile(f, sizes[1])
+    return keys, values, flush
+
+
+def _write_cache(path, tables):
+    keys, values, flush = tables
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        array('I', [len(keys), len(flush)]).tofile(f)
+        keys.tofile(f)
+        values.tofile(f)
+        flush.tofile(f)
+    os.replace(tmp_path, path)
+
+
+def load_tables(cache_dir=CACHE_DIR):
+    """Load the lookup tables from the disk cache, building them if needed"""
+    path = os.path.join(cache_dir, CACHE_FILE)
+    try:
+        return _read_cache(path)
+    except (OSError, EOFError):
+        pass
+    tables = build_tables()
+    try:
+        _write_cache(path, tables)
+    except OSError:
+        pass  # Read-only filesystem: keep the in-memory tables
+    return tables
+
+
+RANK_KEYS, RANK_VALUES, FLUSH_TABLE = load_tables()
+RANK_TABLE = dict(zip(RANK_KEYS, RANK_VALUES))
+
+
+def evaluate(cards):
+    """Strength of the best 5-card hand among 5-7 card ints (higher wins)"""
+    key = 0
+    suits = 0
+    for card in cards:
+        key += CARD_RANK_KEY[card]
+        suits += CARD_SUIT_KEY[card]
+    flush_bits = (suits + FLUSH_CHECK_ADD) & FLUSH_CHECK_MASK
+    if flush_bits:
+        # At most one suit can hold five of seven cards
+        suit = flush_bits.bit_length() // 4 - 1
+        mask = 0
+        for card in cards:
+            if card & 3 == suit:
+                mask |= CARD_RANK_BIT[card]
+        return FLUSH_TABLE[mask]
+    return RANK_TABLE[key]
+
+
+def hand_category(strength):
+    """Category index (0 = high card .. 8 = straight flush) of a strength"""
+    return strength >> CATEGORY_SHIFT
+
+
+def evaluate_category(cards):
+    """Hand category (0 = high card .. 8 = straight flush) for 5-7 card ints"""
+    return evaluate(cards) >> CATEGORY_SHIFT
+
+
+# NumPy views of the tables for evaluate_many()
+NP_CARD_RANK_KEY = np.array(CARD_RANK_KEY, dtype=np.int64)
+NP_CARD_SUIT_KEY = np.array(CARD_SUIT_KEY, dtype=np.int32)
+NP_CARD_RANK_BIT = np.array(CARD_RANK_BIT, dtype=np.int32)
+NP_RANK_KEYS = np.frombuffer(RANK_KEYS, dtype=np.uint64).astype(np.int64)
+NP_RANK_VALUES = np.frombuffer(RANK_VALUES, dtype=np.uint32).astype(np.int64)
+NP_FLUSH_TABLE = np.frombuffer(FLUSH_TABLE, dtype=np.uint32).astype(np.int64)
+NP_FLUSH_SUIT = {0x8 << (4 * suit): suit for suit in range(4)}
+
+
+def evaluate_many(cards):
+    """Vectorised evaluate() over an int array of shape (..., 5-7 cards)"""
+    cards = np.asarray(cards)
+    rank_keys = NP_CARD_RANK_KEY[cards].sum(axis=-1)
+    suit_sums = NP_CARD_SUIT_KEY[cards].sum(axis=-1)
+    return strengths_from_sums(rank_keys, suit_sums, lambda rows: cards[rows])
+
+
+def strengths_from_sums(rank_keys, suit_sums, cards_of):
+    """Strengths from per-hand rank-key and suit-counter sums
+
+    Callers that build many hands from shared parts can add the parts' sums
+    instead of gathering every card. cards_of(rows) must return the cards
+    of the given rows; it is only called for the (rare) flush rows.
+    """
+    strengths = NP_RANK_VALUES[np.searchsorted(NP_RANK_KEYS, rank_keys)]
+
+    flush_bits = (suit_sums + FLUSH_CHECK_ADD) & FLUSH_CHECK_MASK
+    flush_rows = np.nonzero(flush_bits)
+    if flush_rows[0].size:
+        flush_cards = cards_of(flush_rows)
+        suit = np.zeros(flush_cards.shape[0], dtype=np.int32)
+        for bit, suit_index in NP_FLUSH_SUIT.items():
+            suit[flush_bits[flush_rows] == bit] = suit_index
+        in_suit = (flush_cards & 3) == suit[:, None]
+        masks = (NP_CARD_RANK_BIT[flush_cards] * in_suit).sum(axis=-1)
+        strengths[flush_rows] = NP_FLUSH_TABLE[masks]
+    return strengths
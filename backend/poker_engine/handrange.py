@@ -0,0 +1,133 @@
+"""Class-level hand ranges compiled to 169-slot weight arrays
+
+A HandRange holds a weight in [0, 1] for each of the 169 starting-hand
+classes, indexed on the preflop grid (see preflop.py), plus an int bitmask
+of the classes with a non-zero weight. Membership of a notation or of two
+card ints is a single bit test, and ranges combine with set operations:
+
+    a | b           union, keeping the larger weight
+    a & b           intersection, keeping the smaller weight
+    a - b           a without every class in b
+    a.weighted(w)   every weight scaled by w
+
+compile_ranges() turns a {position: {action: range}} table, such as a
+parsed range file (see rangebook.py), into HandRanges and reports invalid
+tokens and classes listed under more than one action of a position.
+"""
+from itertools import combinations
+
+import numpy as np
+
+from .preflop import NUM_CLASSES, class_combos, class_index, class_notation, notation_index
+from .ranges import is_explicit, range_tokens, split_weight, token_classes
+
+# Concrete combos per class: 6 for pairs, 4 suited, 12 offsuit
+CLASS_SIZES = np.array([len(class_combos(index)) for index in range(NUM_CLASSES)])
+
+
+def hand_index(hand):
+    """Grid index of a class notation or of two card ints"""
+    if isinstance(hand, str):
+        return notation_index(hand)
+    return class_index(hand)
+
+
+def token_weight(token):
+    """(grid indices, weight) of one class range token"""
+    token, weight = split_weight(token)
+    if is_explicit(token):
+        raise ValueError(f"Class ranges cannot hold explicit combos: {token!r}")
+    return token_classes(token), weight
+
+
+class HandRange:
+    """Weighted set of starting-hand classes with O(1) membership"""
+
+    __slots__ = ('weights', 'mask')
+
+    def __init__(self, weights=None):
+        self.weights = np.zeros(NUM_CLASSES) if weights is None else np.clip(np.asarray(weights, dtype=float), 0, 1)
+        self.mask = sum(1 << int(index) for index in np.flatnonzero(self.weights))
+
+    @classmethod
+    def parse(cls, spec):
+        """Range of a range string or list of tokens; explicit combos are not allowed"""
+        weights = np.zeros(NUM_CLASSES)
+        for token in range_tokens(spec):
+            indices, weight = token_weight(token)
+            weights[indices] = weight
+        return cls(weights)
+
+    def __contains__(self, hand):
+        return self.mask >> hand_index(hand) & 1 == 1
+
+    def weight(self, hand):
+        """Weight of a class notation or of two card ints, 0 if not in the range"""
+        return float(self.weights[hand_index(hand)])
+
+    def weighted(self, factor):
+        return HandRange(self.weights * factor)
+
+    def __or__(self, other):
+        return HandRange(np.maximum(self.weights, other.weights))
+
+    def __and__(self, other):
+        return HandRange(np.minimum(self.weights, other.weights))
+
+    def __sub__(self, other):
+        return HandRange(np.where(other.weights > 0, 0.0, self.weights))
+
+    def __eq__(self, other):
+        return isinstance(other, HandRange) and np.array_equal(self.weights, other.weights)
+
+    def __len__(self):
+        return bin(self.mask).count('1')
+
+    def __bool__(self):
+        return self.mask != 0
+
+    def __repr__(self):
+        return f"HandRange({self.to_spec()!r})"
+
+    def combos(self):
+        """Weighted number of concrete combos in the range"""
+        return float(self.weights @ CLASS_SIZES)
+
+    def notations(self):
+        """Notations of the classes in the range, in grid order"""
+        return [class_notation(index) for index in np.flatnonzero(self.weights)]
+
+    def to_spec(self):
+        """Range string accepted by parse() and ranges.parse_range()"""
+        return ','.join(
+            class_notation(index) + ('' if weight == 1 else f':{weight:g}')
+            for index, weight in zip(np.flatnonzero(self.weights), self.weights[self.weights > 0])
+        )
+
+
+def compile_ranges(table):
+    """({position: {action: HandRange}}, problems) for a table of range token lists
+
+    Invalid tokens are skipped and reported rather than raised, so one typo
+    does not take down the ranges it sits in.
+    """
+    compiled, problems = {}, []
+    for position, actions in table.items():
+        compiled[position] = {}
+        for action, spec in actions.items():
+            weights, invalid = np.zeros(NUM_CLASSES), []
+            for token in range_tokens(spec):
+                try:
+                    indices, weight = token_weight(token)
+                except ValueError:
+                    invalid.append(token)
+                    continue
+                weights[indices] = weight
+            if invalid:
+                problems.append(f"{position} {action}: invalid tokens {', '.join(invalid)}")
+            compiled[position][action] = HandRange(weights)
+        for (first, a), (second, b) in combinations(compiled[position].items(), 2):
+            overlap = a & b
+            if overlap:
+                problems.append(f"{position}: {', '.join(overlap.notations())} in both {first} and {second}")
+    return compiled, problems
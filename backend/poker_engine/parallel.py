@@ -0,0 +1,115 @@
+"""Chunked and optionally multi-core execution of Monte Carlo trials
+
+Simulations are written as count functions, counts_fn(*args, num_trials, rng)
+returning a tuple of counters, (score, trials, ...), where score is the
+hero's share of the pots. run_trials() splits a trial budget into chunks, gives each chunk its own
+independent RNG stream, and merges the counts. Chunks run in-process, or on
+a persistent process pool when POKER_PARALLEL_WORKERS (or workers=) is above
+one and the budget is at least POKER_PARALLEL_MIN_TRIALS.
+
+The pool is created lazily on first use in each process, so every gunicorn
+worker gets its own pool after the fork and no request spawns processes.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+PARALLEL_WORKERS = int(os.environ.get('POKER_PARALLEL_WORKERS', 0))
+MIN_PARALLEL_TRIALS = int(os.environ.get('POKER_PARALLEL_MIN_TRIALS', 50000))
+
+# Trials per vectorised chunk; bounds the (trials, deck) arrays in memory
+CHUNK_TRIALS = 20000
+
+_pool = None
+_pool_owner = None
+_pool_lock = threading.Lock()
+
+
+class TrialStats:
+    """Process-wide totals of simulation runs, trials and time, for metrics"""
+
+    def __init__(self):
+        self.runs = 0
+        self.trials = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, trials, seconds):
+        with self._lock:
+            self.runs += 1
+            self.trials += trials
+            self.seconds += seconds
+
+    def stats(self):
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'trials': self.trials,
+                'seconds': round(self.seconds, 6),
+                'trialsPerSec': round(self.trials / self.seconds) if self.seconds else 0,
+            }
+
+
+trial_stats = TrialStats()
+
+
+def get_pool(workers):
+    """The process-wide pool, created on first use in this process"""
+    global _pool, _pool_owner
+    with _pool_lock:
+        if _pool is None or _pool_owner != os.getpid():
+            # Spawned workers do not inherit locks held by request threads
+            context = multiprocessing.get_context('spawn')
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _pool_owner = os.getpid()
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_owner == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+atexit.register(shutdown_pool)
+
+
+def _run_chunk(counts_fn, args, num_trials, seed):
+    return counts_fn(*args, num_trials, np.random.default_rng(seed))
+
+
+def _split(num_trials, num_chunks):
+    base, extra = divmod(num_trials, num_chunks)
+    return [base + (1 if i < extra else 0) for i in range(num_chunks)]
+
+
+def run_trials(counts_fn, args, num_trials, rng=None, workers=None):
+    """Run num_trials of counts_fn in chunks and return its counters summed over chunks"""
+    started = time.perf_counter()
+    workers = PARALLEL_WORKERS if workers is None else workers
+    parallel = workers > 1 and num_trials >= MIN_PARALLEL_TRIALS
+    num_chunks = max(workers if parallel else 1, -(-num_trials // CHUNK_TRIALS))
+    sizes = [size for size in _split(num_trials, num_chunks) if size]
+
+    # Independent child streams, reproducible when the caller passes an rng
+    if rng is not None:
+        seeds = [np.random.SeedSequence(int(entropy)) for entropy in rng.integers(2 ** 63, size=len(sizes))]
+    else:
+        seeds = np.random.SeedSequence().spawn(len(sizes))
+
+    if parallel:
+        pool = get_pool(workers)
+        futures = [pool.submit(_run_chunk, counts_fn, args, size, seed) for size, seed in zip(sizes, seeds)]
+        results = [future.result() for future in futures]
+    else:
+        results = [_run_chunk(counts_fn, args, size, seed) for size, seed in zip(sizes, seeds)]
+
+    trial_stats.add(num_trials, time.perf_counter() - started)
+    return tuple(sum(counts) for counts in zip(*results))
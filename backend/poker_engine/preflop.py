@@ -0,0 +1,105 @@
+"""Precomputed preflop equities for the 169 starting-hand classes
+
+Preflop equity only depends on the hand class ("AKs", "T9o", "77"), so
+build_preflop_table.py simulates every class-vs-class matchup and every
+class against 1-9 random hands once and stores them in data/preflop_equity.bin,
+shipped with the backend. Classes are indexed on a 13x13 grid: pairs on the
+diagonal, suited hands at [high][low] and offsuit hands at [low][high].
+
+File layout (little endian): magic, version, number of classes and number
+of vs-random rows as four uint32 header fields, then the class-vs-class
+matrix and the vs-random rows as uint16 equities scaled to 0..65535. Row k
+of the vs-random rows is the pot-share equity against k + 1 random hands.
+"""
+import os
+
+import numpy as np
+
+from .cards import RANKS, RANK_INDEX
+
+NUM_CLASSES = 169
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'preflop_equity.bin')
+TABLE_MAGIC = 0x51454650  # b'PFEQ'
+TABLE_VERSION = 1
+EQUITY_SCALE = 65535 / 100
+
+
+def class_index(hole_cards):
+    """Grid index (0-168) of the class of two card ints"""
+    rank1, rank2 = hole_cards[0] >> 2, hole_cards[1] >> 2
+    high, low = (rank1, rank2) if rank1 >= rank2 else (rank2, rank1)
+    if (hole_cards[0] & 3) == (hole_cards[1] & 3):
+        return high * 13 + low
+    return low * 13 + high
+
+
+def notation_index(notation):
+    """Grid index of a class notation like 'AKs', 'T9o' or '77'"""
+    high, low = RANK_INDEX[notation[0]], RANK_INDEX[notation[1]]
+    if high < low:
+        high, low = low, high
+    if high == low or notation[2:] == 's':
+        return high * 13 + low
+    return low * 13 + high
+
+
+def class_notation(index):
+    """Notation of the class at a grid index"""
+    row, col = divmod(index, 13)
+    if row == col:
+        return RANKS[row] * 2
+    if row > col:
+        return RANKS[row] + RANKS[col] + 's'
+    return RANKS[col] + RANKS[row] + 'o'
+
+
+def class_combos(index):
+    """Every concrete two-card combo of the class at a grid index"""
+    row, col = divmod(index, 13)
+    if row == col:
+        return [(row * 4 + s1, row * 4 + s2) for s1 in range(4) for s2 in range(s1 + 1, 4)]
+    if row > col:
+        return [(row * 4 + s, col * 4 + s) for s in range(4)]
+    return [(col * 4 + s1, row * 4 + s2) for s1 in range(4) for s2 in range(4) if s1 != s2]
+
+
+def write_table(path, matrix, vs_random):
+    """Write a class-vs-class matrix and vs-random rows (equities 0-100)"""
+    vs_random = np.atleast_2d(vs_random)
+    header = np.array([TABLE_MAGIC, TABLE_VERSION, NUM_CLASSES, len(vs_random)], dtype='<u4')
+    body = np.concatenate([np.ravel(matrix), np.ravel(vs_random)])
+    with open(path, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(np.round(body * EQUITY_SCALE).astype('<u2').tobytes())
+
+
+def load_table(path=TABLE_PATH):
+    """Read (matrix, vs_random rows) as float equities, or None if unavailable"""
+    try:
+        raw = np.fromfile(path, dtype='<u4', count=4)
+        if len(raw) < 4 or raw[0] != TABLE_MAGIC or raw[1] != TABLE_VERSION or raw[2] != NUM_CLASSES:
+            return None
+        body = np.fromfile(path, dtype='<u2', offset=16) / EQUITY_SCALE
+    except OSError:
+        return None
+    matrix_size = NUM_CLASSES * NUM_CLASSES
+    if len(body) != matrix_size + raw[3] * NUM_CLASSES:
+        return None
+    return body[:matrix_size].reshape(NUM_CLASSES, NUM_CLASSES), body[matrix_size:].reshape(raw[3], NUM_CLASSES)
+
+
+PREFLOP_TABLE = load_table()
+
+
+def preflop_equity(hole_cards, num_opponents=1):
+    """Table pot-share equity (0-100) of two card ints against num_opponents random hands, or None"""
+    if PREFLOP_TABLE is None or not 1 <= num_opponents <= len(PREFLOP_TABLE[1]):
+        return None
+    return float(PREFLOP_TABLE[1][num_opponents - 1, class_index(hole_cards)])
+
+
+def preflop_matchup(hand, other_hand):
+    """Table equity (0-100) of one class notation against another, or None"""
+    if PREFLOP_TABLE is None:
+        return None
+    return float(PREFLOP_TABLE[0][notation_index(hand), notation_index(other_hand)])
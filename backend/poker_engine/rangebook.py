@@ -0,0 +1,242 @@
+"""Hot-reloadable range files compiled to a memory-mapped binary cache
+
+Range files live in RANGE_DIR (POKER_RANGE_DIR), one per action context and
+stack depth, named <context>-<depth>bb.txt (open-100bb.txt, vs_raise-40bb.txt).
+Each line gives the range of one position and action in range-string syntax
+(see ranges.py):
+
+    # comments and blank lines are ignored
+    UTG raise: 88+, ATs+, KQs, AKo
+
+RangeBook compiles every file to 169-class weight rows (see handrange.py) and
+keeps them in one binary cache, RANGE_CACHE, that later loads memory-map
+instead of parsing; only files whose mtime or size changed are recompiled.
+Lookups stat the directory at most every check_interval seconds and reload
+when a file changed, so each gunicorn worker picks up edits without a
+restart and the first one to notice rewrites the cache for the others.
+
+Cache layout (little endian): magic, version, number of rows and length of
+a JSON index as four uint32 header fields, the JSON index (the mtime, size,
+rows and problems of each file and the (context, depth, position, action)
+of each row) padded to 4 bytes, then the rows as float32.
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from .handrange import HandRange, compile_ranges
+from .preflop import NUM_CLASSES
+
+RANGE_DIR = os.environ.get(
+    'POKER_RANGE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'ranges')
+)
+RANGE_CACHE = os.environ.get('POKER_RANGE_CACHE', os.path.join(tempfile.gettempdir(), 'poker_buddy', 'ranges.bin'))
+CACHE_MAGIC = 0x53474E52  # b'RNGS'
+CACHE_VERSION = 1
+
+DEFAULT_CONTEXT = 'open'
+DEFAULT_DEPTH = 100
+ACTIONS = ('raise', 'call', 'fold')
+
+FILE_PATTERN = re.compile(r'^(\w+?)(?:-(\d+)bb)?\.txt$')
+LINE_PATTERN = re.compile(r'^(\w+)\s+(\w+)\s*:(.*)$')
+
+
+def parse_range_file(path):
+    """({position: {action: range string}}, problems) of one range file"""
+    name = os.path.basename(path)
+    table, problems = {}, []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            match = LINE_PATTERN.match(line)
+            if not match:
+                problems.append(f"{name}:{number}: expected '<position> <action>: <range>'")
+                continue
+            table.setdefault(match.group(1).upper(), {})[match.group(2).lower()] = match.group(3)
+    return table, problems
+
+
+def compile_file(path):
+    """(row keys, rows, problems) of one range file"""
+    name = os.path.basename(path)
+    match = FILE_PATTERN.match(name)
+    context, depth = match.group(1).lower(), int(match.group(2) or DEFAULT_DEPTH)
+    table, problems = parse_range_file(path)
+    compiled, range_problems = compile_ranges(table)
+    keys = [
+        [context, depth, position, action]
+        for position, actions in compiled.items() for action in actions
+    ]
+    rows = [hand_range.weights for actions in compiled.values() for hand_range in actions.values()]
+    rows = np.array(rows, dtype='<f4').reshape(-1, NUM_CLASSES)
+    return keys, rows, problems + [f"{name}: {problem}" for problem in range_problems]
+
+
+class CompiledRanges:
+    """One loaded generation of range rows with lazily built HandRanges"""
+
+    def __init__(self, files, keys, rows):
+        self.files = files
+        self.keys = keys
+        self.rows = rows
+        self.problems = [problem for info in files.values() for problem in info['problems']]
+        # (context, position) -> {depth: {action: row}}
+        self.index = {}
+        for row, (context, depth, position, action) in enumerate(keys):
+            self.index.setdefault((context, position), {}).setdefault(depth, {})[action] = row
+        self._ranges = {}
+
+    def matches(self, signature):
+        return {name: (info['mtime'], info['size']) for name, info in self.files.items()} == signature
+
+    def ranges(self, position, context, depth):
+        """{action: HandRange} at the stack depth closest to depth, or {} if none"""
+        depths = self.index.get((context, position))
+        if not depths:
+            return {}
+        depth = min(depths, key=lambda available: (abs(available - depth), available))
+        key = (context, position, depth)
+        if key not in self._ranges:
+            ranges = {action: HandRange() for action in ACTIONS}
+            ranges.update((action, HandRange(self.rows[row])) for action, row in depths[depth].items())
+            self._ranges[key] = ranges
+        return self._ranges[key]
+
+
+def write_cache(path, compiled):
+    """Atomically replace the binary cache with a compiled generation"""
+    index = json.dumps({'files': compiled.files, 'keys': compiled.keys}, separators=(',', ':')).encode()
+    index += b' ' * (-len(index) % 4)
+    header = np.array([CACHE_MAGIC, CACHE_VERSION, len(compiled.keys), len(index)], dtype='<u4')
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header.tobytes())
+            f.write(index)
+            f.write(np.ascontiguousarray(compiled.rows, dtype='<f4').tobytes())
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_cache(path):
+    """Memory-mapped CompiledRanges from the binary cache, or None if unavailable"""
+    try:
+        header = np.fromfile(path, dtype='<u4', count=4)
+        if len(header) < 4 or header[0] != CACHE_MAGIC or header[1] != CACHE_VERSION:
+            return None
+        num_rows, index_length = int(header[2]), int(header[3])
+        with open(path, 'rb') as f:
+            f.seek(header.nbytes)
+            index = json.loads(f.read(index_length))
+        if num_rows:
+            rows = np.memmap(
+                path, dtype='<f4', mode='r', offset=header.nbytes + index_length, shape=(num_rows, NUM_CLASSES)
+            )
+        else:
+            rows = np.zeros((0, NUM_CLASSES), dtype='<f4')
+        return CompiledRanges(index['files'], [tuple(key) for key in index['keys']], rows)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+class RangeBook:
+    """Range files by context, stack depth and position, reloaded when they change"""
+
+    def __init__(self, directory=RANGE_DIR, cache_path=RANGE_CACHE, check_interval=1.0):
+        self.directory = directory
+        self.cache_path = cache_path
+        self.check_interval = check_interval
+        self._compiled = None
+        self._checked = 0
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.compiled_files = 0
+        self.load_ms = None
+
+    def _signature(self):
+        """{file name: (mtime_ns, size)} of the range files"""
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return {}
+        signature = {}
+        for entry in entries:
+            if FILE_PATTERN.match(entry.name):
+                stat = entry.stat()
+                signature[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return signature
+
+    def current(self):
+        """Compiled ranges, reloaded first if a range file changed"""
+        if self._compiled is None or time.monotonic() - self._checked >= self.check_interval:
+            with self._lock:
+                if self._compiled is None or time.monotonic() - self._checked >= self.check_interval:
+                    self._refresh()
+                    self._checked = time.monotonic()
+        return self._compiled
+
+    def _refresh(self):
+        signature = self._signature()
+        if self._compiled is not None and self._compiled.matches(signature):
+            return
+        started = time.perf_counter()
+        compiled = read_cache(self.cache_path)
+        if compiled is None or not compiled.matches(signature):
+            compiled = self._compile(signature, compiled or self._compiled)
+            try:
+                write_cache(self.cache_path, compiled)
+            except OSError:
+                pass  # Still usable from memory; the next reload tries again
+        self._compiled = compiled
+        self.reloads += 1
+        self.load_ms = (time.perf_counter() - started) * 1000
+
+    def _compile(self, signature, previous):
+        """Compile changed files, reusing the rows of unchanged ones from previous"""
+        files, keys, rows = {}, [], []
+        for name, (mtime, size) in sorted(signature.items()):
+            info = previous.files.get(name) if previous is not None else None
+            if info is not None and (info['mtime'], info['size']) == (mtime, size):
+                file_keys = previous.keys[info['first']:info['first'] + info['count']]
+                file_rows = np.asarray(previous.rows[info['first']:info['first'] + info['count']])
+                problems = info['problems']
+            else:
+                file_keys, file_rows, problems = compile_file(os.path.join(self.directory, name))
+                self.compiled_files += 1
+            files[name] = {'mtime': mtime, 'size': size, 'first': len(keys), 'count': len(file_keys), 'problems': problems}
+            keys += file_keys
+            rows.append(file_rows)
+        rows = np.concatenate(rows) if rows else np.zeros((0, NUM_CLASSES), dtype='<f4')
+        return CompiledRanges(files, [tuple(key) for key in keys], rows)
+
+    def ranges(self, position, context=DEFAULT_CONTEXT, depth=DEFAULT_DEPTH):
+        """{action: HandRange} of a position; contexts without a file fall back to DEFAULT_CONTEXT"""
+        compiled = self.current()
+        return compiled.ranges(position, context, depth) or compiled.ranges(position, DEFAULT_CONTEXT, depth)
+
+    def stats(self):
+        compiled = self.current()
+        return {
+            'files': len(compiled.files),
+            'rangeSets': sum(len(depths) for depths in compiled.index.values()),
+            'reloads': self.reloads,
+            'compiledFiles': self.compiled_files,
+            'loadMs': round(self.load_ms, 2) if self.load_ms is not None else None,
+            'problems': compiled.problems,
+        }
+
+
+range_book = RangeBook(check_interval=float(os.environ.get('POKER_RANGE_CHECK_INTERVAL', 1.0)))
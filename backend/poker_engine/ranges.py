@@ -0,0 +1,132 @@
+"""Hand range parsing and combo expansion
+
+A range is written as comma separated tokens, either as one string or as a
+list like the GTO ranges in app.py:
+
+    'AKs'           all 4 suited AK combos ('AK' means suited and offsuit)
+    'TT+'           TT, JJ, QQ, KK, AA
+    'ATs+'          ATs, AJs, AQs, AKs (kicker climbs to one below the top card)
+    'A5s-A2s'       A5s, A4s, A3s, A2s
+    '22-55'         22, 33, 44, 55
+    'A♠K♦' / 'AsKd' one explicit combo
+    'AKo:0.5'       any token with a weight in (0, 1]; the default is 1
+
+parse_range() turns this into {combo: weight} with combos as sorted card
+int pairs. range_combos() drops combos blocked by known cards and returns
+the arrays the vectorised equity code samples from.
+"""
+import re
+
+import numpy as np
+
+from .cards import RANKS, RANK_INDEX, parse_cards
+from .preflop import class_combos, notation_index
+
+CLASS_PATTERN = re.compile(r'^([2-9TJQKA])([2-9TJQKA])([so]?)(\+?)$', re.IGNORECASE)
+COMBO_PATTERN = re.compile(r'^(10|[2-9TJQKA])(.)(10|[2-9TJQKA])(.)$', re.IGNORECASE)
+
+
+def _classes(token):
+    """(high, low, suffix) rank indices of a class token, expanding a trailing '+'"""
+    match = CLASS_PATTERN.match(token)
+    if not match:
+        raise ValueError(f"Invalid range token: {token!r}")
+    high, low = RANK_INDEX[match.group(1).upper()], RANK_INDEX[match.group(2).upper()]
+    suffix, plus = match.group(3).lower(), match.group(4)
+    if high < low:
+        high, low = low, high
+    if high == low:
+        if suffix:
+            raise ValueError(f"Pairs cannot be suited or offsuit: {token!r}")
+        return [(rank, rank, '') for rank in range(high, 13 if plus else high + 1)]
+    return [(high, kicker, suffix) for kicker in range(low, high if plus else low + 1)]
+
+
+def _span(token):
+    """Classes of a dash token like 'A5s-A2s' or '22-55'"""
+    first, last = (_classes(part.strip()) for part in token.split('-', 1))
+    if len(first) != 1 or len(last) != 1:
+        raise ValueError(f"Invalid range token: {token!r}")
+    (high1, low1, suffix1), (high2, low2, suffix2) = first[0], last[0]
+    if high1 == low1 and high2 == low2:
+        return [(rank, rank, '') for rank in range(min(high1, high2), max(high1, high2) + 1)]
+    if high1 != high2 or suffix1 != suffix2 or high1 == low1 or high2 == low2:
+        raise ValueError(f"Range ends must share the top card and suitedness: {token!r}")
+    return [(high1, kicker, suffix1) for kicker in range(min(low1, low2), max(low1, low2) + 1)]
+
+
+def range_tokens(spec):
+    """Stripped, non-empty tokens of a range string or list of notations"""
+    if isinstance(spec, str):
+        spec = [spec]
+    return [token.strip() for item in spec for token in str(item).split(',') if token.strip()]
+
+
+def is_explicit(token):
+    """True if a token names one concrete combo rather than hand classes"""
+    token = token.partition(':')[0].strip()
+    return bool(COMBO_PATTERN.match(token)) and not CLASS_PATTERN.match(token)
+
+
+def split_weight(token):
+    """(token, weight) of a range token with an optional ':w' weight suffix"""
+    token, _, weight = token.partition(':')
+    try:
+        weight = float(weight) if weight else 1.0
+    except ValueError:
+        raise ValueError(f"Invalid range weight: {weight!r}")
+    if not 0 < weight <= 1:
+        raise ValueError(f"Range weights must be in (0, 1]: {weight}")
+    return token.strip(), weight
+
+
+def token_classes(token):
+    """Grid indices (see preflop.py) of the hand classes of a class token"""
+    classes = _span(token) if '-' in token else _classes(token)
+    return [
+        notation_index(RANKS[high] + RANKS[low] + s)
+        for high, low, suffix in classes
+        for s in ([suffix] if suffix or high == low else ['s', 'o'])
+    ]
+
+
+def token_combos(token):
+    """Combos of a single token without its weight"""
+    if is_explicit(token):
+        match = COMBO_PATTERN.match(token)
+        return [tuple(sorted(parse_cards([match.group(1) + match.group(2), match.group(3) + match.group(4)])))]
+    return [tuple(sorted(combo)) for index in token_classes(token) for combo in class_combos(index)]
+
+
+def parse_range(spec):
+    """{combo: weight} for a range; later tokens override earlier weights"""
+    weights = {}
+    for token in range_tokens(spec):
+        token, weight = split_weight(token)
+        for combo in token_combos(token):
+            weights[combo] = weight
+    return weights
+
+
+def is_cards(spec):
+    """True if spec is two card ints rather than a range"""
+    return not isinstance(spec, str) and len(spec) == 2 and all(isinstance(card, (int, np.integer)) for card in spec)
+
+
+def range_combos(spec, dead_cards=()):
+    """(combos, weights) arrays of a range with combos blocked by dead_cards removed
+
+    spec may also be two card ints, which is a single-combo range.
+    """
+    if is_cards(spec):
+        weights = {tuple(sorted(int(card) for card in spec)): 1.0}
+    else:
+        weights = parse_range(spec)
+    dead = set(dead_cards)
+    live = [(combo, weight) for combo, weight in weights.items() if not dead & set(combo)]
+    if not live:
+        return np.empty((0, 2), dtype=np.int64), np.empty(0)
+    return (
+        np.array([combo for combo, _ in live], dtype=np.int64),
+        np.array([weight for _, weight in live]),
+    )
@@ -0,0 +1,190 @@
+"""On-demand stack-sampling profiles of live requests
+
+While a Profile is active, a background thread samples the Python stack of
+the thread that opened it every POKER_PROFILE_INTERVAL_MS milliseconds.
+Stacks are cut at the function that opened the profile and counted in
+collapsed-stack form ("outer;inner;leaf count" per line), which
+flamegraph.pl, speedscope and similar tools read directly. Every profile
+is saved to POKER_PROFILE_DIR as <id>.collapsed with an <id>.json summary,
+so any gunicorn worker can serve it. Only the newest `keep` profiles are
+kept.
+
+app.py profiles /api/analyze when an admin sends X-Profile: 1, and a
+random POKER_PROFILE_SAMPLE_RATE share of all analyses.
+"""
+import json
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+PROFILE_DIR = os.environ.get(
+    'POKER_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'poker_buddy', 'profiles')
+)
+PROFILE_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+logger = logging.getLogger(__name__)
+
+
+def frame_name(frame):
+    """Flamegraph frame label: function (file:first line)"""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ',')
+
+
+def collapse(frame, root):
+    """Collapsed stack of frame, outermost first, starting at root"""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        if frame is root:
+            break
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Counts the collapsed stacks of one thread, sampled from a background thread"""
+
+    def __init__(self, thread_id, interval, root=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root = root
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame, self.root)] += 1
+
+    def stop(self):
+        """Stop sampling and return the stack counts"""
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+class ProfileStore:
+    """Collapsed-stack profiles and their summaries in a directory shared by workers"""
+
+    def __init__(self, directory=PROFILE_DIR, keep=50):
+        self.directory = directory
+        self.keep = keep
+
+    def save(self, profile_id, stacks, summary):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, profile_id)
+        with open(base + '.collapsed', 'w', encoding='utf-8') as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(summary, f)
+        self._prune()
+
+    def _prune(self):
+        summaries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')),
+            key=lambda entry: entry.stat().st_mtime, reverse=True
+        )
+        for entry in summaries[self.keep:]:
+            for suffix in ('.json', '.collapsed'):
+                try:
+                    os.remove(os.path.join(self.directory, entry.name[:-5] + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def list(self):
+        """Summaries of the stored profiles, newest first"""
+        summaries = []
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return []
+        for entry in entries:
+            if entry.name.endswith('.json'):
+                try:
+                    with open(entry.path, encoding='utf-8') as f:
+                        summaries.append(json.load(f))
+                except (OSError, ValueError):
+                    continue  # Pruned or half-written by another worker
+        return sorted(summaries, key=lambda summary: summary['created'], reverse=True)
+
+    def collapsed(self, profile_id):
+        """Collapsed-stack text of a profile, or None if unknown"""
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, profile_id + '.collapsed'), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+class Profile:
+    """Context manager sampling the calling thread's stack while it is active"""
+
+    def __init__(self, store, name, interval):
+        self.id = uuid.uuid4().hex
+        self.store = store
+        self.name = name
+        self.interval = interval
+        self.saved = False
+
+    def __enter__(self):
+        # Cut stacks at the caller so server frames above it are left out
+        self._sampler = StackSampler(threading.get_ident(), self.interval, sys._getframe(1))
+        self._started = time.perf_counter()
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        stacks = self._sampler.stop()
+        # A diagnostic must never fail the request it observes
+        try:
+            self.store.save(self.id, stacks, {
+                'id': self.id,
+                'name': self.name,
+                'created': datetime.now().isoformat(),
+                'seconds': round(time.perf_counter() - self._started, 6),
+                'samples': sum(stacks.values()),
+                'intervalMs': self.interval * 1000,
+            })
+            self.saved = True
+        except OSError as e:
+            logger.warning("Could not save profile %s of %s: %s", self.id, self.name, e)
+
+
+class Profiler:
+    """Starts profiles on request or for a random share of calls"""
+
+    def __init__(self, store, sample_rate=0.0, interval=0.001):
+        self.store = store
+        self.sample_rate = sample_rate
+        self.interval = interval
+
+    def sampled(self):
+        """True for a random sample_rate share of calls"""
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def profile(self, name):
+        return Profile(self.store, name, self.interval)
+
+
+profiler = Profiler(
+    ProfileStore(keep=int(os.environ.get('POKER_PROFILE_KEEP', 50))),
+    sample_rate=float(os.environ.get('POKER_PROFILE_SAMPLE_RATE', 0.0)),
+    interval=float(os.environ.get('POKER_PROFILE_INTERVAL_MS', 1)) / 1000,
+)
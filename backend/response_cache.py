@@ -0,0 +1,89 @@
+"""Rendered responses cached per data version, served with conditional GET
+
+ResponseCache.respond() renders a body only when the version of the data
+behind it (for results_app.py, the size and mtime of the results CSV)
+changed since it was last rendered, and gzips it once at the same time.
+Every response carries an ETag derived from the body, the data's
+Last-Modified time and Cache-Control: no-cache, so browsers revalidate on
+each view and get an empty 304 while nothing changed. Because the ETag
+comes from the content, every gunicorn worker hands out the same one.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+
+class CachedBody:
+    """One rendered body and its precomputed gzip encoding"""
+
+    __slots__ = ('version', 'body', 'gzipped', 'etag')
+
+    def __init__(self, version, body, min_gzip_bytes):
+        self.version = version
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6) if len(body) >= min_gzip_bytes else None
+        self.etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU of rendered bodies keyed by request"""
+
+    def __init__(self, maxsize=64, min_gzip_bytes=512):
+        self.maxsize = maxsize
+        self.min_gzip_bytes = min_gzip_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.renders = 0
+        self.not_modified = 0
+
+    def _entry(self, key, version, render):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        body = render()
+        entry = CachedBody(version, body.encode('utf-8') if isinstance(body, str) else body, self.min_gzip_bytes)
+        with self._lock:
+            self.renders += 1
+            if self.maxsize > 0:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def respond(self, key, version, last_modified, mimetype, render):
+        """Response for the current request; render() -> str or bytes runs only on a version change"""
+        entry = self._entry(key, version, render)
+        use_gzip = entry.gzipped is not None and request.accept_encodings['gzip'] > 0
+        response = Response(entry.gzipped if use_gzip else entry.body, mimetype=mimetype)
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(entry.etag + ('-gz' if use_gzip else ''))
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            self.not_modified += 1
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'renders': self.renders,
+                'notModified': self.not_modified,
+            }
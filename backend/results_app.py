@@ -1,29 +1,33 @@
 from flask import Flask, request, jsonify, render_template_string
 from flask_cors import CORS
-import csv
 import os
-from datetime import date
+from datetime import date, datetime, timezone
 from pathlib import Path
 
+from leaderboard import Leaderboard
+from response_cache import ResponseCache
+from results_export import EXPORT_FORMATS, export_response
+from results_store import MAX_PAGE, RESULTS_FILE, parse_cursor, parse_date_param, store
+
 app = Flask(__name__)
 CORS(app)
 
-# Configuration - all data stored in Git repository
-RESULTS_FILE = 'data/poker_results.csv'
+# Configuration - all data stored in Git repository (POKER_RESULTS_FILE overrides the path)
 AUTH_TOKEN = 'toasty1'  # Simple token for basic security
 
 # Ensure data directory and CSV file exist
 def init_csv():
-    # Create data directory if it doesn't exist
-    os.makedirs('data', exist_ok=True)
-    
-    # Create CSV file with headers if it doesn't exist
-    if not os.path.exists(RESULTS_FILE):
-        with open(RESULTS_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['date', 'winners', 'split', 'notes', 'other_players'])
+    store.init()
 
 init_csv()
+leaderboard = Leaderboard(store)
+response_cache = ResponseCache(maxsize=int(os.environ.get('POKER_RESPONSE_CACHE_SIZE', 64)))
+
+def cached_response(key, mimetype, render):
+    """Response whose body render() builds again only after the results CSV changes"""
+    size, mtime_ns = store.version()
+    last_modified = datetime.fromtimestamp(mtime_ns / 1e9, timezone.utc)
+    return response_cache.respond(key, (size, mtime_ns), last_modified, mimetype, render)
 
 @app.route('/api/winner', methods=['POST'])
 def add_winner():
@@ -40,54 +44,62 @@ def add_winner():
     notes = data.get('notes', '')
     other_players = data.get('other_players', '')
 
-    # Append to CSV file
-    with open(RESULTS_FILE, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow([str(date.today()), ', '.join(winners), str(split).lower(), notes, other_players])
+    # Append to CSV file, group-committed with concurrent results
+    try:
+        store.append([[str(date.today()), ', '.join(winners), str(split).lower(), notes, other_players]])
+    except OSError as e:
+        return jsonify({'error': f'Could not save result: {e}'}), 500
+    leaderboard.current()  # Apply the new row to the player statistics
 
     return jsonify({'status': 'ok', 'message': 'Winner recorded successfully'}), 200
 
 @app.route('/api/results', methods=['GET'])
 def get_results():
-    rows = []
-    if os.path.exists(RESULTS_FILE):
-        with open(RESULTS_FILE, newline='', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            next(reader, None)  # Skip header
-            rows = list(reader)
+    """Results newest first, a page at a time
+
+    ?limit= caps the page (default and maximum MAX_PAGE), ?cursor= takes the
+    nextCursor of the previous page and ?since=/?until= filter by date
+    (since inclusive, until exclusive).
+    """
+    try:
+        limit = min(int(request.args.get('limit', MAX_PAGE)), MAX_PAGE)
+        if limit < 1:
+            raise ValueError('limit must be at least 1')
+        cursor = parse_cursor(request.args.get('cursor'))
+        since = parse_date_param(request.args.get('since'), 'since')
+        until = parse_date_param(request.args.get('until'), 'until')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    # Convert to list of dicts and reverse for most recent first
-    results = []
-    for row in reversed(rows):
-        if len(row) >= 5:
-            results.append({
-                'date': row[0],
-                'winners': row[1],
-                'split': row[2] == 'true',
-                'notes': row[3],
-                'other_players': row[4]
-            })
-        elif len(row) >= 4:  # Handle old format without other_players
-            results.append({
-                'date': row[0],
-                'winners': row[1],
-                'split': row[2] == 'true',
-                'notes': row[3],
-                'other_players': ''
-            })
+    def render():
+        results, next_cursor = store.page(limit, cursor=cursor, since=since, until=until)
+        return app.json.dumps({'results': results, 'nextCursor': None if next_cursor is None else str(next_cursor)})
 
-    return jsonify({'results': results})
+    return cached_response(('results', limit, cursor, since, until), 'application/json', render)
+
+@app.route('/api/leaderboard', methods=['GET'])
+def get_leaderboard():
+    """Every player's statistics, ranked by wins"""
+    ranking = leaderboard.ranking()
+    try:
+        limit = int(request.args.get('limit', len(ranking)))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    return jsonify({'players': ranking[:max(limit, 0)], 'games': leaderboard.stats()['games']})
+
+@app.route('/api/players/<name>', methods=['GET'])
+def get_player(name):
+    player = leaderboard.player(name)
+    if player is None:
+        return jsonify({'error': 'Unknown player'}), 404
+    return jsonify(player)
 
 @app.route('/reveal')
 def reveal_results():
-    rows = []
-    if os.path.exists(RESULTS_FILE):
-        with open(RESULTS_FILE, newline='', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            next(reader, None)  # Skip header
-            rows = list(reader)
-
-    rows.reverse()  # Show most recent first
+    try:
+        cursor = parse_cursor(request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     html_template = """
     <!DOCTYPE html>
@@ -131,6 +143,9 @@ def reveal_results():
                 color: #1e3c72;
                 margin-top: 0;
             }
+            table.leaderboard {
+                margin-bottom: 30px;
+            }
             table {
                 border-collapse: collapse;
                 width: 100%;
@@ -259,19 +274,44 @@ def reveal_results():
             {% if rows %}
             <div class="stats">
                 <div class="stat-card">
-                    <div class="stat-number">{{ rows|length }}</div>
+                    <div class="stat-number">{{ stats.games }}</div>
                     <div class="stat-label">Total Games</div>
                 </div>
                 <div class="stat-card">
-                    <div class="stat-number">{{ rows|selectattr('2', 'equalto', 'true')|list|length }}</div>
+                    <div class="stat-number">{{ stats.splitGames }}</div>
                     <div class="stat-label">Split Pots</div>
                 </div>
                 <div class="stat-card">
-                    <div class="stat-number">{{ (rows|selectattr('2', 'equalto', 'true')|list|length * 100 / rows|length)|round(1) if rows|length > 0 else 0 }}%</div>
+                    <div class="stat-number">{{ (stats.splitGames * 100 / stats.games)|round(1) if stats.games > 0 else 0 }}%</div>
                     <div class="stat-label">Split Rate</div>
                 </div>
             </div>
             
+            {% if players %}
+            <table class="leaderboard">
+                <thead>
+                    <tr>
+                        <th>Player</th>
+                        <th>Wins</th>
+                        <th>Games</th>
+                        <th>Pot Share</th>
+                        <th>Best Streak</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {% for player in players %}
+                    <tr>
+                        <td class="winners">{{ player.name }}</td>
+                        <td>{{ player.wins }}</td>
+                        <td>{{ player.games }}</td>
+                        <td>{{ player.potShare }}</td>
+                        <td>{{ player.bestStreak }}</td>
+                    </tr>
+                    {% endfor %}
+                </tbody>
+            </table>
+            {% endif %}
+
             <table>
                 <thead>
                     <tr>
@@ -284,16 +324,19 @@ def reveal_results():
                 </thead>
                 <tbody>
                     {% for row in rows %}
-                    <tr class="{{ 'split-yes' if row[2] == 'true' else '' }}">
-                        <td class="date">{{ row[0] }}</td>
-                        <td class="winners">{{ row[1] }}</td>
-                        <td>{{ 'Yes' if row[2] == 'true' else 'No' }}</td>
-                        <td class="notes">{{ row[3] }}</td>
-                        <td class="other-players">{{ row[4] if row|length > 4 else '' }}</td>
+                    <tr class="{{ 'split-yes' if row.split else '' }}">
+                        <td class="date">{{ row.date }}</td>
+                        <td class="winners">{{ row.winners }}</td>
+                        <td>{{ 'Yes' if row.split else 'No' }}</td>
+                        <td class="notes">{{ row.notes }}</td>
+                        <td class="other-players">{{ row.other_players }}</td>
                     </tr>
                     {% endfor %}
                 </tbody>
             </table>
+            {% if next_cursor is not none %}
+            <p><a href="/reveal?cursor={{ next_cursor }}" class="download-btn">Older games →</a></p>
+            {% endif %}
             {% else %}
             <div class="no-results">
                 <h3>📊 No results recorded yet</h3>
@@ -305,13 +348,35 @@ def reveal_results():
     </body>
     </html>
     """
-    return render_template_string(html_template, rows=rows)
+
+    def render():
+        rows, next_cursor = store.page(MAX_PAGE, cursor=cursor)  # Most recent first
+        return render_template_string(
+            html_template, rows=rows, stats=store.stats(), players=leaderboard.ranking()[:10], next_cursor=next_cursor
+        )
+
+    return cached_response(('reveal', cursor), 'text/html', render)
+
+@app.route('/api/export')
+def export_results():
+    """Stream results as ?format=csv or jsonl, optionally ?since=/?until= filtered and ?compress=gzip"""
+    try:
+        fmt = request.args.get('format', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown format: {fmt!r} (use {' or '.join(EXPORT_FORMATS)})")
+        compress = request.args.get('compress', '')
+        if compress not in ('', 'gzip'):
+            raise ValueError(f"Unknown compression: {compress!r} (use gzip)")
+        since = parse_date_param(request.args.get('since'), 'since')
+        until = parse_date_param(request.args.get('until'), 'until')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return export_response(store, fmt, since, until, compress == 'gzip')
 
 @app.route('/download-csv')
 def download_csv():
-    if os.path.exists(RESULTS_FILE):
-        from flask import send_file
-        return send_file(RESULTS_FILE, as_attachment=True, download_name='poker_results.csv')
+    if os.path.exists(store.path):
+        return export_response(store)
     else:
         return jsonify({'error': 'No results file found'}), 404
 
@@ -0,0 +1,138 @@
+"""Streaming, resumable exports of the results CSV
+
+CSV exports are read through SpanReader, a seekable view of the CSV header
+plus the byte spans of the selected rows (see ResultsIndex.spans), so an
+export is sent in CHUNK_SIZE pieces straight from the file and a Range
+request seeks to its first byte: an interrupted download resumes where it
+stopped. JSON-lines exports are generated row by row. Either can be gzipped
+on the fly; compressed exports stream but are not range-capable. Memory use
+does not grow with the size of the export.
+
+The ETag names the indexed length and fingerprint of the CSV, so If-Range
+only resumes a download while the rows being exported are unchanged.
+"""
+import io
+import json
+import zlib
+from bisect import bisect_right
+from datetime import datetime, timezone
+
+from flask import Response, request
+from werkzeug.wsgi import wrap_file
+
+CHUNK_SIZE = 64 * 1024
+EXPORT_FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+class SpanReader(io.RawIOBase):
+    """Read-only, seekable stream of a prefix followed by byte spans of a file"""
+
+    def __init__(self, path, prefix, spans):
+        self._file = open(path, 'rb')
+        self.prefix = prefix
+        self.spans = spans
+        # Stream offset at which each span starts
+        self.starts = []
+        length = len(prefix)
+        for start, stop in spans:
+            self.starts.append(length)
+            length += stop - start
+        self.length = length
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.length}[whence]
+        self.position = max(base + offset, 0)
+        return self.position
+
+    def readinto(self, buffer):
+        if self.position >= self.length:
+            return 0
+        if self.position < len(self.prefix):
+            data = self.prefix[self.position:self.position + len(buffer)]
+        else:
+            span = bisect_right(self.starts, self.position) - 1
+            start, stop = self.spans[span]
+            offset = start + self.position - self.starts[span]
+            self._file.seek(offset)
+            data = self._file.read(min(len(buffer), stop - offset))
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def read_chunks(reader):
+    """Yield CHUNK_SIZE pieces of a stream, closing it at the end"""
+    try:
+        yield from iter(lambda: reader.read(CHUNK_SIZE), b'')
+    finally:
+        reader.close()
+
+
+def jsonl_chunks(results):
+    """Yield JSON lines of result dicts, about CHUNK_SIZE bytes at a time"""
+    lines, size = [], 0
+    for result in results:
+        line = json.dumps(result, ensure_ascii=False) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(lines).encode('utf-8')
+            lines, size = [], 0
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+
+def gzip_chunks(chunks):
+    """Gzip a stream of byte chunks on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_response(store, fmt='csv', since=None, until=None, compress=False, download_name='poker_results'):
+    """Streaming download of the results dated in [since, until) as CSV or JSON lines"""
+    index = store.current()
+    spans = index.spans(since.toordinal() if since else None, until.toordinal() if until else None)
+    length = None
+    if fmt == 'csv':
+        with open(store.path, 'rb') as f:
+            header = f.read(index.data_start or 0)
+        reader = SpanReader(store.path, header, spans)
+        if compress:
+            body = gzip_chunks(read_chunks(reader))
+        else:
+            body, length = wrap_file(request.environ, reader, CHUNK_SIZE), reader.length
+    else:
+        body = jsonl_chunks(store.results_in(spans))
+        if compress:
+            body = gzip_chunks(body)
+
+    filename = f"{download_name}.{fmt}" + ('.gz' if compress else '')
+    response = Response(
+        body, mimetype='application/gzip' if compress else EXPORT_FORMATS[fmt], direct_passthrough=True,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+    if length is not None:
+        response.content_length = length
+        response.accept_ranges = 'bytes'
+    response.set_etag(f"{index.end:x}-{index.fingerprint:08x}")
+    mtime_ns = store.version()[1]
+    response.last_modified = datetime.fromtimestamp(mtime_ns / 1e9, timezone.utc)
+    return response.make_conditional(request, accept_ranges=length is not None, complete_length=length)
@@ -0,0 +1,512 @@
+"""Offset-indexed, newest-first reads of the results CSV and safe appends to it
+
+The CSV (RESULTS_FILE) stays the source of truth: it is committed to git and
+served as is by /download-csv. ResultsStore keeps a sidecar index of the
+byte offset, date and split flag of every result row, so a page of results
+is read by seeking straight to its rows instead of parsing the whole file.
+New rows are indexed by parsing only the bytes appended since the index was
+last brought up to date; the index is rebuilt if the CSV shrinks or its
+first bytes change (the file was replaced or edited by hand).
+
+append() is the only writer. It group-commits concurrent appends into one
+write and fsync under an exclusive flock on the CSV, and index refreshes
+take the lock shared, so neither gunicorn workers nor readers see torn
+rows. Without fcntl (Windows) appends are only serialised per process.
+
+Rows keep the legacy layouts: date, winners, split, notes and an optional
+fifth other_players column. Rows with fewer than four fields are skipped;
+the index keeps their offsets so date-filtered spans leave them out.
+
+Index layout (little endian): magic, version, row count and a dates-sorted
+flag as uint32; the bytes of complete rows, the bytes read (including an
+unterminated last row) and the offset of the first result row as int64; a
+CRC32 of the first FINGERPRINT_BYTES bytes read and the number of skipped
+rows as uint32; then the row offsets (int64), dates (int32 ordinals, 0 if
+unparseable), split flags (int8) and skipped row offsets (int64).
+"""
+import csv
+import io
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialised within one process
+    fcntl = None
+
+RESULTS_FILE = os.environ.get('POKER_RESULTS_FILE', 'data/poker_results.csv')
+RESULTS_INDEX = os.environ.get(
+    'POKER_RESULTS_INDEX', os.path.join(tempfile.gettempdir(), 'poker_buddy', 'results.idx')
+)
+HEADER = ['date', 'winners', 'split', 'notes', 'other_players']
+
+INDEX_MAGIC = 0x58444952  # b'RIDX'
+INDEX_VERSION = 2
+INDEX_HEADER = struct.Struct('<IIIIqqqII')
+FINGERPRINT_BYTES = 4096
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y')
+MAX_PAGE = 500
+
+
+def parse_date(text):
+    """date of an ISO (2025-01-22) or DD/MM/YYYY date string, or None"""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text.strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def result_dict(row):
+    """API dict of a 4- or 5-column CSV row"""
+    return {
+        'date': row[0],
+        'winners': row[1],
+        'split': row[2] == 'true',
+        'notes': row[3],
+        'other_players': row[4] if len(row) >= 5 else '',
+    }
+
+
+def parse_row(data):
+    """First CSV row of some bytes, or None if it has fewer than four fields"""
+    for row in csv.reader(io.StringIO(data.decode('utf-8', errors='replace'), newline='')):
+        if row:
+            return row if len(row) >= 4 else None
+    return None
+
+
+def split_rows(data, base=0):
+    """([(offset, bytes)] of the complete rows in data, bytes they span)
+
+    A newline ends a row only outside double quotes, so notes holding line
+    breaks stay in one row. Offsets are relative to base.
+    """
+    rows, start, position, quoted = [], 0, 0, False
+    while True:
+        newline = data.find(b'\n', position)
+        if newline < 0:
+            return rows, start
+        quoted ^= data.count(b'"', position, newline) & 1 == 1
+        position = newline + 1
+        if not quoted:
+            rows.append((base + start, data[start:position]))
+            start = position
+
+
+def encode_rows(rows):
+    """CSV bytes of some rows, as csv.writer writes them"""
+    text = io.StringIO(newline='')
+    csv.writer(text).writerows(rows)
+    return text.getvalue().encode('utf-8')
+
+
+@contextmanager
+def file_lock(f, exclusive):
+    """Advisory lock on an open file, shared by every process using it"""
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    try:
+        yield
+    finally:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def prefix_crc(f, length):
+    """CRC32 of the first min(length, FINGERPRINT_BYTES) bytes of an open file"""
+    f.seek(0)
+    return zlib.crc32(f.read(min(length, FINGERPRINT_BYTES)))
+
+
+class ResultsIndex:
+    """Offsets, date ordinals and split flags of the result rows in one CSV"""
+
+    def __init__(self):
+        self.offsets = array('q')
+        self.dates = array('i')
+        self.splits = array('b')
+        self.skipped = array('q')  # Offsets of rows with fewer than four fields
+        self.size = 0  # CSV bytes of complete (newline-terminated) rows
+        self.end = 0  # CSV bytes read, including an unterminated last row
+        self.data_start = None  # Offset of the first row after the header
+        self.fingerprint = zlib.crc32(b'')
+        self.dates_sorted = True
+        self.generation = 0  # Bumped whenever indexed rows are dropped
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def add(self, offset, row):
+        day = parse_date(row[0])
+        ordinal = day.toordinal() if day else 0
+        if ordinal == 0 or (self.dates and ordinal < self.dates[-1]):
+            self.dates_sorted = False
+        self.offsets.append(offset)
+        self.dates.append(ordinal)
+        self.splits.append(row[2] == 'true')
+
+    def extend(self, f, size, chunk_size=1 << 20):
+        """Index the rows between self.size and size bytes of an open CSV, chunk_size bytes at a time"""
+        # An unterminated last row may have been completed since; index it again
+        while self.offsets and self.offsets[-1] >= self.size:
+            self.offsets.pop()
+            self.dates.pop()
+            self.splits.pop()
+            self.generation += 1
+        while self.skipped and self.skipped[-1] >= self.size:
+            self.skipped.pop()
+        f.seek(self.size)
+        position, carry = self.size, b''  # carry: bytes of an incomplete row starting at position
+        while position + len(carry) < size:
+            data = f.read(min(chunk_size, size - position - len(carry)))
+            if not data:
+                break  # File shrank under us
+            data = carry + data
+            rows, consumed = split_rows(data, position)
+            for offset, row_data in rows:
+                if self.data_start is None:
+                    self.data_start = offset + len(row_data)  # Header row
+                    continue
+                row = parse_row(row_data)
+                if row is not None:
+                    self.add(offset, row)
+                else:
+                    self.skipped.append(offset)
+            position += consumed
+            carry = data[consumed:]
+        if self.data_start is not None and carry.strip() and carry.count(b'"') % 2 == 0:
+            row = parse_row(carry)  # Hand-edited file without a final newline
+            if row is not None:
+                self.add(position, row)
+            else:
+                self.skipped.append(position)
+        self.size = position
+        self.end = size
+        self.fingerprint = prefix_crc(f, size)
+
+    def row_end(self, position):
+        return self.offsets[position + 1] if position + 1 < len(self.offsets) else self.end
+
+    def bounds(self, since=None, until=None):
+        """(low, high) positions of the rows dated in [since, until) of date-sorted rows"""
+        low = bisect_left(self.dates, since) if since is not None else 0
+        high = bisect_left(self.dates, until) if until is not None else len(self)
+        return low, max(low, high)
+
+    def spans(self, since=None, until=None):
+        """Merged (start, stop) CSV byte spans of the rows dated in [since, until), in file order
+
+        since and until are date ordinals; rows without a parseable date
+        and skipped rows are only included when neither is given, so the
+        spans hold exactly the rows results_in() yields.
+        """
+        if since is None and until is None:
+            return [(self.offsets[0], self.end)] if len(self) else []
+        if self.dates_sorted:
+            low, high = self.bounds(since, until)
+            return self.without_skipped([(self.offsets[low], self.row_end(high - 1))] if low < high else [])
+        spans = []
+        for position, ordinal in enumerate(self.dates):
+            if ordinal and (since is None or ordinal >= since) and (until is None or ordinal < until):
+                start, stop = self.offsets[position], self.row_end(position)
+                if spans and spans[-1][1] == start:
+                    spans[-1] = (spans[-1][0], stop)
+                else:
+                    spans.append((start, stop))
+        return self.without_skipped(spans)
+
+    def without_skipped(self, spans):
+        """spans with the bytes of skipped rows cut out"""
+        if not self.skipped:
+            return spans
+        cut = []
+        for start, stop in spans:
+            i = bisect_left(self.skipped, start)
+            while i < len(self.skipped) and self.skipped[i] < stop:
+                skipped = self.skipped[i]
+                # A skipped row ends where the next indexed or skipped row starts
+                following = bisect_right(self.offsets, skipped)
+                skipped_end = min(
+                    self.offsets[following] if following < len(self) else self.end,
+                    self.skipped[i + 1] if i + 1 < len(self.skipped) else self.end,
+                )
+                if skipped > start:
+                    cut.append((start, skipped))
+                start = max(start, skipped_end)
+                i += 1
+            if start < stop:
+                cut.append((start, stop))
+        return cut
+
+    def write(self, path):
+        """Atomically replace the index file"""
+        header = INDEX_HEADER.pack(
+            INDEX_MAGIC, INDEX_VERSION, len(self), self.dates_sorted, self.size, self.end,
+            -1 if self.data_start is None else self.data_start, self.fingerprint, len(self.skipped)
+        )
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                self.offsets.tofile(f)
+                self.dates.tofile(f)
+                self.splits.tofile(f)
+                self.skipped.tofile(f)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    @classmethod
+    def read(cls, path):
+        """ResultsIndex from an index file, or None if unavailable"""
+        index = cls()
+        try:
+            with open(path, 'rb') as f:
+                magic, version, count, dates_sorted, size, end, data_start, crc, skipped = INDEX_HEADER.unpack(
+                    f.read(INDEX_HEADER.size)
+                )
+                if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                    return None
+                index.offsets.fromfile(f, count)
+                index.dates.fromfile(f, count)
+                index.splits.fromfile(f, count)
+                index.skipped.fromfile(f, skipped)
+        except (OSError, EOFError, struct.error):
+            return None
+        index.size, index.end, index.fingerprint = size, end, crc
+        index.data_start = data_start if data_start >= 0 else None
+        index.dates_sorted = bool(dates_sorted)
+        return index
+
+
+class PendingAppend:
+    """Rows waiting for a group commit"""
+
+    __slots__ = ('data', 'rows', 'done', 'error')
+
+    def __init__(self, data, rows):
+        self.data = data
+        self.rows = rows
+        self.done = False
+        self.error = None
+
+
+class ResultsStore:
+    """Results CSV with an offset index for paged, date-filtered reads"""
+
+    def __init__(self, path=RESULTS_FILE, index_path=RESULTS_INDEX):
+        self.path = path
+        self.index_path = index_path
+        self._index = None
+        self._stat = None
+        self._lock = threading.Lock()
+        self._commit = threading.Condition()
+        self._committing = False
+        self._pending = []
+        self.rebuilds = 0
+        self.appended = 0
+        self.commits = 0
+
+    def init(self):
+        """Create the CSV with its header row if it does not exist"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if not os.path.exists(self.path):
+            with open(self.path, 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerow(HEADER)
+
+    def append(self, rows):
+        """Durably append CSV rows; returns once they are fsynced
+
+        Appends are group-committed: a caller that finds no commit in
+        progress writes every pending row in one locked write and one fsync,
+        while callers arriving meanwhile queue up for the next commit. Each
+        commit holds an exclusive lock on the CSV, so rows from concurrent
+        workers never interleave.
+        """
+        entry = PendingAppend(encode_rows(rows), len(rows))
+        with self._commit:
+            self._pending.append(entry)
+            while self._committing and not entry.done:
+                self._commit.wait()
+            if not entry.done:
+                self._committing = True
+                batch, self._pending = self._pending, []
+        if not entry.done:
+            error = None
+            try:
+                self._write(b''.join(pending.data for pending in batch))
+            except OSError as e:
+                error = e
+            with self._commit:
+                for pending in batch:
+                    pending.done, pending.error = True, error
+                if error is None:
+                    self.commits += 1
+                    self.appended += sum(pending.rows for pending in batch)
+                self._committing = False
+                self._commit.notify_all()
+        if entry.error is not None:
+            raise entry.error
+
+    def _write(self, data):
+        with open(self.path, 'a+b') as f, file_lock(f, exclusive=True):
+            # Never glue a row onto a hand-edited last line without a newline
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    data = b'\r\n' + data
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def version(self):
+        """(size, mtime_ns) of the CSV the index is up to date with, (0, 0) if missing"""
+        self.current()
+        return self._stat or (0, 0)
+
+    def current(self):
+        """Index brought up to date with the CSV"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._stat = None
+            return ResultsIndex()
+        if self._stat != (stat.st_size, stat.st_mtime_ns):
+            with self._lock:
+                if self._stat != (stat.st_size, stat.st_mtime_ns):
+                    self._stat = self._refresh()
+        return self._index
+
+    def _refresh(self):
+        """Bring the index up to date; returns the (size, mtime) it covers"""
+        # The shared lock keeps half-committed appends out of the index
+        with open(self.path, 'rb') as f, file_lock(f, exclusive=False):
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            index = self._index or ResultsIndex.read(self.index_path)
+            # Appends leave the indexed bytes alone; anything else means a rewritten file
+            if index is None or index.end > size or prefix_crc(f, index.end) != index.fingerprint:
+                index = ResultsIndex()
+                self.rebuilds += 1
+            if index.end == size:
+                self._index = index
+                return size, stat.st_mtime_ns
+            index.extend(f, size)
+        self._index = index
+        try:
+            index.write(self.index_path)
+        except OSError:
+            pass  # Still usable from memory; the next refresh tries again
+        return size, stat.st_mtime_ns
+
+    def page(self, limit=50, cursor=None, since=None, until=None):
+        """(results newest first, cursor of the next page or None)
+
+        cursor is a value returned by an earlier call. since and until are
+        dates; since is inclusive and until exclusive, and rows whose date
+        cannot be parsed only appear when neither is given.
+        """
+        index = self.current()
+        high = len(index) if cursor is None else min(cursor, len(index))
+        since = since.toordinal() if since else None
+        until = until.toordinal() if until else None
+        if (since is None and until is None) or index.dates_sorted:
+            # Rows are in date order, so the filter is a slice
+            low, until_high = index.bounds(since, until)
+            high = min(high, until_high)
+            positions = range(high - 1, max(low, high - limit) - 1, -1)
+            next_cursor = high - limit if high - limit > low else None
+        else:
+            positions = []
+            position = high - 1
+            while position >= 0 and len(positions) < limit:
+                ordinal = index.dates[position]
+                if ordinal and (since is None or ordinal >= since) and (until is None or ordinal < until):
+                    positions.append(position)
+                position -= 1
+            next_cursor = positions[-1] if len(positions) == limit and position >= 0 else None
+        return self._read(index, positions), next_cursor
+
+    def _read(self, index, positions):
+        results = []
+        with open(self.path, 'rb') as f:
+            for position in positions:
+                f.seek(index.offsets[position])
+                row = parse_row(f.read(index.row_end(position) - index.offsets[position]))
+                if row is not None:
+                    results.append(result_dict(row))
+        return results
+
+    def results_between(self, index, start, stop):
+        """Yield the results at positions start to stop of index in file order"""
+        if start < stop:
+            yield from self.results_in([(index.offsets[start], index.row_end(stop - 1))])
+
+    def results_in(self, spans, chunk_size=65536):
+        """Yield the results in (start, stop) CSV byte spans, reading chunk_size bytes at a time"""
+        with open(self.path, 'rb') as f:
+            for start, stop in spans:
+                f.seek(start)
+                remaining, carry = stop - start, b''
+                while remaining > 0:
+                    data = carry + f.read(min(chunk_size, remaining))
+                    remaining -= len(data) - len(carry)
+                    if len(data) == len(carry):
+                        break  # File shrank under us
+                    rows, consumed = split_rows(data)
+                    carry = data[consumed:]
+                    for _, row_data in rows:
+                        row = parse_row(row_data)
+                        if row is not None:
+                            yield result_dict(row)
+                row = parse_row(carry) if carry.strip() else None
+                if row is not None:
+                    yield result_dict(row)
+
+    def stats(self):
+        index = self.current()
+        return {
+            'games': len(index),
+            'splitGames': index.splits.count(1),
+            'indexedBytes': index.end,
+            'rebuilds': self.rebuilds,
+            'appended': self.appended,
+            'commits': self.commits,
+        }
+
+
+def parse_cursor(value):
+    """Row position of a cursor query parameter, or None if absent"""
+    if value in (None, ''):
+        return None
+    if not value.isdigit():
+        raise ValueError(f"Invalid cursor: {value!r}")
+    return int(value)
+
+
+def parse_date_param(value, name):
+    """date of a since/until query parameter, or None if absent"""
+    if value in (None, ''):
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f"Invalid {name} date: {value!r} (use YYYY-MM-DD)")
+    return day
+
+
+store = ResultsStore()
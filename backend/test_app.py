@@ -1,6 +1,21 @@
-import pytest
+import gzip
 import json
+import os
+import time
+
+import pytest
+import app as app_module
+import api.index as vercel_module
+import clean_app as clean_module
+from analysis_log import AnalysisLog
+from analysis_store import AnalysisStore
 from app import app
+from jobs import JobQueue
+from metrics import NULL_SPAN, Metrics
+from profiler import Profiler, ProfileStore
+
+# WSGI environ of a server with request threads, where /api/jobs/<id> may long-poll
+THREADED = {'wsgi.multithread': True}
 
 @pytest.fixture
 def client():
@@ -57,6 +72,8 @@ class TestPokerAPI:
         assert isinstance(data['potOdds'], int)
         assert isinstance(data['ev'], int)
         assert isinstance(data['reasoning'], str)
+        assert data['equityTrials'] > 0
+        assert data['equityError'] <= 0.5
 
     def test_analyze_hand_missing_hole_cards(self, client):
         """Test analysis with missing hole cards"""
@@ -220,6 +237,41 @@ class TestPokerAPI:
             assert 'action' in data
             assert 'confidence' in data
 
+    def test_equity_drops_with_more_players(self, client):
+        """Equity is measured against every opponent at the table"""
+        hand_data = {
+            'holeCards': ['Q♠', 'Q♥'],
+            'flop': ['9♦', '5♣', '2♠'],
+            'position': 'button',
+            'potSize': 100,
+            'betSize': 0
+        }
+        equities = []
+        for num_players in [2, 9]:
+            hand_data['numPlayers'] = num_players
+            response = client.post('/api/analyze',
+                                 data=json.dumps(hand_data),
+                                 content_type='application/json')
+            equities.append(json.loads(response.data)['equity'])
+        
+        assert equities[1] < equities[0] - 20
+
+    def test_tptk_is_not_folded_at_default_table(self, client):
+        """Top pair, top kicker is a value bet against five opponents in every backend"""
+        hand_data = {'holeCards': ['A♥', 'K♦'], 'flop': ['K♣', '7♠', '2♥'], 'position': 'button', 'potSize': 100}
+        response = client.post('/api/analyze', data=json.dumps(hand_data), content_type='application/json')
+        assert json.loads(response.data)['action'] == 'raise'
+        assert clean_module.generate_ai_recommendation(hand_data)['action'] == 'raise'
+        vercel_data = {'holeCards': hand_data['holeCards'], 'communityCards': hand_data['flop'], 'position': 'button'}
+        assert vercel_module.generate_ai_recommendation(vercel_data)['action'] != 'fold'
+
+    @pytest.mark.parametrize('hole_cards', [['A♠', 'K♦'], ['K♠', 'Q♠'], ['8♠', '8♦']])
+    def test_premium_opens_are_not_folded_at_default_table(self, hole_cards):
+        """The low-equity override does not fold premium preflop raises six-handed"""
+        result = vercel_module.generate_ai_recommendation({'holeCards': hole_cards, 'position': 'button'})
+        assert result['equity'] < 30
+        assert result['action'] == 'raise'
+
     def test_analyze_hand_with_turn_and_river(self, client):
         """Test analysis with complete board"""
         hand_data = {
@@ -242,6 +294,189 @@ class TestPokerAPI:
         assert 'action' in data
         assert 'handStrength' in data
 
+    def test_cache_stats(self, client):
+        """Repeating a spot shows up as a cache hit"""
+        hand_data = {
+            'holeCards': ['9♠', '8♠'],
+            'flop': ['7♠', '6♦', '2♣'],
+            'position': 'button',
+            'potSize': 100,
+            'betSize': 0
+        }
+        before = json.loads(client.get('/api/cache/stats').data)
+        for _ in range(2):
+            client.post('/api/analyze', data=json.dumps(hand_data), content_type='application/json')
+        after = json.loads(client.get('/api/cache/stats').data)
+        
+        assert after['hits'] >= before['hits'] + 1
+        assert 'misses' in after and 'size' in after
+
+    def test_equity_vs_range(self, client):
+        """Equity endpoint accepts hand and range notation"""
+        response = client.post('/api/equity',
+                             data=json.dumps({'playerHand': 'AA', 'opponentRange': 'KK, QQ'}),
+                             content_type='application/json')
+        
+        assert response.status_code == 200
+        assert 78 < json.loads(response.data)['equity'] < 86
+
+    def test_equity_invalid_range(self, client):
+        """Malformed range notation is a client error"""
+        response = client.post('/api/equity',
+                             data=json.dumps({'playerHand': 'AA', 'opponentRange': ['91s']}),
+                             content_type='application/json')
+        
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize('payload', [
+        {'playerHand': 'AA', 'opponentRange': [1, 2]},
+        {'playerRange': [1, 2], 'opponentRange': 'KK'},
+        {'playerHand': 'AA', 'opponentRange': {'KK': 1}},
+    ])
+    def test_equity_rejects_non_string_ranges(self, client, payload):
+        """Range tokens must be strings; card ints are never read from JSON"""
+        response = client.post('/api/equity', data=json.dumps(payload), content_type='application/json')
+        
+        assert response.status_code == 400
+        assert 'string' in json.loads(response.data)['error']
+
+    def test_analyze_batch(self, client):
+        """Batch results come back in input order with per-hand errors"""
+        hands = [
+            {'holeCards': ['A♠', 'A♥'], 'flop': ['A♦', 'K♣', 'Q♠'], 'numPlayers': 6, 'position': 'button'},
+            {'holeCards': ['A♠']},
+            {'holeCards': ['2♠', '7♥'], 'flop': ['K♦', 'Q♣', 'J♠'], 'position': 'early', 'betSize': 50},
+            {'holeCards': ['A♥', 'A♠'], 'flop': ['A♣', 'K♦', 'Q♥'], 'numPlayers': 6, 'position': 'button'},
+        ]
+        response = client.post('/api/analyze/batch',
+                             data=json.dumps({'hands': hands}),
+                             content_type='application/json')
+        
+        assert response.status_code == 200
+        results = json.loads(response.data)['results']
+        assert len(results) == 4
+        assert results[0]['handStrength'] == 'Three of a Kind'
+        assert 'Must provide exactly 2 hole cards' in results[1]['error']
+        assert results[2]['action'] == 'fold'
+        # The fourth hand is a suit relabelling of the first, so it shares its simulation
+        assert results[3]['equity'] == results[0]['equity']
+
+    def test_analyze_batch_keeps_bad_hands_in_their_slots(self, client):
+        """Malformed hands get error entries while the rest of the batch is analyzed"""
+        good = {'holeCards': ['A♠', 'A♥'], 'flop': ['A♦', 'K♣', 'Q♠'], 'position': 'button'}
+        hands = [
+            good,
+            {'holeCards': 'AK'},
+            {'holeCards': ['K♠', 'K♥'], 'numPlayers': None},
+            {'holeCards': ['K♠', 'K♥'], 'flop': 'K♦Q♣J♠'},
+            {'holeCards': ['Q♠', 'Q♥'], 'potSize': 'lots', 'betSize': 10},
+            good,
+        ]
+        response = client.post('/api/analyze/batch',
+                             data=json.dumps({'hands': hands}),
+                             content_type='application/json')
+        
+        assert response.status_code == 200
+        results = json.loads(response.data)['results']
+        assert results[1]['error'] == 'holeCards must be a list of cards'
+        assert results[2]['error'] == 'numPlayers must be an integer'
+        assert results[3]['error'] == 'flop must be a list of cards'
+        assert 'error' in results[4]
+        assert results[0]['handStrength'] == results[5]['handStrength'] == 'Three of a Kind'
+
+    def test_analyze_batch_rejects_non_list(self, client):
+        """Batch endpoint needs a list of hands"""
+        response = client.post('/api/analyze/batch',
+                             data=json.dumps({'hands': 'AKs'}),
+                             content_type='application/json')
+        
+        assert response.status_code == 400
+
+    def test_analyze_stream(self, client):
+        """NDJSON upload streams one result per non-empty line, in order"""
+        lines = [
+            json.dumps({'holeCards': ['A♠', 'A♥'], 'flop': ['A♦', 'K♣', 'Q♠'], 'position': 'button'}),
+            'not json',
+            '',
+            json.dumps({'holeCards': ['A♠']}),
+        ]
+        response = client.post('/api/analyze/stream',
+                             data='\n'.join(lines),
+                             content_type='application/x-ndjson')
+        
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        results = [json.loads(line) for line in response.data.decode().splitlines()]
+        assert [result['line'] for result in results] == [1, 2, 4]
+        assert results[0]['action'] == 'raise'
+        assert 'error' in results[1]
+        assert 'Must provide exactly 2 hole cards' in results[2]['error']
+
+    def test_stream_logs_server_errors_only(self, client, monkeypatch, caplog):
+        """Bad input is reported on its line; an unexpected failure is also logged"""
+        def broken(data):
+            raise RuntimeError('engine exploded')
+        
+        lines = [json.dumps({'holeCards': ['Q♠', 'Q♥'], 'potSize': 'lots', 'betSize': 10}),
+                 json.dumps({'holeCards': ['A♠', 'A♥'], 'flop': ['A♦', 'K♣', 'Q♠']})]
+        first = client.post('/api/analyze/stream', data=lines[0], content_type='application/x-ndjson')
+        assert 'error' in json.loads(first.data)
+        assert not caplog.records
+        
+        monkeypatch.setattr(app_module, 'generate_ai_recommendation', broken)
+        second = client.post('/api/analyze/stream', data=lines[1], content_type='application/x-ndjson')
+        assert json.loads(second.data) == {'line': 1, 'error': 'engine exploded'}
+        assert 'Stream line 1 failed' in caplog.text
+
+    def test_job_round_trip(self, client):
+        """A submitted job can be long-polled until its result is ready"""
+        response = client.post('/api/jobs',
+                             data=json.dumps({'type': 'equity', 'payload': {'playerHand': 'AA', 'opponentRange': 'KK'}}),
+                             content_type='application/json')
+        
+        assert response.status_code == 202
+        job_id = json.loads(response.data)['jobId']
+        job = json.loads(client.get(f'/api/jobs/{job_id}?wait=10', environ_overrides=THREADED).data)
+        assert job['status'] == 'done'
+        assert 78 < job['result']['equity'] < 86
+
+    def test_job_failure_is_reported(self, client):
+        """Invalid payloads fail the job with the validation message"""
+        response = client.post('/api/jobs',
+                             data=json.dumps({'type': 'analyze', 'payload': {'holeCards': ['A♠']}}),
+                             content_type='application/json')
+        job_id = json.loads(response.data)['jobId']
+        job = json.loads(client.get(f'/api/jobs/{job_id}?wait=10', environ_overrides=THREADED).data)
+        
+        assert job['status'] == 'failed'
+        assert 'Must provide exactly 2 hole cards' in job['error']
+
+    def test_job_queue_backpressure(self, client, monkeypatch):
+        """A full queue refuses new jobs with 429"""
+        monkeypatch.setattr(app_module, 'job_queue', JobQueue(workers=0, max_pending=1))
+        payload = json.dumps({'type': 'equity', 'payload': {'playerHand': 'AA', 'opponentRange': 'KK'}})
+        first = client.post('/api/jobs', data=payload, content_type='application/json')
+        second = client.post('/api/jobs', data=payload, content_type='application/json')
+        
+        assert first.status_code == 202
+        assert second.status_code == 429
+        assert second.headers['Retry-After'] == '1'
+
+    def test_job_wait_needs_request_threads(self, client, monkeypatch):
+        """Without request threads a long-poll answers at once instead of holding the worker"""
+        monkeypatch.setattr(app_module, 'job_queue', JobQueue(workers=0))
+        payload = json.dumps({'type': 'equity', 'payload': {'playerHand': 'AA', 'opponentRange': 'KK'}})
+        job_id = json.loads(client.post('/api/jobs', data=payload, content_type='application/json').data)['jobId']
+        
+        started = time.monotonic()
+        job = json.loads(client.get(f'/api/jobs/{job_id}?wait=5').data)
+        assert job['status'] == 'queued'
+        assert time.monotonic() - started < 1
+
+    def test_unknown_job(self, client):
+        """Unknown job ids are 404"""
+        assert client.get('/api/jobs/missing').status_code == 404
+
     def test_invalid_json(self, client):
         """Test with invalid JSON"""
         response = client.post('/api/analyze',
@@ -265,5 +500,188 @@ class TestPokerAPI:
         
         assert response.status_code == 400
 
+class TestAnalysisLog:
+    """Test cases for the background analysis log writer"""
+
+    def test_records_written_as_jsonl(self, tmp_path):
+        """Queued records end up as compact JSON lines"""
+        log = AnalysisLog(directory=str(tmp_path), flush_interval=0.01)
+        for i in range(3):
+            log.log({'hand': i})
+        log.flush()
+        
+        lines = (tmp_path / 'analysis.jsonl').read_text().splitlines()
+        assert [json.loads(line) for line in lines] == [{'hand': 0}, {'hand': 1}, {'hand': 2}]
+        assert log.stats()['written'] == 3
+
+    def test_rotation_and_size_cap(self, tmp_path):
+        """Full files are gzipped and the oldest archives removed past the cap"""
+        log = AnalysisLog(directory=str(tmp_path), max_file_bytes=200, max_total_bytes=400,
+                          batch_size=1, flush_interval=0.01)
+        for i in range(100):
+            log.log({'hand': i, 'padding': 'x' * 50})
+        log.flush()
+        
+        archives = list(tmp_path.glob('analysis-*.jsonl.gz'))
+        assert archives
+        assert sum(archive.stat().st_size for archive in archives) <= 400
+        with gzip.open(archives[0], 'rt') as f:
+            assert json.loads(f.readline())['padding'] == 'x' * 50
+
+    def test_sampling_and_full_queue(self, tmp_path):
+        """Sampled-out and overflowing records are counted, never blocking"""
+        sampled = AnalysisLog(directory=str(tmp_path), sample_rate=0)
+        sampled.log({'hand': 1})
+        assert sampled.stats()['sampledOut'] == 1
+        log = AnalysisLog(directory=str(tmp_path), queue_size=1)
+        log._owner = os.getpid()  # no writer thread, so the queue stays full
+        log.log({'hand': 1})
+        log.log({'hand': 2})
+        assert log.stats()['dropped'] == 1
+
+class TestAnalysisStore:
+    """Test cases for the SQLite analysis store"""
+
+    @pytest.fixture
+    def store(self, tmp_path, monkeypatch):
+        store = AnalysisStore(str(tmp_path / 'analyses.db'), flush_interval=0.01)
+        monkeypatch.setattr(app_module, 'analysis_store', store)
+        return store
+
+    def test_analyze_is_stored(self, client, store):
+        """Every analysis lands in the store with its hand class and street"""
+        hand_data = {'holeCards': ['A♠', 'K♥'], 'flop': ['Q♦', 'J♣', '10♠'], 'position': 'button'}
+        client.post('/api/analyze', data=json.dumps(hand_data), content_type='application/json')
+        store.flush()
+        
+        data = json.loads(client.get('/api/analyses?hand=AKo').data)
+        assert len(data['analyses']) == 1
+        assert data['analyses'][0]['street'] == 'flop'
+        assert data['analyses'][0]['handData'] == hand_data
+
+    def test_action_frequencies(self, client, store):
+        """Aggregates count actions per hand class and position"""
+        for action in ['raise', 'raise', 'fold']:
+            store.record({'holeCards': ['A♠', 'A♥'], 'position': 'early'},
+                         {'action': action, 'confidence': 80, 'equity': 85.0})
+        store.record({'holeCards': ['7♠', '2♥'], 'position': 'late'}, {'action': 'fold', 'equity': 30.0})
+        store.flush()
+        
+        actions = json.loads(client.get('/api/analyses/actions?hand=AA').data)['actions']
+        assert [(row['action'], row['count'], row['frequency']) for row in actions] == [
+            ('raise', 2, 0.6667), ('fold', 1, 0.3333)
+        ]
+        streets = json.loads(client.get('/api/analyses/streets?position=late').data)['streets']
+        assert streets == [{'street': 'preflop', 'action': 'fold', 'count': 1, 'avgEquity': 30.0, 'avgConfidence': None}]
+
+    def test_recent_limit_is_clamped(self, client, store):
+        """Negative limits cannot lift the row cap and non-numbers are rejected"""
+        for action in ['raise', 'call', 'fold']:
+            store.record({'holeCards': ['A♠', 'A♥']}, {'action': action})
+        store.flush()
+
+        assert len(json.loads(client.get('/api/analyses?limit=-1').data)['analyses']) == 1
+        assert client.get('/api/analyses?limit=abc').status_code == 400
+        assert store._reader() is store._reader()
+
 if __name__ == '__main__':
-    pytest.main([__file__]) 
\ No newline at end of file
+    pytest.main([__file__]) 
+
+class TestMetrics:
+    """Test cases for request timing and the Prometheus endpoint"""
+
+    @pytest.fixture
+    def metrics(self, monkeypatch):
+        metrics = Metrics(enabled=True)
+        metrics.add_collector(app_module.engine_metrics)
+        monkeypatch.setattr(app_module, 'metrics', metrics)
+        return metrics
+
+    def test_analyze_is_timed(self, client, metrics):
+        """Requests, streets and analysis stages show up as histograms"""
+        hand_data = {'holeCards': ['A♠', 'K♥'], 'flop': ['Q♦', 'J♣', '10♠']}
+        client.post('/api/analyze', data=json.dumps(hand_data), content_type='application/json')
+        
+        response = client.get('/api/metrics')
+        assert response.status_code == 200
+        text = response.data.decode()
+        assert '# TYPE poker_request_seconds histogram' in text
+        assert 'poker_request_seconds_count{endpoint="/api/analyze",method="POST",status="200"} 1' in text
+        assert 'poker_analysis_seconds_count{street="flop"} 1' in text
+        for stage in ['json_parse', 'equity', 'serialize']:
+            assert f'poker_stage_seconds_count{{stage="{stage}"}} 1' in text
+        assert 'poker_equity_estimates_total{method="sampled"} 1' in text
+        assert '# TYPE poker_simulated_trials_total counter' in text
+
+    def test_partial_board_label(self, client, metrics):
+        """A board that is not a street still scrapes (regression: None label broke sorting)"""
+        hand_data = {'holeCards': ['A♠', 'K♠'], 'flop': ['2♦', '7♣']}
+        client.post('/api/analyze', data=json.dumps(hand_data), content_type='application/json')
+        metrics.observe('poker_analysis_seconds', 0.01, street=None)
+
+        response = client.get('/api/metrics')
+        assert response.status_code == 200
+        text = response.data.decode()
+        assert 'poker_analysis_seconds_count{street="other"} 1' in text
+        assert 'poker_analysis_seconds_count{street="None"} 1' in text
+
+    def test_disabled_metrics_are_no_ops(self):
+        """A disabled registry records nothing and hands out the shared no-op span"""
+        metrics = Metrics(enabled=False)
+        assert metrics.span('equity') is NULL_SPAN
+        metrics.inc('poker_equity_estimates_total', method='exact')
+        metrics.observe('poker_request_seconds', 0.1, endpoint='/api/health')
+        assert metrics.render() == ''
+
+class TestProfiler:
+    """Test cases for on-demand request profiles"""
+
+    HAND = {'holeCards': ['A♠', 'K♥'], 'flop': ['Q♦', 'J♣', '10♠'], 'numPlayers': 3}
+
+    @pytest.fixture
+    def profiler(self, tmp_path, monkeypatch):
+        profiler = Profiler(ProfileStore(str(tmp_path / 'profiles'), keep=2))
+        monkeypatch.setattr(app_module, 'profiler', profiler)
+        monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+        # A cached spot could finish before the first sample
+        app_module.equity_cache.clear()
+        return profiler
+
+    def test_profile_header(self, client, profiler):
+        """An admin X-Profile request stores a collapsed-stack profile of the analysis"""
+        admin = {'Authorization': 'Bearer secret'}
+        response = client.post('/api/analyze', data=json.dumps(self.HAND), content_type='application/json',
+                               headers={'X-Profile': '1', **admin})
+        profile_id = response.headers['X-Profile-Id']
+        
+        profiles = json.loads(client.get('/api/admin/profiles', headers=admin).data)['profiles']
+        assert [profile['id'] for profile in profiles] == [profile_id]
+        collapsed = client.get(f'/api/admin/profiles/{profile_id}', headers=admin).data.decode()
+        stack, count = collapsed.splitlines()[0].rsplit(' ', 1)
+        assert stack.startswith('analyze_hand') and 'generate_ai_recommendation' in stack and int(count) > 0
+
+    def test_profiles_need_the_admin_token(self, client, profiler):
+        """Without the token the header is ignored and the admin endpoints refuse"""
+        response = client.post('/api/analyze', data=json.dumps(self.HAND), content_type='application/json',
+                               headers={'X-Profile': '1'})
+        assert 'X-Profile-Id' not in response.headers
+        assert client.get('/api/admin/profiles').status_code == 403
+        assert client.get('/api/admin/profiles/0', headers={'Authorization': 'Bearer secret'}).status_code == 404
+
+    def test_sample_rate_and_retention(self, client, profiler):
+        """Sampled requests are profiled without a header and only the newest are kept"""
+        profiler.sample_rate = 1.0
+        for _ in range(3):
+            response = client.post('/api/analyze', data=json.dumps(self.HAND), content_type='application/json')
+            assert 'X-Profile-Id' in response.headers
+        assert len(profiler.store.list()) == 2
+
+    def test_failed_save_does_not_fail_the_request(self, client, profiler, tmp_path):
+        """A profile that cannot be written is skipped, not turned into a 500"""
+        blocker = tmp_path / 'not_a_directory'
+        blocker.write_text('')
+        profiler.store.directory = str(blocker / 'profiles')
+        response = client.post('/api/analyze', data=json.dumps(self.HAND), content_type='application/json',
+                               headers={'X-Profile': '1', 'Authorization': 'Bearer secret'})
+        assert response.status_code == 200
+        assert 'X-Profile-Id' not in response.headers
@@ -0,0 +1,417 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+from poker_engine import (
+    parse_card, parse_cards, card_to_str, hand_to_notation, evaluate, evaluate_category, evaluate_many,
+    batch_estimate_equity, equity_cutoff, estimate_equity, monte_carlo_equity, multiway_equity, parse_range,
+    range_combos, range_equity
+)
+from poker_engine.evaluator import build_tables, load_tables
+from poker_engine.cache import EquityCache, canonical_key
+from poker_engine.handrange import HandRange, compile_ranges
+from poker_engine.categories import TOP_20_HAND_CATEGORIES, starting_hand_category
+from poker_engine.rangebook import RangeBook
+from poker_engine import parallel
+import benchmark
+from poker_engine.equity import exact_equity, sampled_equity
+from poker_engine.preflop import class_combos, class_index, class_notation, preflop_equity, preflop_matchup
+
+class TestCards:
+    """Test cases for the integer card encoding"""
+
+    def test_parse_round_trip(self):
+        """Every frontend card string survives a parse/format round trip"""
+        for rank in ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']:
+            for suit in ['♠', '♥', '♦', '♣']:
+                assert card_to_str(parse_card(rank + suit)) == rank + suit
+
+    def test_parse_accepts_t_and_ascii_suits(self):
+        """'T' and ASCII suit letters parse to the same ints"""
+        assert parse_card('T♠') == parse_card('10♠') == parse_card('Ts')
+        assert parse_card('Ah') == parse_card('A♥')
+
+    def test_parse_rejects_invalid_and_duplicates(self):
+        """Garbage and repeated cards raise ValueError"""
+        with pytest.raises(ValueError):
+            parse_card('1♠')
+        with pytest.raises(ValueError):
+            parse_cards(['A♠', 'A♠'])
+
+    def test_hand_to_notation(self):
+        """Notation orders ranks high-first and marks suitedness"""
+        assert hand_to_notation(parse_cards(['10♠', 'J♥'])) == 'JTo'
+        assert hand_to_notation(parse_cards(['K♦', 'A♦'])) == 'AKs'
+        assert hand_to_notation(parse_cards(['10♣', '10♦'])) == 'TT'
+
+class TestEvaluator:
+    """Test cases for hand evaluation"""
+
+    @pytest.mark.parametrize('cards,category', [
+        (['A♠', 'K♠', 'Q♠', 'J♠', '10♠', '2♦', '3♣'], 8),
+        (['A♠', '2♠', '3♠', '4♠', '5♠'], 8),
+        (['9♠', '9♥', '9♦', '9♣', '2♠'], 7),
+        (['9♠', '9♥', '9♦', '2♣', '2♠', '2♥', 'A♦'], 6),
+        (['A♠', '9♠', '7♠', '4♠', '2♠', 'K♥'], 5),
+        (['A♦', '2♠', '3♥', '4♣', '5♠', 'K♥', 'K♦'], 4),
+        (['9♠', '9♥', '9♦', 'A♣', '2♠'], 3),
+        (['9♠', '9♥', '2♦', '2♣', 'A♠', 'A♥', 'K♦'], 2),
+        (['9♠', '9♥', '2♦', '4♣', 'A♠'], 1),
+        (['9♠', '7♥', '2♦', '4♣', 'A♠', 'J♥', 'K♦'], 0),
+    ])
+    def test_categories(self, cards, category):
+        """Each hand category is recognised from 5-7 cards"""
+        assert evaluate_category(parse_cards(cards)) == category
+
+    def test_kickers_break_ties(self):
+        """Same-category hands are ordered by their kickers"""
+        board = ['A♦', '9♣', '7♠', '4♥', '2♦']
+        ace_king = evaluate(parse_cards(['A♠', 'K♥'] + board))
+        ace_queen = evaluate(parse_cards(['A♥', 'Q♠'] + board))
+        assert ace_king > ace_queen
+
+    def test_board_plays_is_a_tie(self):
+        """Hands that both play the board evaluate equal"""
+        board = ['A♦', 'K♣', 'Q♠', 'J♥', '10♦']
+        assert evaluate(parse_cards(['2♠', '3♥'] + board)) == evaluate(parse_cards(['4♠', '5♥'] + board))
+
+    def test_wheel_is_lowest_straight(self):
+        """A-2-3-4-5 loses to 2-3-4-5-6"""
+        wheel = evaluate(parse_cards(['A♠', '2♥', '3♦', '4♣', '5♠']))
+        six_high = evaluate(parse_cards(['6♠', '2♥', '3♦', '4♣', '5♠']))
+        assert wheel < six_high
+
+    def test_evaluate_many_matches_scalar(self):
+        """The vectorised evaluator agrees with evaluate() row by row"""
+        rng = np.random.default_rng(7)
+        hands = np.array([rng.permutation(52)[:7] for _ in range(2000)])
+        expected = [evaluate(list(hand)) for hand in hands]
+        assert evaluate_many(hands).tolist() == expected
+
+    def test_disk_cache_round_trip(self, tmp_path):
+        """Tables read back from the disk cache match freshly built ones"""
+        written = load_tables(str(tmp_path))
+        assert load_tables(str(tmp_path)) == written == build_tables()
+
+class TestEquity:
+    """Test cases for equity simulation"""
+
+    def test_made_nuts_on_river(self):
+        """A royal flush on the river can never lose"""
+        hole = parse_cards(['A♠', 'K♠'])
+        board = parse_cards(['Q♠', 'J♠', '10♠', '2♦', '3♣'])
+        assert monte_carlo_equity(hole, board, num_simulations=200) == 100
+
+    def test_aces_preflop(self):
+        """Pocket aces are a big favourite against a random hand"""
+        equity = monte_carlo_equity(parse_cards(['A♠', 'A♥']), [], num_simulations=2000, preflop_table=False)
+        assert 82 < equity < 88
+
+    def test_seeded_rng_is_reproducible(self):
+        """Passing a seeded generator gives the same equity twice"""
+        hole = parse_cards(['9♠', '8♠'])
+        board = parse_cards(['7♠', '6♦', '2♣'])
+        first = monte_carlo_equity(hole, board, 1000, rng=np.random.default_rng(3))
+        second = monte_carlo_equity(hole, board, 1000, rng=np.random.default_rng(3))
+        assert first == second
+
+    def test_exact_river_matches_brute_force(self):
+        """River enumeration equals a plain loop over every opponent hand"""
+        hole = parse_cards(['Q♠', 'J♠'])
+        board = parse_cards(['Q♦', '9♣', '7♠', '4♥', '2♠'])
+        deck = [card for card in range(52) if card not in hole + board]
+        player = evaluate(hole + board)
+        score = 0
+        for opponent in combinations(deck, 2):
+            opponent_value = evaluate(list(opponent) + board)
+            score += 1 if player > opponent_value else 0.5 if player == opponent_value else 0
+        assert exact_equity(hole, board) == pytest.approx(score / 990 * 100)
+
+    def test_turn_switches_to_exact(self):
+        """Turn spots are enumerated, so repeated calls agree exactly"""
+        hole = parse_cards(['A♠', 'A♥'])
+        board = parse_cards(['K♦', 'Q♣', 'J♠', '2♥'])
+        assert monte_carlo_equity(hole, board) == monte_carlo_equity(hole, board) == exact_equity(hole, board)
+
+    @pytest.mark.parametrize('opponents, expected', [(2, 73.5), (5, 49.2), (9, 31.4)])
+    def test_multiway_aces(self, opponents, expected):
+        """Pocket aces lose value against every extra opponent"""
+        result = multiway_equity(parse_cards(['A♠', 'A♥']), [], opponents, 20000, rng=np.random.default_rng(2))
+        assert result['equity'] == pytest.approx(expected, abs=1.5)
+        assert result['win'] <= result['equity'] <= result['win'] + result['tie']
+
+    def test_multiway_split_pot(self):
+        """Playing the board splits the pot between everyone"""
+        board = parse_cards(['A♠', 'K♠', 'Q♠', 'J♠', '10♠'])
+        result = multiway_equity(parse_cards(['2♥', '3♥']), board, 3, 1000)
+        assert result == {'equity': 25.0, 'win': 0.0, 'tie': 100.0, 'trials': 1000, 'error': 0.0}
+
+    def test_adaptive_stops_at_precision(self):
+        """A lopsided spot reaches the target error bound with far fewer trials"""
+        hole = parse_cards(['A♠', 'A♥'])
+        board = parse_cards(['A♦', '7♣', '2♠'])
+        result = estimate_equity(hole, board, 100000, rng=np.random.default_rng(4), precision=0.5)
+        assert result['method'] == 'sampled'
+        assert result['error'] <= 0.5
+        assert result['trials'] < 20000
+
+    def test_adaptive_respects_deadline(self):
+        """A tiny precision still stops at the time limit"""
+        hole = parse_cards(['J♠', '10♠'])
+        board = parse_cards(['9♠', '8♥', '2♦'])
+        result = estimate_equity(hole, board, 10 ** 7, rng=np.random.default_rng(4), precision=0.001, time_limit=0.05)
+        assert result['trials'] < 10 ** 7
+        assert result['error'] > 0.001
+
+    def test_batch_matches_single_spots(self):
+        """Batched spots agree with estimating each spot on its own"""
+        spots = [
+            (parse_cards(['A♠', 'K♠']), parse_cards(['Q♠', 'J♥', '2♦']), 1),
+            (parse_cards(['9♣', '9♦']), parse_cards(['K♦', '5♣', '2♠']), 3),
+            (parse_cards(['A♥', 'K♥']), parse_cards(['Q♥', 'J♠', '2♦']), 1),
+            (parse_cards(['A♠', 'K♠']), parse_cards(['Q♠', 'J♥', '2♦', '3♣']), 1),
+        ]
+        results = batch_estimate_equity(spots, 20000, rng=np.random.default_rng(6))
+        for (hole, board, opponents), result in zip(spots, results):
+            single = estimate_equity(hole, board, 20000, rng=np.random.default_rng(7), num_opponents=opponents)
+            assert result['equity'] == pytest.approx(single['equity'], abs=1.5)
+        assert results[0] == results[2]
+        assert results[3]['method'] == 'exact'
+
+    def test_equity_cutoff_scales_with_opponents(self):
+        """Heads-up cutoffs are unchanged and map the fair share to 50 at bigger tables"""
+        assert [equity_cutoff(cutoff, 1) for cutoff in [30, 50, 80]] == [30, 50, 80]
+        assert equity_cutoff(50, 5) == pytest.approx(100 / 6)
+        assert equity_cutoff(25, 3) == pytest.approx(12.5)
+        assert equity_cutoff(100, 9) == pytest.approx(100)
+
+    def test_batch_shares_cache_with_single_spots(self):
+        """A finished batch estimate is reused whatever the time limit; one cut short is not cached"""
+        cache = EquityCache(maxsize=10)
+        hole = parse_cards(['9♣', '9♦'])
+        board = parse_cards(['K♦', '5♣', '2♠'])
+        [batched] = batch_estimate_equity([(hole, board, 3)], 100000, cache=cache, precision=0.5, time_limit=30)
+        single = estimate_equity(hole, board, 100000, cache=cache, num_opponents=3, precision=0.5, time_limit=0.5)
+        assert single == batched
+        assert cache.hits == 1
+
+        cache.clear()
+        [cut] = batch_estimate_equity([(hole, board, 3)], 10 ** 7, cache=cache, precision=0.001, time_limit=0.05)
+        assert cut['error'] > 0.001
+        assert cache.stats()['size'] == 0
+
+    def test_parallel_matches_serial(self, monkeypatch):
+        """A seeded run gives the same equity on a process pool as in-process"""
+        monkeypatch.setattr(parallel, 'MIN_PARALLEL_TRIALS', 0)
+        hole = parse_cards(['A♠', 'K♠'])
+        board = parse_cards(['Q♠', 'J♥', '2♦'])
+        serial = sampled_equity(hole, board, 40000, rng=np.random.default_rng(5), workers=1)
+        pooled = sampled_equity(hole, board, 40000, rng=np.random.default_rng(5), workers=2)
+        assert serial == pooled
+
+    def test_run_trials_merges_chunks(self):
+        """Every requested trial is counted once across chunks"""
+        score, trials = parallel.run_trials(lambda num_trials, rng: (num_trials / 2, num_trials), (), 50001)
+        assert (score, trials) == (25000.5, 50001)
+
+class TestRanges:
+    """Test cases for range parsing and range-vs-range equity"""
+
+    @pytest.mark.parametrize('spec, combos', [
+        ('AKs', 4), ('AKo', 12), ('AK', 16), ('TT+', 30), ('ATs+', 16),
+        ('A5s-A2s', 16), ('22-55', 24), ('AsKd', 1), ('A♠K♦, AKs', 5),
+    ])
+    def test_expansion(self, spec, combos):
+        """Notations expand to every concrete combo"""
+        assert len(parse_range(spec)) == combos
+
+    def test_weights(self):
+        """Weights attach to every combo of their token"""
+        weights = parse_range(['AKs:0.5', 'QQ'])
+        assert sorted(set(weights.values())) == [0.5, 1.0]
+
+    @pytest.mark.parametrize('spec', ['91s', 'AAs', 'A5s-K2s', 'AK:2'])
+    def test_invalid(self, spec):
+        """Malformed tokens raise ValueError"""
+        with pytest.raises(ValueError):
+            parse_range(spec)
+
+    def test_blocked_combos_removed(self):
+        """Combos using a dead card are dropped before sampling"""
+        combos, weights = range_combos('AA', parse_cards(['A♠']))
+        assert len(combos) == len(weights) == 3
+
+    def test_range_vs_range_matches_table(self):
+        """Class-vs-class sampling agrees with the preflop matchup table"""
+        equity = range_equity('AKs', 'QQ', [], 40000, rng=np.random.default_rng(8))
+        assert equity == pytest.approx(preflop_matchup('AKs', 'QQ'), abs=1)
+
+    def test_incompatible_ranges(self):
+        """Ranges that can never be dealt together are an error"""
+        with pytest.raises(ValueError):
+            range_equity(parse_cards(['A♠', 'A♥']), 'AsAh', [], 1000, cache=None)
+
+class TestHandRange:
+    """Test cases for compiled class ranges"""
+
+    def test_membership(self):
+        """Notations and card ints are looked up by class"""
+        hands = HandRange.parse('TT+, AKs:0.5')
+        assert 'QQ' in hands and parse_cards(['A♠', 'K♠']) in hands
+        assert '99' not in hands and parse_cards(['A♠', 'K♥']) not in hands
+        assert hands.weight('AKs') == 0.5 and hands.combos() == 32
+
+    def test_set_operations(self):
+        """Union, intersection, subtraction and weighting work per class"""
+        pairs, broadway = HandRange.parse('22+'), HandRange.parse('TT+, AKs')
+        assert (pairs - broadway).notations() == HandRange.parse('22-99').notations()
+        assert (pairs & broadway) == HandRange.parse('TT+')
+        assert len(pairs | broadway) == 14
+        assert pairs.weighted(0.5).weight('AA') == 0.5
+        assert HandRange.parse((pairs & broadway).to_spec()) == pairs & broadway
+
+    def test_compile_reports_problems(self):
+        """Invalid tokens are skipped and overlapping actions reported"""
+        compiled, problems = compile_ranges({'BTN': {'call': ['Q2s', 'K2s'], 'fold': ['Q2s', '91s']}})
+        assert 'K2s' in compiled['BTN']['call'] and len(compiled['BTN']['fold']) == 1
+        assert problems == ['BTN fold: invalid tokens 91s', 'BTN: Q2s in both call and fold']
+
+    @pytest.mark.parametrize('cards, broad, top_20', [
+        (['A♠', 'K♥'], 'premium', 'premium'),
+        (['K♠', 'Q♠'], 'strong', 'strong'),
+        (['A♠', '9♥'], 'playable', 'weak'),
+        (['A♠', '5♠'], 'weak', 'playable'),
+        (['7♠', '2♥'], 'weak', 'weak'),
+    ])
+    def test_starting_hand_categories(self, cards, broad, top_20):
+        """Both playable tiers share the premium and strong categories"""
+        hole = parse_cards(cards)
+        assert starting_hand_category(hole) == broad
+        assert starting_hand_category(hole, TOP_20_HAND_CATEGORIES) == top_20
+
+class TestRangeBook:
+    """Test cases for range files and their compiled cache"""
+
+    @pytest.fixture
+    def range_dir(self, tmp_path):
+        directory = tmp_path / 'ranges'
+        directory.mkdir()
+        (directory / 'open-100bb.txt').write_text('# test ranges\nUTG raise: TT+, AKs\nUTG call: 99\n')
+        (directory / 'open-20bb.txt').write_text('UTG raise: 22+\n')
+        return directory
+
+    def test_lookup_by_depth_and_context(self, range_dir, tmp_path):
+        """The closest stack depth is used and unknown contexts fall back to opening ranges"""
+        book = RangeBook(str(range_dir), str(tmp_path / 'ranges.bin'))
+        assert '22' in book.ranges('UTG', depth=25)['raise']
+        assert '22' not in book.ranges('UTG', 'vs_raise', 80)['raise']
+        assert '99' in book.ranges('UTG')['call'] and not book.ranges('UTG')['fold']
+        assert book.ranges('BTN') == {}
+
+    def test_cache_is_reused(self, range_dir, tmp_path):
+        """A second process start memory-maps the cache instead of parsing"""
+        RangeBook(str(range_dir), str(tmp_path / 'ranges.bin')).current()
+        book = RangeBook(str(range_dir), str(tmp_path / 'ranges.bin'))
+        assert book.ranges('UTG')['raise'] == HandRange.parse('TT+, AKs')
+        assert book.stats()['compiledFiles'] == 0
+
+    def test_hot_reload(self, range_dir, tmp_path):
+        """Editing a file recompiles only that file on the next lookup"""
+        book = RangeBook(str(range_dir), str(tmp_path / 'ranges.bin'), check_interval=0)
+        book.current()
+        (range_dir / 'open-100bb.txt').write_text('UTG raise: 77+, A5s\nUTG call: KQs, 91s\nbad line\n')
+        assert 'A5s' in book.ranges('UTG')['raise']
+        stats = book.stats()
+        assert stats['reloads'] == 2 and stats['compiledFiles'] == 3
+        assert len(stats['problems']) == 2
+
+class TestPreflopTable:
+    """Test cases for the precomputed preflop equity table"""
+
+    def test_classes_cover_every_combo(self):
+        """The 169 classes partition all 1326 two-card combos"""
+        combos = [combo for index in range(169) for combo in class_combos(index)]
+        assert len(combos) == len(set(combos)) == 1326
+        for index in range(169):
+            assert all(class_index(list(combo)) == index for combo in class_combos(index))
+
+    def test_notation_matches_cards(self):
+        """Grid notation agrees with hand_to_notation"""
+        for index in range(169):
+            assert hand_to_notation(list(class_combos(index)[0])) == class_notation(index)
+
+    def test_known_equities(self):
+        """Table values match well-known preflop equities"""
+        assert preflop_equity(parse_cards(['A♠', 'A♥'])) == pytest.approx(85.2, abs=0.5)
+        assert preflop_equity(parse_cards(['7♠', '2♥'])) == pytest.approx(34.6, abs=0.5)
+        assert preflop_matchup('AA', 'KK') == pytest.approx(82, abs=1)
+        assert preflop_matchup('AA', 'KK') + preflop_matchup('KK', 'AA') == pytest.approx(100, abs=0.01)
+
+    def test_multiway_rows(self):
+        """The table also covers 2-9 random opponents"""
+        aces = parse_cards(['A♠', 'A♥'])
+        assert preflop_equity(aces, 5) == pytest.approx(49.2, abs=0.5)
+        assert preflop_equity(aces, 9) < preflop_equity(aces, 2) < preflop_equity(aces)
+
+    def test_preflop_uses_table(self):
+        """monte_carlo_equity answers preflop spots from the table"""
+        hole = parse_cards(['K♠', 'Q♠'])
+        assert monte_carlo_equity(hole, []) == preflop_equity(hole)
+
+class TestEquityCache:
+    """Test cases for the suit-isomorphic equity cache"""
+
+    def test_isomorphic_spots_share_a_key(self):
+        """Relabelled suits and reordered cards give the same key"""
+        spot = canonical_key(parse_cards(['A♠', 'K♠']), parse_cards(['Q♠', 'J♥', '2♦']))
+        relabelled = canonical_key(parse_cards(['K♥', 'A♥']), parse_cards(['2♦', 'Q♥', 'J♠']))
+        different = canonical_key(parse_cards(['A♠', 'K♥']), parse_cards(['Q♠', 'J♥', '2♦']))
+        assert spot == relabelled
+        assert spot != different
+
+    def test_isomorphic_spot_is_a_hit(self):
+        """A second, isomorphic spot is served from the cache"""
+        cache = EquityCache(maxsize=10)
+        first = monte_carlo_equity(parse_cards(['A♠', 'K♠']), parse_cards(['Q♠', 'J♥', '2♦']), 1000, cache=cache)
+        second = monte_carlo_equity(parse_cards(['A♥', 'K♥']), parse_cards(['Q♥', 'J♠', '2♦']), 1000, cache=cache)
+        assert first == second
+        assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+    def test_isomorphic_hero_vs_range_is_a_hit(self):
+        """Suit-relabelled hero cards against the same range share one entry"""
+        cache = EquityCache(maxsize=10)
+        first = range_equity(parse_cards(['A♠', 'K♠']), 'QQ', num_simulations=1000, cache=cache)
+        second = range_equity(parse_cards(['A♥', 'K♥']), 'QQ', num_simulations=1000, cache=cache)
+        assert first == second
+        assert cache.stats()['hits'] == 1 and cache.stats()['size'] == 1
+
+    def test_lru_eviction_and_ttl(self):
+        """The oldest entry is evicted when full and expired entries miss"""
+        cache = EquityCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        assert cache.get('b') is None and cache.get('a') == 1
+        expired = EquityCache(maxsize=2, ttl=-1)
+        expired.put('a', 1)
+        assert expired.get('a') is None
+
+class TestBenchmark:
+    """Test cases for the benchmark runner and regression check"""
+
+    def test_run_reports_latency_and_allocations(self):
+        """Every benchmark result has percentiles, throughput and memory"""
+        document = benchmark.run_benchmarks(['hand_to_notation'], min_time=0.01)
+        result = document['results']['hand_to_notation']
+        assert result['calls'] >= benchmark.MIN_CALLS and result['p99Us'] >= result['p50Us'] > 0
+        assert result['perSec'] > 0 and result['unit'] == 'hands' and 'allocPeakBytes' in result
+
+    def test_compare_flags_regressions(self):
+        """Slowdowns beyond the threshold are flagged, noise within it is not"""
+        def document(per_sec, p50):
+            return {'results': {'eval': {
+                'perSec': per_sec, 'p50Us': p50, 'p99Us': p50 * 2, 'allocPeakBytes': 100, 'unit': 'hands'
+            }}}
+        assert benchmark.compare(document(1000, 10), document(950, 10.5), 0.1)[1] == []
+        assert benchmark.compare(document(1000, 10), document(800, 12.5), 0.1)[1] == ['eval']
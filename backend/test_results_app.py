@@ -0,0 +1,309 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+import threading
+from datetime import date
+
+import pytest
+
+# Keep the import-time init_csv() out of backend/data
+os.environ.setdefault('POKER_RESULTS_FILE', os.path.join(tempfile.mkdtemp(prefix='poker_results_'), 'poker_results.csv'))
+
+import results_app as results_module
+from leaderboard import Leaderboard
+from response_cache import ResponseCache
+from results_app import app
+from results_store import HEADER, ResultsIndex, ResultsStore, split_rows
+
+
+def write_rows(path, rows, mode='a'):
+    with open(path, mode, newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ResultsStore(str(tmp_path / 'poker_results.csv'), str(tmp_path / 'results.idx'))
+    store.init()
+    monkeypatch.setattr(results_module, 'store', store)
+    monkeypatch.setattr(results_module, 'leaderboard', Leaderboard(store))
+    monkeypatch.setattr(results_module, 'response_cache', ResponseCache())
+    return store
+
+
+@pytest.fixture
+def client(store):
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+
+class TestResultsStore:
+    """Offset index over the results CSV"""
+
+    def test_legacy_rows_and_multiline_notes(self, store):
+        write_rows(store.path, [
+            ['2025-01-20', 'Lisa', 'false', 'old format'],
+            ['2025-01-21', 'John', 'false', 'line one\nline "two"', 'Alex'],
+            ['broken'],
+            [],
+            ['2025-01-22', 'Alex, Maya', 'true', '50/50', 'John, Sarah'],
+        ])
+        results, next_cursor = store.page(10)
+        assert [result['winners'] for result in results] == ['Alex, Maya', 'John', 'Lisa']
+        assert results[1]['notes'] == 'line one\nline "two"'
+        assert results[2]['other_players'] == ''
+        assert results[0]['split'] is True
+        assert next_cursor is None
+        assert store.stats()['splitGames'] == 1
+
+    def test_index_built_in_small_chunks(self, store):
+        write_rows(store.path, [['2025-01-01', 'A', 'false', 'a\nlong "quoted"\nnote'], ['2025-01-02', 'B', 'true', '']])
+        size = os.path.getsize(store.path)
+        whole, chunked = ResultsIndex(), ResultsIndex()
+        with open(store.path, 'rb') as f:
+            whole.extend(f, size)
+            chunked.extend(f, size, chunk_size=7)
+        assert chunked.offsets == whole.offsets and len(whole) == 2
+        assert (chunked.size, chunked.data_start) == (whole.size, whole.data_start)
+
+    def test_split_rows_waits_for_closing_quote(self):
+        rows, consumed = split_rows(b'a,b\r\n"open\nstill open')
+        assert rows == [(0, b'a,b\r\n')] and consumed == 5
+
+    def test_cursor_pages(self, store):
+        write_rows(store.path, [[f'2025-01-{day:02d}', f'P{day}', 'false', ''] for day in range(1, 8)])
+        pages, cursor = [], None
+        while True:
+            results, cursor = store.page(3, cursor=cursor)
+            pages.append([result['winners'] for result in results])
+            if cursor is None:
+                break
+        assert pages == [['P7', 'P6', 'P5'], ['P4', 'P3', 'P2'], ['P1']]
+
+    def test_date_filters(self, store):
+        write_rows(store.path, [[f'2025-01-{day:02d}', f'P{day}', 'false', ''] for day in range(1, 8)])
+        results, _ = store.page(10, since=date(2025, 1, 3), until=date(2025, 1, 6))
+        assert [result['winners'] for result in results] == ['P5', 'P4', 'P3']
+
+        # Out-of-order and DD/MM/YYYY dates fall back to scanning the index
+        write_rows(store.path, [['04/01/2025', 'Late', 'false', '']])
+        results, next_cursor = store.page(2, since=date(2025, 1, 3), until=date(2025, 1, 6))
+        assert [result['winners'] for result in results] == ['Late', 'P5']
+        results, _ = store.page(2, cursor=next_cursor, since=date(2025, 1, 3), until=date(2025, 1, 6))
+        assert [result['winners'] for result in results] == ['P4', 'P3']
+
+    def test_appends_extend_the_saved_index(self, store):
+        write_rows(store.path, [['2025-01-01', 'A', 'false', '']])
+        store.page(10)
+        write_rows(store.path, [['2025-01-02', 'B', 'true', '']])
+
+        reopened = ResultsStore(store.path, store.index_path)
+        assert [result['winners'] for result in reopened.page(10)[0]] == ['B', 'A']
+        assert reopened.rebuilds == 0
+        assert len(ResultsIndex.read(store.index_path)) == 2
+
+    def test_rewritten_file_rebuilds_the_index(self, store):
+        write_rows(store.path, [['2025-01-01', 'A', 'false', ''], ['2025-01-02', 'B', 'false', '']])
+        store.page(10)
+        write_rows(store.path, [['date', 'winners', 'split', 'notes'], ['2025-02-01', 'C', 'false', '']], mode='w')
+
+        reopened = ResultsStore(store.path, store.index_path)
+        assert [result['winners'] for result in reopened.page(10)[0]] == ['C']
+        assert reopened.rebuilds == 1
+
+    def test_unterminated_last_row(self, store):
+        with open(store.path, 'a', encoding='utf-8') as f:
+            f.write('2025-01-01,A,false,hand edited')
+        assert [result['winners'] for result in store.page(10)[0]] == ['A']
+        with open(store.path, 'a', encoding='utf-8') as f:
+            f.write(' note\r\n2025-01-02,B,false,\r\n')
+        results, _ = store.page(10)
+        assert [(result['winners'], result['notes']) for result in results] == [('B', ''), ('A', 'hand edited note')]
+
+    def test_concurrent_appends_are_group_committed(self, store):
+        writes = []
+        write = store._write
+        store._write = lambda data: (writes.append(data), write(data))
+
+        def add(worker):
+            for game in range(20):
+                store.append([['2025-01-01', f'W{worker}-{game}', 'false', 'note, with "quotes"']])
+
+        threads = [threading.Thread(target=add, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        results, _ = store.page(500)
+        assert sorted(result['winners'] for result in results) == sorted(
+            f'W{worker}-{game}' for worker in range(8) for game in range(20)
+        )
+        assert all(result['notes'] == 'note, with "quotes"' for result in results)
+        assert store.stats()['appended'] == 160 and store.stats()['commits'] == len(writes) <= 160
+
+    def test_append_after_unterminated_line(self, store):
+        with open(store.path, 'a', encoding='utf-8') as f:
+            f.write('2025-01-01,A,false,hand edited')
+        store.append([['2025-01-02', 'B', 'false', '']])
+        assert [result['winners'] for result in store.page(10)[0]] == ['B', 'A']
+
+
+class TestLeaderboard:
+    """Per-player statistics applied row by row"""
+
+    def test_player_statistics(self, store):
+        write_rows(store.path, [
+            ['2025-01-01', 'Alex', 'false', ''],  # Legacy row: only the winner played
+            ['2025-01-02', 'Alex', 'false', '', 'Maya, John'],
+            ['2025-01-03', 'Alex, Maya', 'true', '', 'John'],
+            ['2025-01-04', 'John', 'false', '', 'alex, Maya'],
+        ])
+        board = Leaderboard(store)
+        assert [player['name'] for player in board.ranking()] == ['Alex', 'John', 'Maya']
+        alex = board.player('ALEX')
+        assert (alex['games'], alex['wins'], alex['splitWins'], alex['potShare']) == (4, 3, 1, 2.5)
+        assert (alex['currentStreak'], alex['bestStreak'], alex['lastPlayed']) == (0, 3, '2025-01-04')
+        maya = board.player('Maya')
+        assert (maya['games'], maya['wins'], maya['splitShare'], maya['winRate']) == (3, 1, 1.0, 0.333)
+        assert board.player('Nobody') is None
+
+    def test_appends_are_applied_incrementally(self, store):
+        write_rows(store.path, [['2025-01-01', 'Alex', 'false', '', 'Maya']])
+        board = Leaderboard(store)
+        board.current()
+        write_rows(store.path, [['2025-01-02', 'Maya', 'false', '', 'Alex']])
+        assert board.player('Maya')['wins'] == 1
+        assert board.stats() == {'games': 2, 'players': 2, 'replays': 1}
+
+        # A rewritten file is replayed from the start
+        write_rows(store.path, [['date', 'winners', 'split', 'notes'], ['2025-02-01', 'John', 'false', '']], mode='w')
+        assert [player['name'] for player in board.ranking()] == ['John']
+        assert board.stats()['replays'] == 2
+
+
+class TestResultsAPI:
+    """Paged /api/results and /reveal"""
+
+    def test_results_pagination(self, client, store):
+        write_rows(store.path, [[f'2025-01-{day:02d}', f'P{day}', 'false', ''] for day in range(1, 6)])
+        data = client.get('/api/results?limit=2').get_json()
+        assert [result['winners'] for result in data['results']] == ['P5', 'P4']
+        data = client.get(f"/api/results?limit=2&cursor={data['nextCursor']}").get_json()
+        assert [result['winners'] for result in data['results']] == ['P3', 'P2']
+
+        data = client.get('/api/results?since=2025-01-04').get_json()
+        assert [result['winners'] for result in data['results']] == ['P5', 'P4']
+        assert data['nextCursor'] is None
+
+    def test_invalid_parameters(self, client):
+        for query in ('limit=0', 'limit=x', 'cursor=-1', 'since=yesterday'):
+            assert client.get(f'/api/results?{query}').status_code == 400
+
+    def test_winner_shows_on_reveal(self, client, store):
+        response = client.post(
+            '/api/winner', json={'winners': ['Alex', 'Maya'], 'split': True, 'notes': 'chop'},
+            headers={'Authorization': 'Bearer toasty1'}
+        )
+        assert response.status_code == 200
+        page = client.get('/reveal').get_data(as_text=True)
+        assert 'Alex, Maya' in page and '100.0%' in page
+
+        data = client.get('/api/leaderboard').get_json()
+        assert [player['name'] for player in data['players']] == ['Alex', 'Maya']
+        assert data['players'][0]['potShare'] == 0.5 and data['games'] == 1
+        assert client.get('/api/players/maya').get_json()['splitWins'] == 1
+        assert client.get('/api/players/nobody').status_code == 404
+
+    def test_conditional_get(self, client, store):
+        write_rows(store.path, [['2025-01-01', 'Alex', 'false', '']])
+        first = client.get('/api/results')
+        etag = first.headers['ETag']
+        assert first.headers['Cache-Control'] == 'no-cache' and 'Last-Modified' in first.headers
+        assert client.get('/api/results', headers={'If-None-Match': etag}).status_code == 304
+        assert results_module.response_cache.stats()['renders'] == 1
+
+        store.append([['2025-01-02', 'Maya', 'false', '']])
+        second = client.get('/api/results', headers={'If-None-Match': etag})
+        assert second.status_code == 200 and second.headers['ETag'] != etag
+        assert [result['winners'] for result in second.get_json()['results']] == ['Maya', 'Alex']
+
+    def test_precomputed_gzip(self, client, store):
+        write_rows(store.path, [['2025-01-01', 'Alex', 'false', 'x' * 1000]])
+        plain = client.get('/reveal')
+        compressed = client.get('/reveal', headers={'Accept-Encoding': 'gzip'})
+        assert compressed.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in compressed.headers['Vary']
+        assert gzip.decompress(compressed.get_data()) == plain.get_data()
+        assert compressed.headers['ETag'] != plain.headers['ETag']
+        again = client.get('/reveal', headers={'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag']})
+        assert again.status_code == 304
+        assert results_module.response_cache.stats()['renders'] == 1
+
+        data = client.get('/api/results', headers={'Accept-Encoding': 'gzip'}).get_data()
+        assert json.loads(gzip.decompress(data))['results'][0]['winners'] == 'Alex'
+
+
+class TestResultsExport:
+    """Streaming /api/export and /download-csv"""
+
+    def test_csv_export_and_ranges(self, client, store):
+        write_rows(store.path, [[f'2025-01-{day:02d}', f'P{day}', 'false', 'notes\nover lines'] for day in range(1, 8)])
+        with open(store.path, 'rb') as f:
+            raw = f.read()
+        full = client.get('/download-csv')
+        assert full.get_data() == raw and full.headers['Accept-Ranges'] == 'bytes'
+        assert 'poker_results.csv' in full.headers['Content-Disposition']
+
+        part = client.get('/download-csv', headers={'Range': 'bytes=10-99', 'If-Range': full.headers['ETag']})
+        assert part.status_code == 206 and part.get_data() == raw[10:100]
+        assert part.headers['Content-Range'] == f'bytes 10-99/{len(raw)}'
+
+        # Rows appended since the first download make If-Range fail, so the whole file comes back
+        store.append([['2025-01-08', 'P8', 'false', '']])
+        stale = client.get('/download-csv', headers={'Range': 'bytes=10-', 'If-Range': full.headers['ETag']})
+        assert stale.status_code == 200 and stale.get_data().endswith(b'P8,false,\r\n')
+
+    def test_filtered_exports(self, client, store):
+        write_rows(store.path, [
+            ['2025-01-01', 'A', 'false', ''], ['2025-01-05', 'B', 'true', 'x'],
+            ['2025-01-02', 'C', 'false', ''], ['2025-01-03', 'D', 'false', '', 'E'],
+        ])
+        csv_export = client.get('/api/export?since=2025-01-02&until=2025-01-04').get_data(as_text=True)
+        assert csv_export == 'date,winners,split,notes,other_players\r\n2025-01-02,C,false,\r\n2025-01-03,D,false,,E\r\n'
+
+        # Unsorted dates give several spans; a range can start inside any of them
+        csv_export = client.get('/api/export?since=2025-01-03').get_data()
+        part = client.get('/api/export?since=2025-01-03', headers={'Range': 'bytes=45-'})
+        assert part.status_code == 206 and part.get_data() == csv_export[45:]
+
+        lines = client.get('/api/export?format=jsonl&until=2025-01-03').get_data(as_text=True).splitlines()
+        assert [json.loads(line)['winners'] for line in lines] == ['A', 'C']
+
+        compressed = client.get('/api/export?format=jsonl&compress=gzip')
+        assert compressed.mimetype == 'application/gzip' and 'Accept-Ranges' not in compressed.headers
+        lines = gzip.decompress(compressed.get_data()).decode().splitlines()
+        assert json.loads(lines[3]) == {
+            'date': '2025-01-03', 'winners': 'D', 'split': False, 'notes': '', 'other_players': 'E'
+        }
+        csv_export = client.get('/api/export?compress=gzip').get_data()
+        with open(store.path, 'rb') as f:
+            assert gzip.decompress(csv_export) == f.read()
+
+        # Skipped rows inside the selected spans are left out of filtered CSV exports, as in JSON lines
+        write_rows(store.path, [['bad'], ['2025-01-06', 'F', 'false', ''], ['also bad', 'x']])
+        csv_export = client.get('/api/export?since=2025-01-04').get_data(as_text=True)
+        assert csv_export.splitlines()[1:] == ['2025-01-05,B,true,x', '2025-01-06,F,false,']
+        lines = client.get('/api/export?format=jsonl&since=2025-01-04').get_data(as_text=True).splitlines()
+        assert [json.loads(line)['winners'] for line in lines] == ['B', 'F']
+
+        write_rows(store.path, [HEADER, ['2024-01-01', 'A', 'false', ''], ['2024-01-02', 'B', 'false', ''], ['bad']],
+                   mode='w')
+        csv_export = client.get('/api/export?since=2024-01-02').get_data(as_text=True)
+        assert csv_export.splitlines()[1:] == ['2024-01-02,B,false,']
+
+    def test_invalid_export_parameters(self, client):
+        for query in ('format=xml', 'compress=zip', 'since=soon'):
+            assert client.get(f'/api/export?{query}').status_code == 400